@@ -41,6 +41,38 @@ class Conf(_config.ConfigNamespace):
         _platformdirs.user_data_dir(appname="dkist"),
         "Location to download sample data to."
     )
+    frame_cache_size = _config.ConfigItem(
+        "0",
+        "The maximum memory used to cache arrays read from FITS files, "
+        "as a number of bytes or a string such as '2GiB'. 0 disables the cache."
+    )
+    max_open_files = _config.ConfigItem(
+        0,
+        "The maximum number of idle FITS files kept open for reuse by the loaders. 0 disables reuse."
+    )
+    open_file_idle_timeout = _config.ConfigItem(
+        10.0,
+        "The number of seconds after which an idle FITS file kept open by the loaders is closed. "
+        "Idle files are only closed the next time a file is read, not when the timeout expires."
+    )
+    decompression_processes = _config.ConfigItem(
+        0,
+        "The number of processes used by CompressedFITSLoader to decompress tile compressed "
+        "FITS arrays. 0 or 1 decompresses them in the thread reading the file."
+    )
+    read_concurrency = _config.ConfigItem(
+        16,
+        "The maximum number of files read concurrently by ConcurrentFITSLoader."
+    )
+    fsspec_block_size = _config.ConfigItem(
+        2**20,
+        "The size in bytes of the blocks FSSpecFITSLoader reads files in."
+    )
+    fsspec_cache_directory = _config.ConfigItem(
+        "",
+        "A directory in which FSSpecFITSLoader caches the blocks of files it reads. "
+        "If empty blocks are not cached."
+    )
 
 
 conf = Conf()
@@ -130,27 +130,31 @@ class Dataset(NDCube):
 
     def _slice_headers(self, slice_):
         idx = self.files._fm._array_slice_to_loader_slice(slice_)
-        if idx == (np.s_[:],):
+        if all(slc == slice(None) for slc in idx):
             return self.headers.copy()
 
-        files_shape = [i for i in self.files.fileuri_array.shape if i != 1]
-        file_idx = []
-        for ax, slc in enumerate(idx):
-            if not isinstance(slc, slice):
-                slc = slice(slc, slc+1, 1)
-            else:
-                # mgrid has to have a stop, so if it's missing from the slice we
-                # add it.
-                stop = slc.stop or files_shape[ax]
-                slc = slice(slc.start, stop, slc.step)
-            file_idx.append(slc)
-        grid = np.mgrid[tuple(file_idx)]
-        file_idx = tuple(grid[i].ravel() for i in range(grid.shape[0]))
-        flat_idx = np.ravel_multi_index(file_idx[::-1], files_shape[::-1], order="F")
-
-        # Explicitly create new header table to ensure consistency
-        # Otherwise would return a reference sometimes and a new table others
-        return self.meta["headers"].copy()[flat_idx]
+        # Indexing the table with an array of rows only copies those rows
+        return self.meta["headers"][self._header_rows(self.files.fileuri_array.shape, idx)]
+
+    @staticmethod
+    def _header_rows(files_shape, idx):
+        """
+        The rows of the header table for the files selected by ``idx``.
+
+        There is one row per file, in the (C) order of the array of files, so
+        the row of each file is the sum of its index along each dimension
+        multiplied by the stride of that dimension. Only the rows of the
+        selected files are calculated.
+        """
+        idx = (*idx, *(slice(None),) * (len(files_shape) - len(idx)))
+        strides = np.cumprod((1, *files_shape[:0:-1]))[::-1]
+        rows = np.zeros((), dtype=int)
+        for size, stride, slc in zip(files_shape, strides, idx):
+            # Integer indices are kept as a dimension of length one, so the
+            # result is always a table
+            indices = range(size)[slc] if isinstance(slc, slice) else [range(size)[slc]]
+            rows = np.add.outer(rows, np.asarray(indices, dtype=int) * stride)
+        return rows.ravel()
 
     """
     Properties.
@@ -165,6 +169,9 @@ class Dataset(NDCube):
             This table is read from the asdf file and not from the FITS files,
             so any modifications to the FITS files will not be reflected here.
 
+        When the dataset is loaded with `~dkist.load_dataset` the columns of
+        this table are only converted from the asdf file when they are first
+        used, see `~dkist.io.asdf.lazy_table.LazyTable`.
         """
         return self.meta["headers"]
 
@@ -212,6 +219,39 @@ class Dataset(NDCube):
         from .loader import load_dataset  # noqa: PLC0415
         return load_dataset(filepath)
 
+    def to_zarr(self, store, *, chunks="auto", compressor=None, overwrite=False, storage_options=None):
+        """
+        Write the data and metadata of this dataset to a Zarr store.
+
+        The store can be loaded again with `dkist.load_dataset`, which reads
+        the data from the chunks of the store rather than the FITS files.
+
+        Parameters
+        ----------
+        store : `str` or `pathlib.Path` or `zarr.abc.store.Store`
+            The location of the store, a local path, a URL supported by
+            fsspec or a Zarr store object.
+        chunks : `tuple` or `str`, optional
+            The chunks of the array in the store. Defaults to ``"auto"``,
+            which uses chunks of up to dask's ``array.chunk-size``
+            configuration option.
+        compressor : `zarr.abc.codec.BytesBytesCodec`, optional
+            The codec used to compress the chunks, for example
+            ``zarr.codecs.BloscCodec(cname="zstd", clevel=5)``. If not
+            specified the default of the zarr package is used.
+        overwrite : `bool`, optional
+            If `True` replace an existing store.
+        storage_options : `dict`, optional
+            Options passed to fsspec if ``store`` is a URL.
+
+        See Also
+        --------
+        dkist.io.zarr_store.write_zarr
+        """
+        from dkist.io.zarr_store import write_zarr  # noqa: PLC0415
+        write_zarr(self, store, chunks=chunks, compressor=compressor,
+                   overwrite=overwrite, storage_options=storage_options)
+
     """
     Private methods.
     """
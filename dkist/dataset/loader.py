@@ -1,8 +1,11 @@
 import re
 import warnings
+import traceback
+import multiprocessing
 from pathlib import Path
-from functools import cache, singledispatch
+from functools import cache, partial, singledispatch
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 from packaging.version import Version
 from parfive import Results
@@ -10,7 +13,11 @@ from parfive import Results
 import asdf
 
 import dkist
+from dkist.io.asdf.converters import LazyTableExtension
 from dkist.io.asdf.entry_points import get_extensions as get_dkist_extensions
+from dkist.io.asdf.lazy_table import keep_open
+from dkist.io.utils import is_url
+from dkist.io.zarr_store import dataset_from_zarr_tree, is_zarr_store, open_zarr_group, read_zarr_tree
 from dkist.utils.exceptions import DKISTOutOfDateError, DKISTUserWarning
 
 ASDF_FILENAME_PATTERN = re.compile(
@@ -20,7 +27,8 @@ DKIST_EXTENSION_REGEX = re.compile(r"asdf:\/\/dkist\.nso\.edu\/dkist\/extensions
 
 
 @singledispatch
-def load_dataset(target, *, ignore_version_mismatch=False):
+def load_dataset(target, *, ignore_version_mismatch=False, loader=None, chunk_bytes=None, chunksize=None, dtype=None,
+                 lazy=False, workers=None):
     """
     Load a DKIST dataset from a variety of inputs.
 
@@ -29,13 +37,56 @@ def load_dataset(target, *, ignore_version_mismatch=False):
     and will either return a single object or a list of objects if multiple
     datasets are loaded.
 
+    Zarr stores written by `dkist.Dataset.to_zarr` can also be loaded, in
+    which case the data are read from the store rather than the FITS files.
+
     Parameters
     ----------
     target : {types}
-        The location of one or more ASDF files.
+        The location of one or more ASDF files or Zarr stores.
 
         {types_list}
 
+    ignore_version_mismatch : `bool`, optional
+        If `True` do not raise an error if the ASDF file was written with a
+        newer version of the dkist package.
+
+    loader : `type`, optional
+        The `~dkist.io.dask.loaders.BaseFITSLoader` subclass used to read the
+        data from the FITS files, for example
+        `~dkist.io.dask.loaders.MemmapFITSLoader`. If not specified the loader
+        is `~dkist.io.dask.loaders.AstropyFITSLoader`.
+
+    chunk_bytes : `int` or `str`, optional
+        Group consecutive FITS files into chunks of the Dask array of up to
+        this size. See `dkist.io.DKISTFileManager.chunk_bytes`.
+
+    chunksize : `tuple` of `int`, optional
+        Split each FITS file into multiple chunks of the Dask array, with this
+        chunk size in the frame dimensions. See
+        `dkist.io.DKISTFileManager.chunksize`.
+
+    dtype : `numpy.dtype`, optional
+        Cast the data to this dtype as each FITS file is read, for example
+        ``np.float32`` to halve the memory used by float64 data. See
+        `dkist.io.DKISTFileManager.dtype`.
+
+    lazy : `bool`, optional
+        If `True` memory map the arrays in the ASDF file, such as the WCS
+        lookup tables and the columns of the header table, rather than reading
+        them when the file is loaded. The file stays open until every header
+        column has been read, or until the dataset is garbage collected. This
+        has no effect when loading a Zarr store.
+
+    workers : `int`, optional
+        If given and more than one ASDF file is loaded, load them in a pool of
+        this many processes. The processes are started with the ``spawn``
+        method, which imports the ``__main__`` module of a script in each
+        process, so scripts must call `~dkist.load_dataset` inside an ``if
+        __name__ == "__main__":`` block. The datasets are pickled to send them
+        back from the workers, which loads all the columns of their header
+        tables, even if ``lazy`` is `True`.
+
     Returns
     -------
     datasets
@@ -52,6 +103,8 @@ def load_dataset(target, *, ignore_version_mismatch=False):
 
     >>> dkist.load_dataset(Path("/path/to/ABCDE"))  # doctest: +SKIP
 
+    >>> dkist.load_dataset("/path/to/ABCDE.zarr")  # doctest: +SKIP
+
     >>> from dkist.data.sample import VISP_L1_KMUPT  # doctest: +REMOTE_DATA
     >>> print(dkist.load_dataset(VISP_L1_KMUPT))  # doctest: +REMOTE_DATA
     This VISP Dataset consists of 1700 frames.
@@ -63,7 +116,7 @@ def load_dataset(target, *, ignore_version_mismatch=False):
     This Dataset has 4 pixel and 5 world dimensions.
     <BLANKLINE>
     The data are represented by a <class 'dask.array.core.Array'> object:
-    dask.array<reshape, shape=(4, 425, 980, 2554), dtype=float64, chunksize=(1, 1, 980, 2554), chunktype=numpy.ndarray>
+    dask.array<load_files, shape=(4, 425, 980, 2554), dtype=float64, chunksize=(1, 1, 980, 2554), chunktype=numpy.ndarray>
     <BLANKLINE>
     Array Dim  Axis Name                Data size  Bounds
             0  polarization state               4  None
@@ -95,48 +148,54 @@ def load_dataset(target, *, ignore_version_mismatch=False):
 
 
 @load_dataset.register
-def _load_from_results(results: Results, *, ignore_version_mismatch=False):
+def _load_from_results(results: Results, *, ignore_version_mismatch=False, **kwargs):
     """
     The results from a call to ``Fido.fetch``, all results must be valid DKIST ASDF files.
     """
-    return _load_from_iterable(results)
+    return _load_from_iterable(results, ignore_version_mismatch=ignore_version_mismatch, **kwargs)
 
 
 @load_dataset.register
-def _load_from_iterable(iterable: tuple | list, *, ignore_version_mismatch=False):
+def _load_from_iterable(iterable: tuple | list, *, ignore_version_mismatch=False, workers=None, **kwargs):
     """
     A list or tuple of valid inputs to ``load_dataset``.
     """
-    datasets = [load_dataset(item) for item in iterable]
+    if workers is not None and workers > 1 and len(iterable) > 1:
+        datasets = _load_in_processes(iterable, workers, ignore_version_mismatch=ignore_version_mismatch, **kwargs)
+    else:
+        datasets = [load_dataset(item, ignore_version_mismatch=ignore_version_mismatch, **kwargs) for item in iterable]
     if len(datasets) == 1:
         return datasets[0]
     return datasets
 
 
 @load_dataset.register
-def _load_from_string(path: str, *, ignore_version_mismatch=False):
+def _load_from_string(path: str, *, ignore_version_mismatch=False, workers=None, **kwargs):
     """
-    A string representing a directory or an ASDF file.
+    A string representing a directory, an ASDF file or the URL of a Zarr store.
     """
-    # TODO Adjust this to accept URLs as well
-    return _load_from_path(Path(path))
+    if is_url(path):
+        return _load_from_zarr(path, ignore_version_mismatch=ignore_version_mismatch, **kwargs)
+    return _load_from_path(Path(path), ignore_version_mismatch=ignore_version_mismatch, workers=workers, **kwargs)
 
 
 @load_dataset.register
-def _load_from_path(path: Path, *, ignore_version_mismatch=False):
+def _load_from_path(path: Path, *, ignore_version_mismatch=False, workers=None, **kwargs):
     """
-    A path object representing a directory or an ASDF file.
+    A path object representing a directory, an ASDF file or a Zarr store.
     """
     path = path.expanduser()
+    if is_zarr_store(path):
+        return _load_from_zarr(path, ignore_version_mismatch=ignore_version_mismatch, **kwargs)
     if not path.is_dir():
         if not path.exists():
             raise ValueError(f"{path} does not exist.")
-        return _load_from_asdf(path, ignore_version_mismatch=ignore_version_mismatch)
+        return _load_from_asdf(path, ignore_version_mismatch=ignore_version_mismatch, **kwargs)
 
-    return _load_from_directory(path, ignore_version_mismatch=ignore_version_mismatch)
+    return _load_from_directory(path, ignore_version_mismatch=ignore_version_mismatch, workers=workers, **kwargs)
 
 
-def _load_from_directory(directory, *, ignore_version_mismatch=False):
+def _load_from_directory(directory, *, ignore_version_mismatch=False, workers=None, **kwargs):
     """
     Construct a `~dkist.dataset.Dataset` from a directory containing one (or
     more) ASDF files and a collection of FITS files.
@@ -170,7 +229,7 @@ def _load_from_directory(directory, *, ignore_version_mismatch=False):
         raise ValueError(f"No asdf file found in directory {base_path}.")
 
     if len(asdf_files) == 1:
-        return _load_from_asdf(asdf_files[0], ignore_version_mismatch=ignore_version_mismatch)
+        return _load_from_asdf(asdf_files[0], ignore_version_mismatch=ignore_version_mismatch, **kwargs)
 
     candidates = []
     asdfs_to_load = []
@@ -218,33 +277,94 @@ def _load_from_directory(directory, *, ignore_version_mismatch=False):
         )
 
     if len(asdfs_to_load) == 1:
-        return _load_from_asdf(asdfs_to_load[0], ignore_version_mismatch=ignore_version_mismatch)
+        return _load_from_asdf(asdfs_to_load[0], ignore_version_mismatch=ignore_version_mismatch, **kwargs)
+
+    return _load_from_iterable(asdfs_to_load, ignore_version_mismatch=ignore_version_mismatch, workers=workers, **kwargs)
 
-    return _load_from_iterable(asdfs_to_load, ignore_version_mismatch=ignore_version_mismatch)
 
+def _load_in_processes(items, workers, **kwargs):
+    """
+    Load each of ``items`` with `load_dataset` in a pool of ``workers`` processes.
+
+    The warnings and errors are raised in the order of ``items``, as if they
+    had been loaded one at a time.
+    """
+    datasets = []
+    # Spawn rather than fork the workers, as forking a process with threads is unsafe.
+    executor = ProcessPoolExecutor(min(workers, len(items)), mp_context=multiprocessing.get_context("spawn"))
+    try:
+        for dataset, caught, error in executor.map(partial(_load_in_worker, kwargs=kwargs), items):
+            for message, category, filename, lineno in caught:
+                warnings.warn_explicit(message, category, filename, lineno)
+            if error is not None:
+                raise error
+            datasets.append(dataset)
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return datasets
 
-def _load_from_asdf(filepath, *, ignore_version_mismatch=False):
+
+def _load_in_worker(item, kwargs):
+    """
+    Load one item in a worker process, returning the dataset, the warnings and any error.
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        # Record every warning, the filters of the parent process are applied when they are emitted again
+        warnings.simplefilter("always")
+        try:
+            dataset, error = load_dataset(item, **kwargs), None
+        # Any error is sent back to be raised in the parent process, in the order of the items
+        except Exception as e:  # noqa: BLE001
+            # The traceback is not sent back with the error
+            e.add_note(f"Raised while loading {item} in a worker process:\n{''.join(traceback.format_exception(e))}")
+            dataset, error = None, e
+    return dataset, [(w.message, w.category, w.filename, w.lineno) for w in caught], error
+
+
+def _load_from_asdf(filepath, *, ignore_version_mismatch=False, lazy=False, **kwargs):
     from dkist.dataset import Dataset, Inversion, TiledDataset  # noqa: PLC0415
 
     # Load the file without a custom schema so that we can validate it against multiple schemas
-    with asdf.open(filepath, lazy_load=False, memmap=False) as ff:
+    # Tables, such as the headers, are read with columns which are only converted when they are used
+    ff = asdf.open(filepath, lazy_load=lazy, memmap=lazy, extensions=[_lazy_table_extension()])
+    try:
         if not ignore_version_mismatch:
             _check_dkist_version(filepath, ff)
 
         # First validate against level 1
         if "dataset" in ff.tree and isinstance(ff.tree["dataset"], (Dataset, TiledDataset)):
-            return _load_l1_from_asdf(ff, filepath)
+            loaded = _load_l1_from_asdf(ff, filepath, **kwargs)
         # If l1 validation fails, assume l2
-        if "inversion" in ff.tree and isinstance(ff.tree["inversion"], Inversion):
-            return _load_l2_from_asdf(ff, filepath)
+        elif "inversion" in ff.tree and isinstance(ff.tree["inversion"], Inversion):
+            loaded = _load_l2_from_asdf(ff, filepath)
+        else:
+            # If you get here, it's neither level 1 nor 2
+            raise TypeError(
+                f"File {filepath} is not a valid level 1 or level 2 DKIST file. Expected a `dataset` or `inversion` key with the correct types."
+            )
+    except BaseException:
+        ff.close()
+        raise
 
-        # If you get here, it's neither level 1 nor 2
-        raise TypeError(
-            f"File {filepath} is not a valid level 1 or level 2 DKIST file. Expected a `dataset` or `inversion` key with the correct types."
-        )
+    if lazy:
+        # The header columns are memory mapped from the file when they are first used
+        keep_open(ff, _header_tables(loaded))
+    else:
+        ff.close()
+    return loaded
+
+
+def _header_tables(loaded):
+    from dkist.dataset import Dataset, TiledDataset  # noqa: PLC0415
 
+    if isinstance(loaded, TiledDataset):
+        return [loaded.combined_headers, *(ds.headers for ds in loaded.flat)]
+    if isinstance(loaded, Dataset):
+        return [loaded.headers]
+    return []
 
-def _load_l1_from_asdf(asdf_file, filepath):
+
+def _load_l1_from_asdf(asdf_file, filepath, *, loader=None, chunk_bytes=None, chunksize=None, dtype=None):
     """
     Construct a dataset object from a filepath of a suitable asdf file.
     """
@@ -253,14 +373,53 @@ def _load_l1_from_asdf(asdf_file, filepath):
     base_path = filepath.parent
     ds = asdf_file.tree["dataset"]
     ds.meta["history"] = asdf_file.tree["history"]
-    if isinstance(ds, TiledDataset):
-        for sub in ds.flat:
-            sub.files.basepath = base_path
-    else:
-        ds.files.basepath = base_path
+    datasets = ds.flat if isinstance(ds, TiledDataset) else [ds]
+    for sub in datasets:
+        sub.files.basepath = base_path
+        _set_file_options(sub.files, loader=loader, chunk_bytes=chunk_bytes, chunksize=chunksize, dtype=dtype)
+        if any(option is not None for option in (loader, chunk_bytes, chunksize, dtype)):
+            # Regenerate the array with the new options
+            sub.data = sub.files.dask_array
+    return ds
+
+
+def _load_from_zarr(store, *, ignore_version_mismatch=False, lazy=False, dtype=None, **kwargs):
+    """
+    Construct a dataset object from a Zarr store written by ``Dataset.to_zarr``.
+
+    The data are read from the store, the other options only apply to the
+    file manager of the original FITS files. ``lazy`` has no effect, the
+    store is always read lazily.
+    """
+    from dkist.dataset import TiledDataset  # noqa: PLC0415
+
+    group = open_zarr_group(store)
+    with read_zarr_tree(group) as ff:
+        if not ignore_version_mismatch:
+            _check_dkist_version(store, ff)
+        ds = dataset_from_zarr_tree(ff.tree, group)
+        ds.meta["history"] = ff.tree["history"]
+
+    datasets = ds.flat if isinstance(ds, TiledDataset) else [ds]
+    for sub in datasets:
+        if sub.files is not None:
+            _set_file_options(sub.files, dtype=dtype, **kwargs)
+        if dtype is not None:
+            sub.data = sub.data.astype(dtype)
     return ds
 
 
+def _set_file_options(files, *, loader=None, chunk_bytes=None, chunksize=None, dtype=None):
+    if loader is not None:
+        files.loader = loader
+    if chunk_bytes is not None:
+        files.chunk_bytes = chunk_bytes
+    if chunksize is not None:
+        files.chunksize = chunksize
+    if dtype is not None:
+        files.dtype = dtype
+
+
 def _load_l2_from_asdf(asdf_file, filepath):
     """
     Construct a level 2 inversion object from a filepath of a suitable asdf file.
@@ -271,6 +430,12 @@ def _load_l2_from_asdf(asdf_file, filepath):
     return inv
 
 
+@cache
+def _lazy_table_extension():
+    # The same instance is used for every file, so that asdf can reuse its extension manager
+    return LazyTableExtension()
+
+
 @cache
 def _get_dkist_uris():
     return [e.extension_uri for e in get_dkist_extensions()]
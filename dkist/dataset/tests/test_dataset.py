@@ -7,6 +7,7 @@ import pytest
 import asdf
 import astropy.units as u
 import gwcs
+from astropy.table import Table
 from astropy.table.row import Row
 from astropy.tests.helper import assert_quantity_allclose
 
@@ -192,6 +193,28 @@ def test_header_slicing_3D_slice(large_visp_dataset):
     assert (sliced.headers["DINDEX3", "DINDEX4"] == sliced_headers["DINDEX3", "DINDEX4"]).all()
 
 
+@pytest.mark.accept_cli_dataset
+@pytest.mark.parametrize("idx", [
+    np.s_[1, -5:],
+    np.s_[-3:-1, 18],
+    np.s_[2:, 3:7, 10],
+    np.s_[:, 5:5],
+])
+def test_header_slicing_rows(mocker, large_visp_dataset, idx):
+    dataset = large_visp_dataset
+    file_idx = dataset.files._fm._array_slice_to_loader_slice(idx)
+    rows = np.arange(len(dataset.headers)).reshape(dataset.files.fileuri_array.shape)[file_idx]
+
+    spy = mocker.spy(Table, "copy")
+    sliced = dataset[idx]
+    # Only the selected rows are copied, not the whole table
+    assert spy.call_count == 0
+
+    assert isinstance(sliced.headers, Table)
+    assert len(sliced.headers) == len(sliced.files) == rows.size
+    assert (sliced.headers["DINDEX3", "DINDEX4"] == dataset.headers[rows.ravel()]["DINDEX3", "DINDEX4"]).all()
+
+
 @pytest.mark.accept_cli_dataset
 def test_file_slicing_with_dummy_axis(dataset_5d_dummy_filemanager_axis):
     ds = dataset_5d_dummy_filemanager_axis
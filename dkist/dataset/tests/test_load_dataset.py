@@ -1,17 +1,24 @@
+import gc
 import re
+import mmap
 import shutil
 import numbers
+import weakref
 import contextlib
 
+import numpy as np
 import pytest
+from numpy.testing import assert_allclose
 from parfive import Results
 
 import asdf
 from asdf.tags.core import ExtensionMetadata, Software
+from astropy.modeling.models import Tabular1D
 
 from dkist import Dataset, TiledDataset, load_dataset
 from dkist.data.test import rootdir
 from dkist.dataset.loader import ASDF_FILENAME_PATTERN, DKIST_EXTENSION_REGEX
+from dkist.io.dask.loaders import MemmapFITSLoader
 from dkist.utils.exceptions import DKISTOutOfDateError, DKISTUserWarning
 
 
@@ -98,11 +105,147 @@ def test_multiple_from_dir(multiple_asdf_in_folder):
     assert all(isinstance(d, Dataset) for d in ds)
 
 
+def test_load_with_loader(asdf_path):
+    ds = load_dataset(asdf_path, loader=MemmapFITSLoader)
+    assert ds.files.loader is MemmapFITSLoader
+    assert all(isinstance(fl, MemmapFITSLoader) for fl in ds.files._fm._striped_external_array.loader_array.flat)
+
+    ds.files.basepath = rootdir / "EIT"
+    default_ds = load_dataset(asdf_path)
+    default_ds.files.basepath = rootdir / "EIT"
+    assert not np.isnan(ds.data).any()
+    assert_allclose(ds.data, default_ds.data)
+
+
+def test_load_with_chunk_bytes(asdf_path):
+    ds = load_dataset(asdf_path, chunk_bytes="1GiB")
+    assert ds.files.chunk_bytes == "1GiB"
+    assert ds.data.numblocks == (1, 1, 1)
+
+
+def test_load_with_dtype(asdf_path):
+    ds = load_dataset(asdf_path, dtype=np.float32)
+    assert ds.files.dtype == np.float32
+    assert ds.data.dtype == np.float32
+
+    ds.files.basepath = rootdir / "EIT"
+    default_ds = load_dataset(asdf_path)
+    default_ds.files.basepath = rootdir / "EIT"
+    assert ds.data.compute().dtype == np.float32
+    assert_allclose(ds.data, default_ds.data.astype(np.float32))
+
+
 def test_tiled_dataset(asdf_tileddataset_path):
     ds = load_dataset(asdf_tileddataset_path)
     assert isinstance(ds, TiledDataset)
 
 
+def _base(array):
+    while getattr(array, "base", None) is not None:
+        array = array.base
+    return array
+
+
+def test_load_lazy(large_visp_dataset_file):
+    ds = load_dataset(large_visp_dataset_file, lazy=True)
+    eager = load_dataset(large_visp_dataset_file)
+    asdf_file = weakref.ref(ds.headers._lazy_columns["NAXIS1"].file.asdf_file)
+    assert not asdf_file()._closed
+
+    column = ds.headers["NAXIS1"]
+    assert isinstance(_base(column), mmap.mmap)
+    assert (column == eager.headers["NAXIS1"]).all()
+    lookup_tables = [model.lookup_table for model in ds.wcs.forward_transform.traverse_postorder()
+                     if isinstance(model, Tabular1D)]
+    assert lookup_tables
+    assert all(isinstance(_base(table), mmap.mmap) for table in lookup_tables)
+
+    sliced = ds[0]
+    del ds
+    gc.collect()
+    # The sliced headers can still be read from the file
+    assert not asdf_file()._closed
+    assert (sliced.headers["NAXIS2"] == eager[0].headers["NAXIS2"]).all()
+
+    del sliced
+    gc.collect()
+    assert asdf_file() is None
+    # Columns which were already memory mapped are still valid
+    assert (column == eager.headers["NAXIS1"]).all()
+    assert all((table == eager_table).all() for table, eager_table in
+               zip(lookup_tables, [model.lookup_table for model in eager.wcs.forward_transform.traverse_postorder()
+                                   if isinstance(model, Tabular1D)]))
+
+
+def test_load_lazy_closed_when_loaded(large_visp_dataset_file, mocker):
+    ds = load_dataset(large_visp_dataset_file, lazy=True)
+    close = mocker.spy(ds.headers._lazy_columns["NAXIS1"].file.asdf_file, "close")
+    sliced = ds.headers[["NAXIS1", "NAXIS2"]][10:20]
+    sliced["NAXIS1"]
+    sliced["NAXIS2"]
+    assert close.call_count == 0
+
+    # The file is closed as soon as the last column is loaded, without waiting for garbage collection
+    repr(ds.headers)
+    assert close.call_count == 1
+    assert len(ds.headers["NAXIS1"]) == 80
+    assert (ds.headers[10:20]["NAXIS2"] == sliced["NAXIS2"]).all()
+    del ds, sliced
+    gc.collect()
+    assert close.call_count == 1
+
+
+def test_load_lazy_sliced_after_closed(large_visp_dataset_file):
+    ds = load_dataset(large_visp_dataset_file, lazy=True)
+    eager = load_dataset(large_visp_dataset_file)
+    # Holding a reference to the file would keep the blocks readable after it is closed
+    asdf_file = weakref.ref(ds.headers._lazy_columns["NAXIS1"].file.asdf_file)
+    for name in ds.headers.colnames:
+        ds.headers[name]
+    assert asdf_file() is None or asdf_file()._closed
+
+    # The columns are still used after the file has been closed
+    assert len(ds.headers) == len(eager.headers)
+    assert (ds.headers[:3]["NAXIS2"] == eager.headers[:3]["NAXIS2"]).all()
+    sliced = ds[0, 1:3]
+    assert (sliced.headers["NAXIS2"] == eager[0, 1:3].headers["NAXIS2"]).all()
+
+
+def test_load_lazy_tiled(asdf_tileddataset_path):
+    ds = load_dataset(asdf_tileddataset_path, lazy=True)
+    eager = load_dataset(asdf_tileddataset_path)
+    assert isinstance(ds, TiledDataset)
+    for tile, eager_tile in zip(ds.flat, eager.flat):
+        assert tile.headers.colnames == eager_tile.headers.colnames
+        assert (tile.headers["NAXIS1"] == eager_tile.headers["NAXIS1"]).all()
+
+
+def test_load_workers(tmp_path, asdf_path, large_visp_dataset_file):
+    old_names = generate_asdf_folder(tmp_path, asdf_path, ["VBI_L1_20231016T184519_AJQWW.asdf",
+                                                           "VBI_L1_20231016T184519_AJQWW_metadata.asdf"])
+    targets = [large_visp_dataset_file, asdf_path, old_names]
+    with pytest.warns(DKISTUserWarning, match="VBI_L1_20231016T184519_AJQWW.asdf"):
+        datasets = load_dataset(targets, workers=2)
+
+    with pytest.warns(DKISTUserWarning):
+        expected = load_dataset(targets)
+    assert len(datasets) == 3
+    for ds, expected_ds in zip(datasets, expected):
+        assert (ds.files.fileuri_array == expected_ds.files.fileuri_array).all()
+        assert ds.headers.colnames == expected_ds.headers.colnames
+        assert ds.data.shape == expected_ds.data.shape
+        assert ds.files.basepath == expected_ds.files.basepath
+
+
+def test_load_workers_error(tmp_path, asdf_path):
+    af = asdf.AsdfFile({"hello": "world"})
+    af.write_to(tmp_path / "test.asdf")
+
+    with pytest.raises(TypeError, match="not a valid level 1 or level 2 DKIST") as exc_info:
+        load_dataset([asdf_path, tmp_path / "test.asdf", tmp_path / "missing.asdf"], workers=2)
+    assert any("in a worker process" in note for note in exc_info.value.__notes__)
+
+
 def test_errors(tmp_path):
     with pytest.raises(TypeError, match="Input type dict"):
         load_dataset({})
@@ -441,6 +441,18 @@ class TiledDataset(Collection):
 
         return TiledDatasetSlicer(self._data, self.meta)
 
+    def to_zarr(self, store, *, chunks="auto", compressor=None, overwrite=False, storage_options=None):
+        """
+        Write the data and metadata of all the tiles to a Zarr store.
+
+        Each tile is written to its own array in the store, and the store can
+        be loaded again with `dkist.load_dataset`. See `.Dataset.to_zarr` for
+        a description of the parameters.
+        """
+        from dkist.io.zarr_store import write_zarr  # noqa: PLC0415
+        write_zarr(self, store, chunks=chunks, compressor=compressor,
+                   overwrite=overwrite, storage_options=storage_options)
+
     # TODO: def regrid()
 
     def __repr__(self):
@@ -1,6 +1,7 @@
 from .dataset import DatasetConverter
 from .file_manager import FileManagerConverter
 from .inversion import InversionConverter
+from .lazy_table import LazyTableExtension, LazyTableSaveConverter
 from .models import (AsymmetricMappingConverter, CoupledCompoundConverter,
                      RavelConverter, VaryingCelestialConverter)
 from .profiles import ProfilesConverter
@@ -40,6 +40,6 @@ class FileManagerConverter(Converter):
         node["target"] = obj._striped_external_array.target
         node["datatype"] = obj._striped_external_array.dtype
         node["shape"] = obj._striped_external_array.shape
-        if chunksize := obj._striped_external_array.chunksize is not None:
-            node["chunksize"] = chunksize
+        if (chunksize := obj._striped_external_array.chunksize) is not None:
+            node["chunksize"] = list(chunksize)
         return node
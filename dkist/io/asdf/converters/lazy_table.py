@@ -0,0 +1,100 @@
+import asdf
+from asdf.extension import Converter, Extension
+from asdf.util import uri_match
+
+__all__ = ["LazyTableConverter", "LazyTableExtension", "LazyTableSaveConverter"]
+
+
+class LazyColumnConverter(Converter):
+    """
+    Read columns as the node of the column, so they are only converted when the table needs them.
+    """
+    tags = ["tag:stsci.edu:asdf/core/column-*", "tag:stsci.edu:asdf/table/column-*"]
+    types = []
+
+    def select_tag(self, obj, tags, ctx):
+        raise NotImplementedError("This converter is only used to read columns.")
+
+    def to_yaml_tree(self, obj, tag, ctx):
+        raise NotImplementedError("This converter is only used to read columns.")
+
+    def from_yaml_tree(self, node, tag, ctx):
+        from dkist.io.asdf.lazy_table import _LazyColumn
+
+        return _LazyColumn(node)
+
+
+class LazyTableConverter(Converter):
+    """
+    Read tables as a `~dkist.io.asdf.lazy_table.LazyTable`.
+
+    Tables containing mixin columns, such as `~astropy.units.Quantity`, and
+    `~astropy.table.QTable` are read as they are by asdf-astropy.
+    """
+    tags = ["tag:astropy.org:astropy/table/table-*", "tag:stsci.edu:asdf/core/table-*",
+            "tag:stsci.edu:asdf/table/table-*"]
+    types = []
+
+    def select_tag(self, obj, tags, ctx):
+        raise NotImplementedError("This converter is only used to read tables.")
+
+    def to_yaml_tree(self, obj, tag, ctx):
+        raise NotImplementedError("This converter is only used to read tables.")
+
+    def from_yaml_tree(self, node, tag, ctx):
+        from astropy.table import QTable, Table
+
+        from dkist.io.asdf.lazy_table import LazyTable, _LazyColumn
+
+        columns = node["columns"]
+        # The asdf table tags don't store the names separately to the columns
+        colnames = node.get("colnames", [getattr(column, "name", None) for column in columns])
+        if node.get("qtable", False) or not all(isinstance(column, _LazyColumn) for column in columns):
+            columns = [column.load() if isinstance(column, _LazyColumn) else column for column in columns]
+            table = QTable(meta=node.get("meta")) if node.get("qtable", False) else Table(meta=node.get("meta"))
+            for name, column in zip(colnames, columns):
+                table[name] = column
+            return table
+
+        for name, column in zip(colnames, columns):
+            column.name = name
+        return LazyTable(columns, meta=node.get("meta"))
+
+
+class LazyTableSaveConverter(Converter):
+    """
+    Save a `~dkist.io.asdf.lazy_table.LazyTable` as an `~astropy.table.Table`.
+    """
+    tags = []
+    types = ["dkist.io.asdf.lazy_table.LazyTable"]
+
+    def select_tag(self, obj, tags, ctx):
+        # Defer to the converter of the Table the columns are loaded into
+        return None
+
+    def to_yaml_tree(self, obj, tag, ctx):
+        obj._lazy_load_all()
+        return obj
+
+    def from_yaml_tree(self, node, tag, ctx):
+        raise NotImplementedError("This converter is only used to save tables.")
+
+
+class LazyTableExtension(Extension):
+    """
+    An extension which reads tables with `LazyTableConverter`.
+
+    This extension is not registered with asdf, it is passed to `asdf.open`
+    when loading datasets so that only the header tables of datasets are
+    read lazily.
+    """
+    extension_uri = "asdf://dkist.nso.edu/extensions/lazy-table-1.0.0"
+    converters = [LazyColumnConverter(), LazyTableConverter()]
+
+    @property
+    def tags(self):
+        # The converters of an extension passed to asdf.open only take
+        # precedence for the tags which the extension lists explicitly.
+        patterns = [pattern for converter in self.converters for pattern in converter.tags]
+        return sorted({tag.tag_uri for extension in asdf.get_config().extensions for tag in extension.tags
+                       if any(uri_match(pattern, tag.tag_uri) for pattern in patterns)})
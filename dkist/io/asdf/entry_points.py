@@ -8,7 +8,8 @@ from asdf.resource import DirectoryResourceMapping
 
 from dkist.io.asdf.converters import (AsymmetricMappingConverter, CoupledCompoundConverter,
                                       DatasetConverter, FileManagerConverter,
-                                      InversionConverter, ProfilesConverter, RavelConverter,
+                                      InversionConverter, LazyTableSaveConverter, ProfilesConverter,
+                                      RavelConverter,
                                       TiledDatasetConverter, VaryingCelestialConverter)
 
 
@@ -37,7 +38,8 @@ def get_extensions():
     """
     Get the list of extensions.
     """
-    dkist_converters = [FileManagerConverter(), DatasetConverter(), TiledDatasetConverter(), InversionConverter(), ProfilesConverter()]
+    dkist_converters = [FileManagerConverter(), DatasetConverter(), TiledDatasetConverter(), InversionConverter(), ProfilesConverter(),
+                        LazyTableSaveConverter()]
     wcs_converters = [VaryingCelestialConverter(), CoupledCompoundConverter(), RavelConverter(), AsymmetricMappingConverter()]
     return [
         ManifestExtension.from_uri("asdf://dkist.nso.edu/manifests/dkist-1.6.0",
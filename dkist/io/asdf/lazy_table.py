@@ -0,0 +1,267 @@
+"""
+A table which converts its columns from an ASDF file only when they are used.
+
+The header tables of large datasets have hundreds of columns and a row for
+every file, but most uses of them only need a few columns. A `LazyTable`
+keeps the ASDF node of each column, and only creates the
+`~astropy.table.Column` when the column is first accessed.
+"""
+import threading
+from functools import wraps
+
+import numpy as np
+
+from astropy.table import Column, MaskedColumn, Table
+
+__all__ = ["LazyTable", "keep_open"]
+
+
+class _LazyColumn:
+    """
+    The ASDF node of a column, which is converted to a `~astropy.table.Column` when it is loaded.
+    """
+    __slots__ = ["array", "file", "name", "node"]
+
+    def __init__(self, node, name=None):
+        self.node = node
+        self.name = node["name"] if name is None else name
+        # An _OpenFile if the array is read from the file when it is first loaded
+        self.file = None
+        # The array of the column, once it has been read
+        self.array = None
+
+    def __len__(self):
+        if self.array is not None:
+            # The file may have been closed once all the columns were read
+            return len(self.array)
+        # This is the shape in the ASDF tree, so doesn't read the array
+        return self.node["data"].shape[0]
+
+    def _array(self):
+        if self.array is None:
+            data = self.node["data"]
+            if not isinstance(data, np.ndarray):
+                # An asdf NDArrayType, from a file opened with lazy_load=True, which
+                # memory maps the array. np.asarray would use its __array_interface__,
+                # which drops the mask of masked columns.
+                data = data.__array__()
+            self.array = data
+            if self.file is not None:
+                self.file.loaded(self)
+                self.file = None
+        return self.array
+
+    def load(self, rows=None, copy=False):
+        """
+        Create the column, with only the given rows if ``rows`` is not `None`.
+
+        The column shares memory with the array in the ASDF file unless
+        ``copy`` is `True` or ``rows`` is an index array.
+        """
+        data = self._array()
+        if isinstance(rows, range):
+            data = data[slice(rows.start, rows.stop if rows.stop >= 0 else None, rows.step)]
+        elif rows is not None:
+            data = data[rows]
+        column_class = MaskedColumn if isinstance(data, np.ma.MaskedArray) else Column
+        return column_class(data=data, name=self.name, description=self.node.get("description"),
+                            unit=self.node.get("unit"), meta=self.node.get("meta"), copy=copy)
+
+
+class _OpenFile:
+    """
+    Closes an asdf file once all the columns read from it have been loaded, or when it is garbage collected.
+    """
+    __slots__ = ["_lock", "_pending", "asdf_file"]
+
+    def __init__(self, asdf_file, columns):
+        self.asdf_file = asdf_file
+        self._lock = threading.Lock()
+        # The ids of the columns which have not been loaded, so this doesn't keep them alive
+        self._pending = {id(column) for column in columns}
+
+    def loaded(self, column):
+        """
+        Record that the array of ``column`` has been read, closing the file if it was the last one.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            self._pending.discard(id(column))
+            if self._pending:
+                return
+        self.asdf_file.close()
+
+    def __del__(self):
+        # The tree of the file references the columns which reference this,
+        # so this is garbage collected with the file as part of that cycle.
+        if self._pending:
+            self.asdf_file.close()
+
+
+def keep_open(asdf_file, tables):
+    """
+    Keep ``asdf_file`` open while any of the columns of ``tables`` may still be loaded from it.
+
+    The arrays of columns read from a file opened with ``lazy_load=True`` are
+    only read when the column is loaded, so the file must stay open until
+    then. The file is closed as soon as every column has been loaded, or when
+    all the columns which have not been loaded are garbage collected, which
+    happens when every table containing them has been garbage collected.
+    Arrays which have already been memory mapped from the file remain valid
+    after it is closed.
+
+    Parameters
+    ----------
+    asdf_file : `asdf.AsdfFile`
+        The open file.
+    tables : iterable of `astropy.table.Table`
+        The tables read from the file, any which are not a `LazyTable` are ignored.
+    """
+    columns = {id(column): column for table in tables if isinstance(table, LazyTable) and table._lazy
+               for column in table._lazy_columns.values() if column.array is None}
+    if not columns:
+        asdf_file.close()
+        return
+    open_file = _OpenFile(asdf_file, columns.values())
+    for column in columns.values():
+        column.file = open_file
+
+
+# The attributes of a LazyTable which can be used without loading all the columns
+_LAZY_ATTRIBUTES = frozenset({"__class__", "__dict__", "_meta", "meta", "colnames", "keys", "copy"})
+
+
+class LazyTable(Table):
+    """
+    An `astropy.table.Table` which creates each column from an ASDF file when it is first accessed.
+
+    Getting a column by name, selecting some of the columns or rows, copying
+    the table and taking its length only load the columns which are needed.
+    Selecting columns or rows returns another `LazyTable`. Any other use of
+    the table loads all its columns, after which it is an ordinary
+    `~astropy.table.Table`.
+
+    Called with anything other than a list of columns read from an ASDF
+    file, such as by `~astropy.table.vstack` creating a table of the same
+    class as its inputs, this creates an ordinary `~astropy.table.Table`.
+
+    Parameters
+    ----------
+    columns : `list`
+        The nodes of the columns in the ASDF tree.
+    meta : `dict`, optional
+        The metadata of the table.
+    """
+
+    def __new__(cls, columns=None, *args, **kwargs):
+        lazy_kwargs = {"meta", "_rows", "_copy"}
+        if (isinstance(columns, list) and all(isinstance(column, _LazyColumn) for column in columns)
+                and not args and lazy_kwargs.issuperset(kwargs)):
+            return super().__new__(cls)
+        # The result isn't a LazyTable, so LazyTable.__init__ isn't called
+        return Table(columns, *args, **kwargs)
+
+    def __init__(self, columns, meta=None, *, _rows=None, _copy=False):
+        super().__init__(meta=meta)
+        self._lazy_columns = {column.name: column for column in columns}
+        self._lazy_loaded = {}
+        # The selected rows of the columns as a range or an index array, or None for all of them
+        self._lazy_rows = _rows
+        # If the columns are loaded as copies of the arrays in the file
+        self._lazy_copy = _copy
+
+    def __getattribute__(self, name):
+        if name not in _LAZY_ATTRIBUTES and not name.startswith("_lazy"):
+            if object.__getattribute__(self, "__dict__").get("_lazy_columns") is not None:
+                object.__getattribute__(self, "_lazy_load_all")()
+        return object.__getattribute__(self, name)
+
+    @property
+    def _lazy(self):
+        return self.__dict__.get("_lazy_columns") is not None
+
+    def _lazy_column(self, name):
+        if name not in self._lazy_loaded:
+            column = self._lazy_columns[name]
+            self._lazy_loaded[name] = column.load(self._lazy_rows, copy=self._lazy_copy)
+        return self._lazy_loaded[name]
+
+    def _lazy_new(self, names=None, rows=None, *, copy=False):
+        """
+        A new `LazyTable` of some of the columns, and the ``rows`` slice or index array of the rows.
+        """
+        names = list(self._lazy_columns) if names is None else names
+        loaded = {name: column for name, column in self._lazy_loaded.items() if name in names}
+        new_rows = self._lazy_rows
+        if rows is not None:
+            current = range(len(self)) if self._lazy_rows is None else self._lazy_rows
+            # Slicing a range gives a range, so slices of slices still give views of the arrays
+            new_rows = current[rows] if isinstance(rows, slice) else np.asarray(current)[rows]
+            loaded = {name: column[rows] for name, column in loaded.items()}
+        if copy:
+            loaded = {name: column.copy() for name, column in loaded.items()}
+        table = LazyTable([self._lazy_columns[name] for name in names], meta=self.meta,
+                          _rows=new_rows, _copy=copy or self._lazy_copy)
+        table._lazy_loaded = loaded
+        return table
+
+    def _lazy_load_all(self):
+        """
+        Load all the columns, and make this an ordinary `~astropy.table.Table`.
+        """
+        columns = [self._lazy_column(name) for name in self._lazy_columns]
+        del self._lazy_columns, self._lazy_loaded, self._lazy_rows, self._lazy_copy
+        self.__class__ = Table
+        if columns:
+            self.add_columns(columns, copy=False)
+
+    @property
+    def colnames(self):
+        if self._lazy:
+            return list(self._lazy_columns)
+        return super().colnames
+
+    def keys(self):
+        return self.colnames
+
+    def __len__(self):
+        if not self._lazy:
+            return super().__len__()
+        if self._lazy_rows is not None:
+            return len(self._lazy_rows)
+        return len(next(iter(self._lazy_columns.values()), ()))
+
+    def __getitem__(self, item):
+        if self._lazy:
+            if isinstance(item, str):
+                return self._lazy_column(item)
+            if isinstance(item, (list, tuple)) and item and all(isinstance(name, str) for name in item):
+                missing = set(item).difference(self._lazy_columns)
+                if missing:
+                    raise KeyError(f"Columns {sorted(missing)} do not exist")
+                return self._lazy_new(names=list(item))
+            if isinstance(item, slice) or (isinstance(item, np.ndarray) and item.ndim == 1
+                                           and item.dtype.kind in "iub"):
+                return self._lazy_new(rows=item)
+        return super().__getitem__(item)
+
+    def copy(self, copy_data=True):
+        if self._lazy:
+            return self._lazy_new(copy=copy_data)
+        return super().copy(copy_data=copy_data)
+
+
+def _loads_all_columns(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._lazy_load_all()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Special methods are looked up on the class, not through __getattribute__,
+# so the ones defined by Table have to load all the columns explicitly.
+for _name in ("__array__", "__bytes__", "__copy__", "__deepcopy__", "__delitem__", "__eq__", "__getstate__",
+              "__ior__", "__ne__", "__or__", "__repr__", "__setitem__", "__str__"):
+    setattr(LazyTable, _name, _loads_all_columns(getattr(Table, _name)))
@@ -14,7 +14,6 @@ import dkist
 from dkist.data.test import rootdir
 from dkist.io import DKISTFileManager
 from dkist.io.dask.loaders import AstropyFITSLoader
-from dkist.utils.exceptions import DKISTDeprecationWarning
 
 
 @pytest.fixture
@@ -36,6 +35,13 @@ def test_roundtrip_file_manager(file_manager):
     assert newobj == file_manager._fm
 
 
+def test_roundtrip_file_manager_chunksize(file_manager):
+    file_manager.chunksize = (16, 32)
+    newobj = roundtrip_object(file_manager._fm)
+    assert newobj == file_manager._fm
+    assert tuple(newobj.chunksize) == (16, 32)
+
+
 def assert_dataset_equal(new, old):
     old_headers = old.meta.pop("headers")
     new_headers = new.meta.pop("headers")
@@ -140,8 +146,6 @@ def test_read_all_schema_versions(eit_dataset_asdf_path):
 
 def test_loader_getitem_with_chunksize(eit_dataset_asdf_path):
     """
-    This test is a legacy test, as chunksize is no longer really supported.
-
     This test verifies that the chunksize of the output array changes.
     """
     chunksize = (32, 16)
@@ -149,9 +153,9 @@ def test_loader_getitem_with_chunksize(eit_dataset_asdf_path):
         dataset = tree["dataset"]
         dataset.files.basepath = rootdir / "EIT"
         dataset.files._fm._striped_external_array.chunksize = chunksize
-        with pytest.warns(DKISTDeprecationWarning, match="non-default chunksize"):
-            dask_array = dataset.files._fm.dask_array
+        dask_array = dataset.files._fm.dask_array
         assert dask_array.chunksize == (1, *chunksize)
+        np.testing.assert_allclose(dask_array, dataset.data)
 
 
 def test_read_wcs_with_backwards_affine():
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+import asdf
+import astropy.units as u
+from astropy.table import QTable, Table, hstack, vstack
+
+from dkist import load_dataset
+from dkist.io.asdf.converters import LazyTableExtension
+from dkist.io.asdf.lazy_table import LazyTable, _LazyColumn
+
+
+@pytest.fixture
+def lazy_headers(large_visp_dataset_file):
+    return load_dataset(large_visp_dataset_file).headers
+
+
+@pytest.fixture(scope="module")
+def eager_headers(large_visp_dataset_file):
+    with asdf.open(large_visp_dataset_file, lazy_load=False, memmap=False) as ff:
+        return ff.tree["dataset"].headers
+
+
+def assert_table_equal(lazy, eager):
+    assert lazy.colnames == eager.colnames
+    assert len(lazy) == len(eager)
+    for name in eager.colnames:
+        assert (lazy[name] == eager[name]).all()
+
+
+def test_columns_loaded_on_access(mocker, lazy_headers, eager_headers):
+    spy = mocker.spy(_LazyColumn, "load")
+    assert isinstance(lazy_headers, LazyTable)
+    assert lazy_headers.colnames == eager_headers.colnames
+    assert len(lazy_headers) == len(eager_headers)
+    assert spy.call_count == 0
+
+    column = lazy_headers["NAXIS1"]
+    assert lazy_headers["NAXIS1"] is column
+    assert spy.call_count == 1
+    assert (column == eager_headers["NAXIS1"]).all()
+    # The column is a view of the array read from the file
+    assert np.shares_memory(column, lazy_headers._lazy_columns["NAXIS1"].node["data"])
+    assert isinstance(lazy_headers, LazyTable)
+
+
+@pytest.mark.parametrize("rows", [
+    np.s_[5:20],
+    np.s_[::-3],
+    np.array([3, 1, 4, 1, 5]),
+    np.arange(80) % 3 == 0,
+])
+def test_select_rows(lazy_headers, eager_headers, rows):
+    sliced = lazy_headers[rows]
+    assert isinstance(sliced, LazyTable)
+    assert_table_equal(sliced, eager_headers[rows])
+
+
+def test_select_rows_nested(lazy_headers, eager_headers):
+    sliced = lazy_headers[10:70:2][np.array([0, 5, 6])]
+    assert isinstance(sliced, LazyTable)
+    assert_table_equal(sliced, eager_headers[10:70:2][np.array([0, 5, 6])])
+
+    # Slices of slices are still views of the columns
+    sliced = lazy_headers[10:][::2]
+    assert np.shares_memory(sliced["NAXIS1"], lazy_headers["NAXIS1"])
+
+
+def test_select_columns(mocker, lazy_headers, eager_headers):
+    spy = mocker.spy(_LazyColumn, "load")
+    selected = lazy_headers[["NAXIS2", "NAXIS1"]][4:6]
+    assert isinstance(selected, LazyTable)
+    assert spy.call_count == 0
+    assert_table_equal(selected, eager_headers[["NAXIS2", "NAXIS1"]][4:6])
+
+    with pytest.raises(KeyError, match="NOTAKEY"):
+        lazy_headers[["NAXIS1", "NOTAKEY"]]
+
+
+def test_loaded_columns_are_sliced(lazy_headers):
+    column = lazy_headers["NAXIS1"]
+    column[:] = 0
+    assert (lazy_headers[2:4]["NAXIS1"] == 0).all()
+
+
+def test_load_all(lazy_headers, eager_headers):
+    repr(lazy_headers)
+    assert type(lazy_headers) is Table
+    assert_table_equal(lazy_headers, eager_headers)
+    assert lazy_headers[0]["NAXIS1"] == eager_headers[0]["NAXIS1"]
+
+
+def test_load_all_other_use(lazy_headers, eager_headers):
+    lazy_headers["NEWCOL"] = 1
+    assert type(lazy_headers) is Table
+    assert lazy_headers.colnames == [*eager_headers.colnames, "NEWCOL"]
+
+
+def test_copy(lazy_headers):
+    column = lazy_headers["NAXIS1"]
+    copied = lazy_headers.copy()
+    assert isinstance(copied, LazyTable)
+    assert not np.shares_memory(copied["NAXIS1"], column)
+    assert not np.shares_memory(copied["NAXIS2"], lazy_headers["NAXIS2"])
+
+    view = lazy_headers.copy(copy_data=False)
+    assert np.shares_memory(view["NAXIS1"], column)
+
+
+def test_table_constructor(lazy_headers, eager_headers):
+    table = LazyTable(masked=True)
+    assert type(table) is Table
+    assert table.masked
+
+    table = LazyTable({"a": [1, 2]}, meta={"b": 3})
+    assert type(table) is Table
+    assert table.meta == {"b": 3}
+
+    table = Table(lazy_headers[["NAXIS1", "NAXIS2"]][2:5])
+    assert type(table) is Table
+    assert_table_equal(table, eager_headers[["NAXIS1", "NAXIS2"]][2:5])
+
+
+def test_vstack(lazy_headers, eager_headers):
+    stacked = vstack([lazy_headers[:5], lazy_headers[70:]])
+    assert type(stacked) is Table
+    assert_table_equal(stacked, vstack([eager_headers[:5], eager_headers[70:]]))
+
+
+def test_hstack(lazy_headers, eager_headers):
+    stacked = hstack([lazy_headers[["NAXIS1"]], lazy_headers[["NAXIS2", "NAXIS3"]]])
+    assert type(stacked) is Table
+    assert_table_equal(stacked, eager_headers[["NAXIS1", "NAXIS2", "NAXIS3"]])
+
+
+def test_save(tmp_path, large_visp_dataset_file, eager_headers):
+    ds = load_dataset(large_visp_dataset_file)
+    ds.headers["NAXIS1"]
+    ds.meta["headers"] = ds.headers[2:12]
+    asdf.AsdfFile({"dataset": ds}).write_to(tmp_path / "test.asdf")
+
+    new = load_dataset(tmp_path / "test.asdf")
+    assert isinstance(new.headers, LazyTable)
+    assert_table_equal(new.headers, eager_headers[2:12])
+
+
+def test_mixin_columns(tmp_path):
+    table = QTable({"a": [1, 2] * u.m, "b": [3, 4]})
+    asdf.AsdfFile({"table": table}).write_to(tmp_path / "test.asdf")
+    with asdf.open(tmp_path / "test.asdf", extensions=[LazyTableExtension()]) as ff:
+        read = ff.tree["table"]
+        assert type(read) is QTable
+        assert read.colnames == ["a", "b"]
+        assert (read["a"] == [1, 2] * u.m).all()
+
+
+@pytest.mark.parametrize("lazy_load", [False, True])
+def test_masked_column(tmp_path, lazy_load):
+    table = Table({"a": np.ma.masked_array([1, 2, 3], mask=[False, True, False])})
+    asdf.AsdfFile({"table": table}).write_to(tmp_path / "test.asdf")
+    with asdf.open(tmp_path / "test.asdf", lazy_load=lazy_load, extensions=[LazyTableExtension()]) as ff:
+        read = ff.tree["table"]
+        assert isinstance(read, LazyTable)
+        assert read["a"].mask.tolist() == [False, True, False]
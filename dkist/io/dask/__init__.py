@@ -1,3 +1,9 @@
-from .loaders import AstropyFITSLoader, BaseFITSLoader
+from .cache import FrameCache, frame_cache
+from .file_pool import FITSFilePool, file_pool
+from .frame_index import FrameIndex
+from .instrumentation import IOEvent, IORecorder, record_io
+from .listing import DirectoryListings, directory_listings
+from .loaders import (AstropyFITSLoader, BaseFITSLoader, CompressedFITSLoader, ConcurrentFITSLoader,
+                      DirectReadFITSLoader, FSSpecFITSLoader, HTTPFITSLoader, MemmapFITSLoader)
 from .striped_array import FileManager, StripedExternalArray
 from .utils import stack_loader_array
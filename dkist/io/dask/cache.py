@@ -0,0 +1,155 @@
+"""
+A process-wide cache of arrays read from FITS files.
+
+The cache is disabled by default. It is enabled by setting the
+``frame_cache_size`` configuration option to a number of bytes (or a string
+such as ``"2GiB"``), either in the dkist configuration file or at runtime::
+
+    >>> import dkist
+    >>> dkist.conf.frame_cache_size = "2GiB"  # doctest: +SKIP
+
+Each entry is keyed by the absolute path of the file, the HDU, the section of
+the array which was read and the modification time of the file, so changing the
+``basepath`` of a dataset or modifying a file means the old entries are not used.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from dask.utils import parse_bytes
+
+from dkist import conf, log
+
+__all__ = ["FrameCache", "frame_cache"]
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "entries", "current_bytes", "max_bytes"])
+
+
+class FrameCache:
+    """
+    A thread safe least recently used cache of arrays, limited to a total number of bytes.
+
+    Parameters
+    ----------
+    max_bytes : `int` or `str`, optional
+        The maximum total size of the cached arrays. If not provided, the
+        ``frame_cache_size`` option in `dkist.conf` is used.
+    """
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self):
+        """
+        The maximum total size of the cached arrays, 0 if the cache is disabled.
+        """
+        max_bytes = conf.frame_cache_size if self._max_bytes is None else self._max_bytes
+        return parse_bytes(max_bytes) if isinstance(max_bytes, str) else int(max_bytes)
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        self._max_bytes = value
+        with self._lock:
+            self._evict(self.max_bytes)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        """
+        Return the cached array for ``key``, or `None` if it is not in the cache.
+        """
+        with self._lock:
+            array = self._entries.get(key)
+            if array is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return array
+
+    def put(self, key, array):
+        """
+        Add an array to the cache, evicting the least recently used arrays if needed.
+
+        The cached array is made read only, as it is shared between all
+        computations which read the same section of a file. Arrays larger
+        than the cache are not stored.
+        """
+        max_bytes = self.max_bytes
+        array = np.asarray(array)
+        if array.nbytes > max_bytes:
+            return array
+        array.flags.writeable = False
+        with self._lock:
+            if (old := self._entries.pop(key, None)) is not None:
+                self._current_bytes -= old.nbytes
+            self._entries[key] = array
+            self._current_bytes += array.nbytes
+            self._evict(max_bytes)
+        return array
+
+    def _evict(self, max_bytes):
+        while self._current_bytes > max_bytes and self._entries:
+            key, array = self._entries.popitem(last=False)
+            self._current_bytes -= array.nbytes
+            self.evictions += 1
+            log.debug("Evicted %s from the frame cache", key)
+
+    def clear(self):
+        """
+        Remove all the arrays from the cache and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """
+        The hit, miss and eviction counts and the current size of the cache.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             len(self._entries), self._current_bytes, self.max_bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        info = self.info()
+        return (f"<{type(self).__name__} {info.entries} arrays, {info.current_bytes}/{info.max_bytes} bytes, "
+                f"hits={info.hits} misses={info.misses} evictions={info.evictions}>")
+
+
+def section_key(slc):
+    """
+    A hashable representation of an index, or `None` if it can not be cached.
+
+    Slices are not hashable before Python 3.12, and array indices are not cached.
+    """
+    items = slc if isinstance(slc, tuple) else (slc,)
+    key = []
+    for item in items:
+        if isinstance(item, slice):
+            key.append(("slice", item.start, item.stop, item.step))
+        elif item is Ellipsis or item is None:
+            key.append(item)
+        elif isinstance(item, (int, np.integer)) and not isinstance(item, bool):
+            key.append(int(item))
+        else:
+            return None
+    return tuple(key)
+
+
+#: The cache used by the FITS loaders.
+frame_cache = FrameCache()
@@ -0,0 +1,154 @@
+"""
+A pool of open FITS files shared by the loaders.
+
+Opening a FITS file and parsing the headers up to the target HDU is a
+significant part of the cost of reading a small section of the array. The
+loaders return each file to this pool after reading from it, so that
+subsequent reads of the same file can reuse it.
+
+The pool is disabled by default, so every read opens and closes the file.
+Setting the ``max_open_files`` configuration option to a positive number
+enables it, and limits the number of idle files held open. Files which have
+not been used for ``open_file_idle_timeout`` seconds are closed the next time
+the pool is used, there is no background thread closing them, so idle files
+stay open until the next read or until `FITSFilePool.clear` is called.
+"""
+import os
+import time
+import atexit
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+from astropy.io import fits
+
+from dkist import conf, log
+
+__all__ = ["FITSFilePool", "file_pool"]
+
+
+class FITSFilePool:
+    """
+    A thread safe pool of open `astropy.io.fits.HDUList` objects.
+
+    Each open file is only used by one thread at a time, a file which is in
+    use is opened again if it is requested by another thread.
+
+    Parameters
+    ----------
+    max_open : `int`, optional
+        The maximum number of idle files to keep open. If not provided the
+        ``max_open_files`` option in `dkist.conf` is used.
+    idle_timeout : `float`, optional
+        The number of seconds after which an idle file is closed the next
+        time the pool is used. If not provided the ``open_file_idle_timeout``
+        option in `dkist.conf` is used.
+    """
+
+    def __init__(self, max_open=None, idle_timeout=None):
+        self._max_open = max_open
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # (last used time, key, hdulist) in order of last use
+        self._idle = []
+        self._pid = os.getpid()
+        self.opens = 0
+        self.reuses = 0
+
+    @property
+    def max_open(self):
+        return int(conf.max_open_files if self._max_open is None else self._max_open)
+
+    @property
+    def idle_timeout(self):
+        return float(conf.open_file_idle_timeout if self._idle_timeout is None else self._idle_timeout)
+
+    @contextmanager
+    def open(self, path, **kwargs):
+        """
+        Open a FITS file, reusing an idle open file if there is one.
+
+        This is a context manager, the file is returned to the pool on exit.
+        Files which have been modified since they were opened are not reused.
+        Any keyword arguments are passed to `astropy.io.fits.open`.
+        """
+        if self.max_open <= 0:
+            with fits.open(path, **kwargs) as hdul:
+                yield hdul
+            return
+
+        stat = Path(path).stat()
+        key = (str(path), stat.st_mtime_ns, stat.st_size, tuple(sorted(kwargs.items())))
+        hdul = self._checkout(key)
+        if hdul is None:
+            hdul = fits.open(path, **kwargs)
+            self.opens += 1
+        else:
+            self.reuses += 1
+
+        try:
+            yield hdul
+        except BaseException:
+            # Don't reuse a file which might be in an unknown state
+            hdul.close()
+            raise
+        self._checkin(key, hdul)
+
+    def _checkout(self, key):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # The open files belong to the parent process after a fork
+                self._idle = []
+                self._pid = os.getpid()
+            expired = self._expire(self.max_open)
+            hdul = None
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i][1] == key:
+                    hdul = self._idle.pop(i)[2]
+                    break
+        self._close(expired)
+        return hdul
+
+    def _checkin(self, key, hdul):
+        with self._lock:
+            self._idle.append((time.monotonic(), key, hdul))
+            expired = self._expire(self.max_open)
+        self._close(expired)
+
+    def _expire(self, max_open):
+        """
+        Remove the files which have been idle for too long, or are in excess of ``max_open``.
+        """
+        now, idle_timeout = time.monotonic(), self.idle_timeout
+        expired = [entry for entry in self._idle if now - entry[0] > idle_timeout]
+        self._idle = [entry for entry in self._idle if now - entry[0] <= idle_timeout]
+        n_excess = max(0, len(self._idle) - max_open)
+        expired += self._idle[:n_excess]
+        self._idle = self._idle[n_excess:]
+        return expired
+
+    @staticmethod
+    def _close(entries):
+        for _, key, hdul in entries:
+            log.debug("Closing idle file %s", key[0])
+            hdul.close()
+
+    def clear(self):
+        """
+        Close all the idle files.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        self._close(idle)
+
+    def __len__(self):
+        return len(self._idle)
+
+    def __repr__(self):
+        return (f"<{type(self).__name__} {len(self)}/{self.max_open} idle files, "
+                f"opens={self.opens} reuses={self.reuses}>")
+
+
+#: The pool of open files used by the FITS loaders.
+file_pool = FITSFilePool()
+atexit.register(file_pool.clear)
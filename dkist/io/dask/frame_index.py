@@ -0,0 +1,212 @@
+"""
+An index of where the array data are in a collection of FITS files.
+
+Reading an array from a FITS file with `astropy.io.fits` requires parsing all
+the headers up to and including the HDU containing the array. For datasets with
+many files this can take longer than reading the data. The `FrameIndex`
+records the byte offset, ``BITPIX`` and shape of the array in each file once,
+and saves it alongside the files, so that `.DirectReadFITSLoader` can read the
+data directly.
+"""
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from astropy.io import fits
+
+from dkist import log
+
+__all__ = ["FrameIndex"]
+
+
+class FrameIndex:
+    """
+    The location of the array data in each of a collection of FITS files.
+
+    Each entry is recorded with the size and modification time of the file
+    when it was indexed, entries for files which have changed since are
+    ignored.
+
+    Parameters
+    ----------
+    target : `int`
+        The HDU number the arrays were read from.
+    fileuris : array-like
+        The file uris, relative to the directory the index is saved in.
+    offsets : array-like
+        The byte offset of the start of the array data in each file, or -1 if
+        the array can not be read directly (e.g. it is compressed).
+    bitpix : array-like
+        The ``BITPIX`` of each array.
+    shapes : array-like
+        An ``(n_files, ndim)`` array of the shape of each array.
+    sizes : array-like
+        The size of each file in bytes.
+    mtimes : array-like
+        The modification time of each file in nanoseconds.
+    """
+
+    #: The name of the file the index is saved to in the directory of the files.
+    filename = "dkist_frame_index.npz"
+    #: The maximum number of loaded indices kept in memory by `FrameIndex.for_basepath`.
+    cache_size = 32
+    # Least recently used cache of loaded indices keyed by path, used by the loaders
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, target, fileuris, offsets, bitpix, shapes, sizes, mtimes):
+        self.target = int(target)
+        self.fileuris = np.asarray(fileuris, dtype=str)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.bitpix = np.asarray(bitpix, dtype=np.int16)
+        self.shapes = np.asarray(shapes, dtype=np.int64).reshape((len(self.fileuris), -1))
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.mtimes = np.asarray(mtimes, dtype=np.int64)
+        self._rows = {uri: i for i, uri in enumerate(self.fileuris)}
+
+    def __len__(self):
+        return len(self.fileuris)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} of {len(self)} files (HDU {self.target})>"
+
+    @classmethod
+    def build(cls, basepath, fileuris, target, *, max_workers=None, save=True):
+        """
+        Index the given files by reading their headers in parallel.
+
+        If an index already exists in ``basepath`` the entries for any files
+        which have not changed since they were indexed are reused.
+
+        Parameters
+        ----------
+        basepath : `os.PathLike`
+            The directory the file uris are relative to, and which the index is saved in.
+        fileuris : array-like
+            The files to index.
+        target : `int`
+            The HDU number to index.
+        max_workers : `int`, optional
+            The number of threads used to read the headers.
+        save : `bool`, optional
+            If `True` save the index to ``basepath``.
+        """
+        basepath = Path(basepath).expanduser()
+        fileuris = [str(uri) for uri in np.asarray(fileuris).flat]
+        existing = cls.for_basepath(basepath)
+        if existing is not None and existing.target != target:
+            existing = None
+
+        def index_file(fileuri):
+            if existing is not None and (row := existing._valid_row(basepath, fileuri)) is not None:
+                return existing._entry(row)
+            return _read_frame_info(basepath / fileuri, target)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            entries = list(executor.map(index_file, fileuris))
+
+        ndim = max((len(entry[2]) for entry in entries), default=0)
+        shapes = [(0,) * (ndim - len(entry[2])) + tuple(entry[2]) for entry in entries]
+        offsets, bitpix, _, sizes, mtimes = zip(*entries) if entries else ((),) * 5
+        index = cls(target, fileuris, offsets, bitpix, np.array(shapes, dtype=np.int64), sizes, mtimes)
+        if save:
+            index.save(basepath)
+        return index
+
+    def save(self, basepath):
+        """
+        Save this index to a file in ``basepath``.
+        """
+        path = Path(basepath).expanduser() / self.filename
+        with open(path, "wb") as fobj:
+            np.savez(fobj, target=self.target, fileuris=self.fileuris, offsets=self.offsets,
+                     bitpix=self.bitpix, shapes=self.shapes, sizes=self.sizes, mtimes=self.mtimes)
+        with self._cache_lock:
+            self._cache.pop(path, None)
+        log.debug("Saved index of %s files to %s", len(self), path)
+
+    @classmethod
+    def load(cls, basepath):
+        """
+        Load the index saved in ``basepath``.
+        """
+        path = Path(basepath).expanduser() / cls.filename
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    @classmethod
+    def for_basepath(cls, basepath):
+        """
+        The index saved in ``basepath``, or `None` if there isn't one.
+
+        The most recently used indices are cached until the index file changes.
+        """
+        path = Path(basepath).expanduser() / cls.filename
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+        with cls._cache_lock:
+            cached_mtime, index = cls._cache.get(path, (None, None))
+            if cached_mtime == mtime:
+                cls._cache.move_to_end(path)
+                return index
+
+        index = cls.load(basepath)
+        with cls._cache_lock:
+            cls._cache[path] = (mtime, index)
+            cls._cache.move_to_end(path)
+            while len(cls._cache) > cls.cache_size:
+                cls._cache.popitem(last=False)
+        return index
+
+    def _entry(self, row):
+        # Shapes are padded at the start with zeros to the largest number of dimensions
+        shape = self.shapes[row]
+        shape = shape[shape.size - np.count_nonzero(shape):]
+        return (int(self.offsets[row]), int(self.bitpix[row]), tuple(int(s) for s in shape),
+                int(self.sizes[row]), int(self.mtimes[row]))
+
+    def _valid_row(self, basepath, fileuri):
+        row = self._rows.get(str(fileuri))
+        if row is None:
+            return None
+        try:
+            stat = (Path(basepath) / fileuri).stat()
+        except OSError:
+            return None
+        if stat.st_size != self.sizes[row] or stat.st_mtime_ns != self.mtimes[row]:
+            return None
+        return row
+
+    def lookup(self, basepath, fileuri):
+        """
+        The offset, ``BITPIX`` and shape of the array in a file.
+
+        Returns `None` if the file is not in the index, can not be read
+        directly or has changed since it was indexed.
+        """
+        row = self._valid_row(basepath, fileuri)
+        if row is None or self.offsets[row] < 0:
+            return None
+        return self._entry(row)[:3]
+
+
+def _read_frame_info(path, target):
+    """
+    Read the location of the array in HDU ``target`` of a FITS file.
+    """
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return -1, 0, (), -1, -1
+
+    with fits.open(path, memmap=False, do_not_scale_image_data=True, mode="denywrite") as hdul:
+        hdu = hdul[target]
+        if type(hdu) not in (fits.PrimaryHDU, fits.ImageHDU):
+            return -1, 0, (), stat.st_size, stat.st_mtime_ns
+        return hdu.fileinfo()["datLoc"], hdu.header["BITPIX"], hdu.shape, stat.st_size, stat.st_mtime_ns
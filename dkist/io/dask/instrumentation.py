@@ -0,0 +1,216 @@
+"""
+Opt-in instrumentation of the reads made by the FITS loaders.
+
+When recording is enabled with `record_io`, every call to a loader records
+which file and section were read, how many bytes of data were returned and
+how long the call took. The time is split into phases:
+
+``open``
+    Opening the file (or getting it from the pool of open files).
+``header``
+    Parsing the headers up to the HDU containing the array.
+``read``
+    Reading the section of the array from the file.
+``byteswap``
+    Converting the data read directly from the file to native byte order.
+
+Any time spent in a call outside of these phases, such as checking if the
+file exists, is included only in ``duration``. Comparing the total duration
+of the loader calls with the wall time of a computation shows how much time
+is spent elsewhere, for example in Dask.
+
+Recording is off by default, in which case the only overhead is checking
+whether any recorder is active on each loader call::
+
+    >>> from dkist.io.dask import record_io
+    >>> with record_io() as recorder:  # doctest: +SKIP
+    ...     ds.data.compute()
+    >>> recorder.to_table()  # doctest: +SKIP
+"""
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from collections import namedtuple
+
+from astropy.table import Table
+
+__all__ = ["IOEvent", "IORecorder", "record_io"]
+
+PHASES = ("open", "header", "read", "byteswap")
+
+#: One call to a loader. ``status`` is ``"read"``, ``"cached"`` (returned
+#: from the frame cache) or ``"missing"`` (the file does not exist), ``start``
+#: is a `time.time` timestamp and the durations are in seconds.
+IOEvent = namedtuple("IOEvent", ["loader", "path", "section", "status", "start", "duration",
+                                 *PHASES, "nbytes", "thread"])
+
+# The active recorders, this tuple is replaced rather than modified so that it
+# can be read without a lock.
+_recorders = ()
+_recorders_lock = threading.Lock()
+# The measurement of the loader call in progress in each thread
+_local = threading.local()
+
+
+class IORecorder:
+    """
+    Collects the `IOEvent` of each loader call made while it is active.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called with each `IOEvent` as it is recorded, in the thread which
+        made the loader call. If a callback is given the events are not
+        stored by the recorder.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        if self.callback is not None:
+            self.callback(event)
+            return
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        """
+        Remove all the recorded events.
+        """
+        with self._lock:
+            self.events = []
+
+    def to_table(self):
+        """
+        The recorded events as an `astropy.table.Table`, with one row per loader call.
+        """
+        with self._lock:
+            events = list(self.events)
+        table = Table(rows=events or None, names=IOEvent._fields,
+                      dtype=[str, str, str, str, float, float, *(float,) * len(PHASES), int, int])
+        for column in ("start", "duration", *PHASES):
+            table[column].unit = "s"
+        table["nbytes"].unit = "byte"
+        return table
+
+    def __len__(self):
+        return len(self.events)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self)} events>"
+
+
+@contextmanager
+def record_io(callback=None):
+    """
+    Record the reads made by the FITS loaders within this context.
+
+    Reads made in any thread of this process are recorded, including by
+    the Dask threaded scheduler. Reads made in other processes (such as by
+    the multiprocessing or distributed schedulers) are not.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called with each `IOEvent`, instead of storing them.
+
+    Yields
+    ------
+    `IORecorder`
+    """
+    global _recorders
+    recorder = IORecorder(callback)
+    with _recorders_lock:
+        _recorders = (*_recorders, recorder)
+    try:
+        yield recorder
+    finally:
+        with _recorders_lock:
+            _recorders = tuple(r for r in _recorders if r is not recorder)
+
+
+class _Measurement:
+    """
+    The timings of one loader call.
+    """
+    __slots__ = ("_last", "loader", "phases", "start", "status")
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.status = "read"
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.start = time.time()
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        if phase is not None:
+            self.phases[phase] += now - self._last
+        self._last = now
+
+    def event(self, slc, data, duration):
+        return IOEvent(type(self.loader).__name__, str(self.loader.absolute_uri), _format_section(slc),
+                       self.status, self.start, duration, *self.phases.values(),
+                       int(getattr(data, "nbytes", 0)), threading.get_ident())
+
+
+def instrumented(getitem):
+    """
+    Decorate the ``__getitem__`` method of a loader to record each call while recording is active.
+
+    Calls made by another instrumented method (such as a subclass calling
+    ``super().__getitem__``) are recorded as part of the outer call.
+    """
+    @wraps(getitem)
+    def wrapper(self, slc):
+        if not _recorders or getattr(_local, "measurement", None) is not None:
+            return getitem(self, slc)
+
+        measurement = _local.measurement = _Measurement(self)
+        start = time.perf_counter()
+        try:
+            data = getitem(self, slc)
+        finally:
+            _local.measurement = None
+        event = measurement.event(slc, data, time.perf_counter() - start)
+        for recorder in _recorders:
+            recorder.record(event)
+        return data
+
+    return wrapper
+
+
+def lap(phase=None):
+    """
+    Attribute the time since the start of the loader call, or the previous lap, to ``phase``.
+
+    If ``phase`` is `None` the time is not attributed to any phase.
+    """
+    if (measurement := getattr(_local, "measurement", None)) is not None:
+        measurement.lap(phase)
+
+
+def set_status(status):
+    """
+    Set the status of the loader call in progress.
+    """
+    if (measurement := getattr(_local, "measurement", None)) is not None:
+        measurement.status = status
+
+
+def _format_section(slc):
+    items = slc if isinstance(slc, tuple) else (slc,)
+    formatted = []
+    for item in items:
+        if isinstance(item, slice):
+            start, stop = ("" if i is None else str(i) for i in (item.start, item.stop))
+            formatted.append(f"{start}:{stop}" if item.step is None else f"{start}:{stop}:{item.step}")
+        elif item is Ellipsis:
+            formatted.append("...")
+        else:
+            formatted.append(str(item))
+    return f"[{', '.join(formatted)}]"
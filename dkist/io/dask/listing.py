@@ -0,0 +1,81 @@
+"""
+A cache of the names of the files in directories.
+
+Datasets are often only partially downloaded, and the loaders need to know
+which files are present before reading them. Rather than checking each file
+individually on every read, the directory containing the files is listed once
+and the listing is reused until the directory is modified.
+"""
+import os
+import time
+import threading
+from pathlib import Path
+
+__all__ = ["DirectoryListings", "directory_listings"]
+
+
+class DirectoryListings:
+    """
+    A thread safe cache of the names of the entries in directories.
+
+    Each listing is reused until the modification time of the directory
+    changes, which happens when files are added to or removed from it.
+    """
+
+    # Listings made within this many seconds of the directory being modified
+    # are not reused, as files added during the same tick of the file system
+    # clock would not change the modification time.
+    settle_time = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listings = {}
+        self.scans = 0
+
+    def names(self, directory):
+        """
+        The names of the entries in ``directory``, or an empty set if it does not exist.
+        """
+        directory = str(directory)
+        try:
+            mtime = Path(directory).stat().st_mtime_ns
+        except OSError:
+            return frozenset()
+
+        with self._lock:
+            cached = self._listings.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with os.scandir(directory) as entries:
+                names = frozenset(entry.name for entry in entries)
+        except OSError:
+            return frozenset()
+        self.scans += 1
+
+        if time.time_ns() - mtime > self.settle_time * 1e9:
+            with self._lock:
+                self._listings[directory] = (mtime, names)
+        return names
+
+    def exists(self, path):
+        """
+        Return `True` if ``path`` is in the listing of its directory.
+        """
+        path = Path(path)
+        return path.name in self.names(path.parent)
+
+    def refresh(self, directory=None):
+        """
+        Discard the cached listing of ``directory``, or all listings if not specified.
+        """
+        with self._lock:
+            if directory is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(str(directory), None)
+
+
+#: The directory listings used by the FITS loaders.
+directory_listings = DirectoryListings()
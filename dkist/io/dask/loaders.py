@@ -3,18 +3,44 @@ This file contains code to lazy-load arrays from FITS files. It is designed to
 minimise (virtual) memory usage and the number of open files.
 """
 
+import io
+import os
 import abc
+import atexit
+import threading
+import multiprocessing
 from pathlib import Path
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy as np
 
 from astropy.io import fits
+from astropy.utils.shapes import simplify_basic_index
 
 from sunpy.util.decorators import add_common_docstring
 
-from dkist import log
+from dkist import conf
+from dkist.io.dask.cache import frame_cache, section_key
+from dkist.io.dask.file_pool import file_pool
+from dkist.io.dask.frame_index import FrameIndex
+from dkist.io.dask.instrumentation import instrumented, lap, set_status
+from dkist.io.dask.listing import directory_listings
+from dkist.io.dask.remote import HTTPRangeFile, fetch_range
 
-__all__ = ["AstropyFITSLoader", "BaseFITSLoader"]
+__all__ = ["AstropyFITSLoader", "BaseFITSLoader", "CompressedFITSLoader", "ConcurrentFITSLoader",
+           "DirectReadFITSLoader", "FSSpecFITSLoader", "HTTPFITSLoader", "MemmapFITSLoader"]
+
+# The big endian dtype of the data in a FITS file for each value of BITPIX
+BITPIX2DTYPE = {
+    8: np.dtype("uint8"),
+    16: np.dtype(">i2"),
+    32: np.dtype(">i4"),
+    64: np.dtype(">i8"),
+    -32: np.dtype(">f4"),
+    -64: np.dtype(">f8"),
+}
 
 
 common_parameters = """
@@ -68,6 +94,28 @@ class BaseFITSLoader(metaclass=abc.ABCMeta):
     def __getitem__(self, slc):
         pass
 
+    def _missing_data(self, slc):
+        """
+        A read only array of NaN, with the shape of ``slc`` of the array, to use in place of a missing file.
+
+        The array is a broadcast of a single value, so it does not use any
+        memory until it is copied.
+        """
+        dtype = self.dtype if np.issubdtype(self.dtype, np.inexact) else np.float64
+        return np.broadcast_to(np.array(np.nan, dtype=dtype), self.shape)[slc]
+
+    @classmethod
+    def read_many(cls, loaders, slc):
+        """
+        Read the same section of the array from each of a sequence of loaders.
+
+        This is used to read all the files in a chunk of the Dask array, and
+        can be overridden by loaders which read multiple files concurrently.
+        Returns an iterable of the arrays, which by default reads each file
+        as it is iterated over.
+        """
+        return (loader[slc] for loader in loaders)
+
     @property
     def absolute_uri(self):
         """
@@ -83,20 +131,559 @@ class BaseFITSLoader(metaclass=abc.ABCMeta):
 class AstropyFITSLoader(BaseFITSLoader):
     """
     Resolve an `~asdf.ExternalArrayReference` to a FITS file using `astropy.io.fits`.
+
+    If the frame cache is enabled (see `dkist.io.dask.cache`) the arrays read
+    by this loader are cached, and are read only.
     """
 
+    @instrumented
     def __getitem__(self, slc):
-        if not self.absolute_uri.exists():
-            log.debug("File %s does not exist.", self.absolute_uri)
-            # Use np.broadcast_to to generate an array of the correct size, but
-            # which only uses memory for one value.
-            return np.broadcast_to((np.nan,), self.shape) * np.nan
-
-        with fits.open(self.absolute_uri,
-                       memmap=False,  # memmap is redundant with dask and delayed loading
-                       do_not_scale_image_data=True,  # don't scale as we shouldn't need to
-                       mode="denywrite") as hdul:
-            log.debug("Accessing slice %s from file %s", slc, self.absolute_uri)
+        if not directory_listings.exists(self.absolute_uri):
+            set_status("missing")
+            return self._missing_data(slc)
+
+        key = None
+        if frame_cache.enabled and (section := section_key(slc)) is not None:
+            key = (str(self.absolute_uri.resolve()), self.target, section, self.absolute_uri.stat().st_mtime_ns)
+            if (data := frame_cache.get(key)) is not None:
+                set_status("cached")
+                return data
 
+        data = self._read(slc)
+        if key is not None:
+            data = frame_cache.put(key, data)
+        return data
+
+    def _read(self, slc):
+        """
+        Read a section of the array from the file.
+        """
+        lap()
+        with self._open_fits() as hdul:
+            lap("open")
             hdu = hdul[self.target]
-            return hdu.section[slc]
+            lap("header")
+            data = hdu.section[slc]
+            lap("read")
+            return data
+
+    def _open_fits(self):
+        # The file is returned to the pool of open files rather than closed,
+        # so that the headers don't need to be read again on the next access.
+        return file_pool.open(self.absolute_uri,
+                              memmap=False,  # memmap is redundant with dask and delayed loading
+                              do_not_scale_image_data=True,  # don't scale as we shouldn't need to
+                              mode="denywrite")
+
+
+@add_common_docstring(append=common_parameters)
+class MemmapFITSLoader(AstropyFITSLoader):
+    """
+    Resolve an `~asdf.ExternalArrayReference` to a memory mapped view of a FITS file.
+
+    For uncompressed image HDUs this loader returns a read-only view of a
+    `numpy.memmap` of the data in the file, so no copy of the data is made
+    and repeated reads of the same file are served from the operating
+    system's page cache. The view has the big endian byte order of the FITS
+    file, numpy converts it to native byte order when it is used in a
+    calculation.
+
+    For any other type of HDU this loader reads the data in the same way as
+    `.AstropyFITSLoader`.
+    """
+
+    @instrumented
+    def __getitem__(self, slc):
+        if not directory_listings.exists(self.absolute_uri):
+            return super().__getitem__(slc)
+
+        lap()
+        with self._open_fits() as hdul:
+            lap("open")
+            hdu = hdul[self.target]
+            lap("header")
+            if type(hdu) not in (fits.PrimaryHDU, fits.ImageHDU) or hdu.header["BITPIX"] not in BITPIX2DTYPE:
+                data = hdu.section[slc]
+                lap("read")
+                return data
+
+            offset = hdu.fileinfo()["datLoc"]
+            dtype = BITPIX2DTYPE[hdu.header["BITPIX"]]
+            shape = hdu.shape
+
+        # The data are read from the file when the memory map is used, not here
+        data = np.memmap(self.absolute_uri, dtype=dtype, mode="r", offset=offset, shape=shape)[slc]
+        lap("read")
+        return data
+
+
+@add_common_docstring(append=common_parameters)
+class CompressedFITSLoader(AstropyFITSLoader):
+    """
+    Read sections of tile compressed FITS arrays, decompressing the tiles in parallel.
+
+    Only the tiles which cover the requested section of a
+    `~astropy.io.fits.CompImageHDU` are decompressed. If the
+    ``decompression_processes`` option in `dkist.conf` is greater than one,
+    the tiles are split into groups which are decompressed in a pool of that
+    many processes, so that the decompression of each file is not limited to
+    one CPU by the GIL.
+
+    Any other type of HDU is read in the same way as `.AstropyFITSLoader`.
+    """
+
+    def _read(self, slc):
+        processes = int(conf.decompression_processes)
+        lap()
+        with self._open_fits() as hdul:
+            lap("open")
+            hdu = hdul[self.target]
+            lap("header")
+            pieces = None
+            if processes > 1 and isinstance(hdu, fits.CompImageHDU):
+                pieces = _tile_pieces(slc, hdu.shape, hdu.tile_shape, processes)
+            if pieces is None:
+                data = hdu.section[slc]
+                lap("read")
+                return data
+
+        axis, sections, residual = pieces
+        pool = _decompression_pool(processes)
+        futures = [pool.submit(_read_compressed_section, self.absolute_uri, self.target, section)
+                   for section in sections]
+        data = np.concatenate([future.result() for future in futures], axis=axis)[residual]
+        lap("read")
+        return data
+
+
+def _tile_pieces(slc, shape, tile_shape, n_pieces):
+    """
+    Split the section of a tiled array selected by ``slc`` into tile aligned pieces.
+
+    Returns the axis the section is split along, the contiguous section of the
+    array for each piece and the index to apply to the concatenated pieces to
+    give the result of ``slc``, or `None` if the section can't be split.
+    """
+    try:
+        index = simplify_basic_index(slc, shape=shape)
+    except (IndexError, TypeError, ValueError):
+        return None
+
+    bounds, residual = [], []
+    for n, item in zip(shape, index):
+        if isinstance(item, slice):
+            r = range(n)[item]
+            if len(r) == 0:
+                return None
+            lo = min(r)
+            bounds.append((lo, max(r) + 1))
+            stop = r.stop - lo
+            residual.append(slice(r.start - lo, stop if stop >= 0 else None, r.step))
+        else:
+            bounds.append((item, item + 1))
+            residual.append(0)
+
+    for axis, ((lo, hi), tile) in enumerate(zip(bounds, tile_shape)):
+        tiles = np.arange(lo // tile, (hi - 1) // tile + 1)
+        if len(tiles) > 1:
+            break
+    else:
+        return None
+
+    sections = []
+    for group in np.array_split(tiles, min(n_pieces, len(tiles))):
+        start, stop = max(lo, int(group[0]) * tile), min(hi, (int(group[-1]) + 1) * tile)
+        section = [slice(*b) for b in bounds]
+        section[axis] = slice(start, stop)
+        sections.append(tuple(section))
+    return axis, sections, tuple(residual)
+
+
+def _read_compressed_section(path, target, section):
+    """
+    Read a section of a compressed array, in a worker process.
+    """
+    with file_pool.open(path, memmap=False, do_not_scale_image_data=True, mode="denywrite") as hdul:
+        return hdul[target].section[section]
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _decompression_pool(processes):
+    """
+    The process pool used to decompress tiles, which is created when it is first needed.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != (processes, os.getpid()):
+            if _pool is not None:
+                _pool[1].shutdown(wait=False)
+            # Spawn rather than fork the workers, as forking a process with threads is unsafe.
+            executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+            _pool = ((processes, os.getpid()), executor)
+        return _pool[1]
+
+
+@atexit.register
+def _shutdown_decompression_pool():
+    if _pool is not None:
+        _pool[1].shutdown(wait=False, cancel_futures=True)
+
+
+@add_common_docstring(append=common_parameters)
+class ConcurrentFITSLoader(AstropyFITSLoader):
+    """
+    Read the files in each chunk concurrently from a shared pool of threads.
+
+    On file systems where opening and reading a file has a high latency (such
+    as network file systems), reading one file at a time in each Dask task
+    does not keep enough reads in flight to use the available bandwidth. When
+    a chunk of the Dask array contains more than one file (see
+    ``chunk_bytes``), this loader reads all the files in the chunk
+    concurrently. The reads are run in a pool of threads shared by all tasks,
+    with at most ``read_concurrency`` (from `dkist.conf`) reads in progress
+    at a time.
+
+    This only has an effect when ``chunk_bytes`` puts more than one file in
+    each chunk, otherwise each file is read in its own task exactly as
+    `.AstropyFITSLoader` does.
+
+    Each file is read in the same way as `.AstropyFITSLoader`.
+    """
+
+    @classmethod
+    def read_many(cls, loaders, slc):
+        futures = [_read_pool().submit(loader.__getitem__, slc) for loader in loaders]
+        return [future.result() for future in futures]
+
+
+_read_pool_lock = threading.Lock()
+_read_executor = None
+
+
+def _read_pool():
+    """
+    The thread pool used by `ConcurrentFITSLoader`, which is created when it is first needed.
+    """
+    global _read_executor
+    concurrency = int(conf.read_concurrency)
+    with _read_pool_lock:
+        if _read_executor is None or _read_executor[0] != (concurrency, os.getpid()):
+            if _read_executor is not None and _read_executor[0][1] == os.getpid():
+                # Reads already submitted to the old pool still finish
+                _read_executor[1].shutdown(wait=False)
+            executor = ThreadPoolExecutor(concurrency, thread_name_prefix="dkist-read")
+            _read_executor = ((concurrency, os.getpid()), executor)
+        return _read_executor[1]
+
+
+@add_common_docstring(append=common_parameters)
+class DirectReadFITSLoader(AstropyFITSLoader):
+    """
+    Read FITS arrays directly from a known offset in the file, without parsing the headers.
+
+    This loader uses the `~dkist.io.dask.frame_index.FrameIndex` saved in
+    ``basepath`` (see `~dkist.io.dask.FileManager.build_frame_index`) to find
+    the array in each file, and only reads the rows of the array which contain
+    the requested section. If the file is not in the index, or it has changed
+    since it was indexed, it is read in the same way as `.AstropyFITSLoader`.
+    """
+
+    @instrumented
+    def __getitem__(self, slc):
+        entry = self._index_entry()
+        if entry is None:
+            return super().__getitem__(slc)
+
+        offset, bitpix, shape = entry
+        lap()
+        return _read_section(self.absolute_uri, offset, BITPIX2DTYPE[bitpix], shape, slc)
+
+    def _index_entry(self):
+        if self.basepath is None:
+            return None
+        index = FrameIndex.for_basepath(self.basepath)
+        if index is None or index.target != self.target:
+            return None
+        entry = index.lookup(self.basepath, self.fileuri)
+        if entry is None or entry[1] not in BITPIX2DTYPE:
+            return None
+        return entry
+
+
+class _RemoteFITSLoader(BaseFITSLoader):
+    """
+    Base class for loaders which read sections of FITS files from URLs.
+
+    The headers of each file are read once, to find the location of the
+    array in the file, then only the bytes containing each requested section
+    of the array are read. Tile compressed arrays are read with
+    `astropy.io.fits`, which only reads the tiles covering the section.
+
+    Subclasses implement opening a file and reading a range of bytes from it.
+    """
+
+    #: Parts of a section of the array which are fewer than this many bytes
+    #: apart in the file are read in one request.
+    max_gap = 2**16
+
+    @property
+    def absolute_uri(self):
+        """
+        The URL of the file, using ``basepath`` if provided.
+        """
+        if self.basepath:
+            return f"{str(self.basepath).rstrip('/')}/{self.fileuri}"
+        return str(self.fileuri)
+
+    @abc.abstractmethod
+    def _open_file(self, url):
+        """
+        Open the file at ``url`` as a binary file like object.
+        """
+
+    @abc.abstractmethod
+    def _read_range(self, fileobj, start, length):
+        """
+        Read ``length`` bytes from byte ``start`` of a file opened with ``_open_file``.
+        """
+
+    @instrumented
+    def __getitem__(self, slc):
+        url = self.absolute_uri
+        try:
+            info = self._read_array_info(url)
+            if info is None:
+                lap()
+                with self._open_fits(url) as hdul:
+                    lap("open")
+                    hdu = hdul[self.target]
+                    lap("header")
+                    data = hdu.section[slc]
+                    lap("read")
+                    return data
+
+            offset, bitpix, shape = info
+            dtype = BITPIX2DTYPE[bitpix]
+            lap()
+            with self._open_file(url) as fileobj:
+                lap("open")
+                read = partial(self._read_range, fileobj)
+                return _read_block(partial(_fetch_block, read, offset, dtype, self.max_gap), dtype, shape, slc)
+        except FileNotFoundError:
+            set_status("missing")
+            return self._missing_data(slc)
+
+    def _open_fits(self, url):
+        return fits.open(self._open_file(url), memmap=False, do_not_scale_image_data=True, mode="denywrite")
+
+    def _read_array_info(self, url):
+        """
+        The offset, ``BITPIX`` and shape of an uncompressed array, or `None` for any other HDU.
+
+        The information is cached for each URL and HDU, and shared by all
+        loaders, as the loaders are created again each time an array is
+        computed.
+        """
+        key = (url, self.target)
+        with _array_info_lock:
+            if key in _array_info:
+                _array_info.move_to_end(key)
+                return _array_info[key]
+        lap()
+        with self._open_fits(url) as hdul:
+            lap("open")
+            hdu = hdul[self.target]
+            info = None
+            if type(hdu) in (fits.PrimaryHDU, fits.ImageHDU) and hdu.header["BITPIX"] in BITPIX2DTYPE:
+                info = (hdu.fileinfo()["datLoc"], hdu.header["BITPIX"], hdu.shape)
+            lap("header")
+        with _array_info_lock:
+            _array_info[key] = info
+            while len(_array_info) > _array_info_size:
+                _array_info.popitem(last=False)
+        return info
+
+
+# Least recently used cache of the array information read by _RemoteFITSLoader, keyed by (url, target)
+_array_info_lock = threading.Lock()
+_array_info = OrderedDict()
+_array_info_size = 2**16
+
+
+@add_common_docstring(append=common_parameters)
+class HTTPFITSLoader(_RemoteFITSLoader):
+    """
+    Read sections of FITS files served over HTTP, without downloading the whole file.
+
+    ``basepath`` is the URL of the directory containing the files. The
+    headers of each file are read once, to find the location of the array in
+    the file, then each section of the array is read with HTTP range
+    requests for only the bytes containing the section. All requests are
+    made through a shared pool of keep-alive connections.
+
+    Tile compressed arrays are read with `astropy.io.fits`, which only
+    reads the tiles covering the section.
+
+    This loader requires the ``urllib3`` package, which is installed with
+    the ``remote`` extra (``pip install dkist[remote]``).
+    """
+
+    #: The number of bytes read by each request when reading the headers.
+    header_block_size = 2**16
+
+    def _open_file(self, url):
+        return io.BufferedReader(HTTPRangeFile(url), buffer_size=self.header_block_size)
+
+    def _read_range(self, fileobj, start, length):
+        return fetch_range(fileobj.raw.url, start, length)[0]
+
+
+@add_common_docstring(append=common_parameters)
+class FSSpecFITSLoader(_RemoteFITSLoader):
+    """
+    Read sections of FITS files through `fsspec`, such as files in an object store.
+
+    ``basepath`` is a URL of any file system supported by fsspec, e.g.
+    ``s3://bucket/prefix`` (which requires the ``s3fs`` package). The files
+    are read in blocks of ``fsspec_block_size`` bytes (from `dkist.conf`),
+    and only the blocks containing the headers and the requested section of
+    the array are read. If the ``fsspec_cache_directory`` option is set,
+    the blocks read are also cached in that directory, so that each block is
+    only transferred once.
+
+    This loader requires the ``fsspec`` package, which is installed with the
+    ``remote`` extra (``pip install dkist[remote]``).
+    """
+
+    def _open_file(self, url):
+        import fsspec  # noqa: PLC0415
+
+        block_size = int(conf.fsspec_block_size)
+        if cache_directory := conf.fsspec_cache_directory:
+            protocol = fsspec.utils.get_protocol(url)
+            return fsspec.open(f"blockcache::{url}", "rb",
+                               blockcache={"cache_storage": str(Path(cache_directory).expanduser())},
+                               **{protocol: {"block_size": block_size}}).open()
+        return fsspec.open(url, "rb", block_size=block_size).open()
+
+    def _read_range(self, fileobj, start, length):
+        fileobj.seek(start)
+        return fileobj.read(length)
+
+
+def _fetch_block(read_range, offset, dtype, max_gap, start, count, block_shape, sub_index):
+    """
+    Read the elements of a block of an array in a file which are selected by ``sub_index``.
+
+    Each contiguous run of selected elements is read with
+    ``read_range(start_byte, n_bytes)``, merging runs which are separated by
+    fewer than ``max_gap`` bytes. Elements of the block which are not
+    selected are zero.
+    """
+    selected = np.zeros(block_shape, dtype=bool)
+    selected[sub_index] = True
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], selected.reshape(-1), [0])).astype(np.int8)))
+    starts, stops = edges[0::2], edges[1::2]
+    merge = (starts[1:] - stops[:-1]) * dtype.itemsize < max_gap
+    starts, stops = starts[np.concatenate(([True], ~merge))], stops[np.concatenate((~merge, [True]))]
+
+    block = np.zeros(count, dtype=dtype)
+    for run_start, run_stop in zip(starts, stops):
+        data = read_range(offset + (start + run_start) * dtype.itemsize, (run_stop - run_start) * dtype.itemsize)
+        block[run_start:run_start + len(data) // dtype.itemsize] = np.frombuffer(data, dtype=dtype)
+    return block
+
+
+def _read_section(path, offset, dtype, shape, slc):
+    """
+    Read the smallest contiguous block of an array in a file which contains ``slc``.
+    """
+    def read(start, count, block_shape, sub_index):
+        return np.fromfile(path, dtype=dtype, count=count, offset=offset + start * dtype.itemsize)
+
+    return _read_block(read, dtype, shape, slc)
+
+
+def _read_block(read, dtype, shape, slc):
+    """
+    Read ``slc`` of an array, stored in C order with ``dtype``, by reading the block of the array which contains it.
+
+    ``read(start, count, block_shape, sub_index)`` must return a (writeable)
+    array of the ``count`` elements starting at element ``start`` of the
+    array, of which only the elements selected by ``sub_index`` of the block
+    reshaped to ``block_shape`` are used.
+    """
+    section = _section_block(shape, slc)
+    if section is None:
+        # Not a basic index, so read the whole array and then index it.
+        return _read_block(read, dtype, shape, ())[slc]
+
+    start, count, block_shape, sub_index = section
+    if count == 0:
+        return np.empty(block_shape, dtype=dtype.newbyteorder("="))[sub_index]
+    block = read(start, count, block_shape, sub_index)
+    lap("read")
+    # Swap the bytes in place so that the array has the native byte order
+    block = block.byteswap(inplace=True).view(dtype.newbyteorder("="))
+    lap("byteswap")
+    return block.reshape(block_shape)[sub_index]
+
+
+def _section_block(shape, slc):
+    """
+    Find the smallest contiguous block of an array which contains ``slc``.
+
+    The block starts at the first selected element of the outermost axis with
+    more than one element selected, and covers whole rows of that axis.
+
+    Returns the offset of the block and the number of elements in it, the
+    shape of the block and the index of the block which gives ``slc`` of the
+    array. If nothing is selected the count is zero, and the shape and index
+    give an empty array of the right shape. Returns `None` if ``slc`` is not a
+    basic index.
+    """
+    ndim = len(shape)
+    index = slc if isinstance(slc, tuple) else (slc,)
+    if any(i is Ellipsis for i in index):
+        position = next(n for n, i in enumerate(index) if i is Ellipsis)
+        index = index[:position] + (slice(None),) * (ndim - len(index) + 1) + index[position+1:]
+    index = index + (slice(None),) * (ndim - len(index))
+    if len(index) != ndim or not all(isinstance(i, (slice, int, np.integer)) for i in index):
+        return None
+
+    # The element strides of the array (which is C ordered)
+    strides = [int(np.prod(shape[axis+1:])) for axis in range(ndim)]
+    ranges = [range(n)[i:i+1 if i != -1 else None] if not isinstance(i, slice) else range(n)[i]
+              for n, i in zip(shape, index)]
+    if any(len(r) == 0 for r in ranges):
+        return 0, 0, shape, index
+
+    start = 0
+    sub_index = []
+    axis = 0
+    # Move the start through any leading axes from which one element is selected.
+    while axis < ndim - 1 and len(ranges[axis]) == 1:
+        start += ranges[axis][0] * strides[axis]
+        if isinstance(index[axis], slice):
+            sub_index.append(np.newaxis)
+        axis += 1
+
+    if ndim:
+        first, last = min(ranges[axis]), max(ranges[axis])
+        start += first * strides[axis]
+        count = (last - first + 1) * strides[axis]
+        block_shape = (last - first + 1, *shape[axis+1:])
+        if isinstance(index[axis], slice):
+            r = ranges[axis]
+            stop = r.stop - first
+            sub_index.append(slice(r.start - first, stop if stop >= 0 else None, r.step))
+        else:
+            sub_index.append(0)
+        sub_index.extend(index[axis+1:])
+    else:
+        count, block_shape = 1, ()
+
+    return start, count, block_shape, tuple(sub_index)
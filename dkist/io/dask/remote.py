@@ -0,0 +1,152 @@
+"""
+Reading files which are not on the local file system.
+
+Files served over HTTP are read with range requests, so that only the parts of
+the file which are needed are transferred. All requests are made through one pool of keep-alive connections per
+process, so that reading many sections of files from the same server does not
+open a new connection for each request.
+"""
+import io
+import os
+import warnings
+import threading
+from urllib.parse import urlsplit
+
+from dkist import log
+from dkist.utils.exceptions import DKISTUserWarning
+
+__all__ = ["HTTPRangeFile", "fetch_range"]
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _http_pool():
+    """
+    The connection pool for HTTP requests, which is created when it is first needed in each process.
+    """
+    import urllib3  # noqa: PLC0415
+
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != os.getpid():
+            retries = urllib3.Retry(total=3, backoff_factor=0.1, status_forcelist=(500, 502, 503, 504))
+            _pool = (os.getpid(), urllib3.PoolManager(num_pools=16, maxsize=16, retries=retries))
+        return _pool[1]
+
+
+def fetch_range(url, start, length):
+    """
+    Fetch ``length`` bytes of the file at ``url``, starting at byte ``start``.
+
+    Fewer bytes are returned if the end of the file is reached.
+
+    Returns
+    -------
+    data : `bytes`
+        The requested bytes.
+    size : `int` or `None`
+        The total size of the file, if the server reported it.
+    """
+    response = _http_pool().request("GET", url, headers={"Range": f"bytes={start}-{start + length - 1}"})
+    log.debug("Fetched bytes %s-%s of %s (status %s)", start, start + length - 1, url, response.status)
+    if response.status == 404:
+        raise FileNotFoundError(f"{url} does not exist.")
+    if response.status == 416:
+        # The range starts beyond the end of the file.
+        return b"", _content_range_size(response.headers.get("Content-Range"))
+    if response.status == 200:
+        # The server ignored the range and sent the whole file.
+        _warn_no_range_support(url)
+        return response.data[start:start + length], len(response.data)
+    if response.status != 206:
+        raise OSError(f"Reading {url} failed with HTTP status {response.status}.")
+    return response.data, _content_range_size(response.headers.get("Content-Range"))
+
+
+_warned_hosts_lock = threading.Lock()
+_warned_hosts = set()
+
+
+def _warn_no_range_support(url):
+    """
+    Warn, once for each server, that reading a section of a file downloads the whole file.
+    """
+    host = urlsplit(url).netloc
+    with _warned_hosts_lock:
+        if host in _warned_hosts:
+            return
+        _warned_hosts.add(host)
+    warnings.warn(f"The server {host} does not support range requests, so the whole of each file is "
+                  "downloaded every time a section of it is read.", DKISTUserWarning, stacklevel=2)
+
+
+def _content_range_size(content_range):
+    """
+    The total size from a ``Content-Range: bytes 0-99/1234`` header.
+    """
+    if content_range is None or content_range.endswith("*"):
+        return None
+    return int(content_range.rsplit("/", 1)[1])
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    A read only file like object which reads a file served over HTTP using range requests.
+
+    This class makes one request for each read, so it should normally be
+    wrapped in an `io.BufferedReader` to read larger blocks.
+
+    Parameters
+    ----------
+    url : `str`
+        The URL of the file.
+    """
+
+    def __init__(self, url):
+        self.url = self.name = url
+        self._position = 0
+        self._size = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    @property
+    def size(self):
+        """
+        The size of the file in bytes.
+        """
+        if self._size is None:
+            response = _http_pool().request("HEAD", self.url)
+            if response.status == 404:
+                raise FileNotFoundError(f"{self.url} does not exist.")
+            self._size = int(response.headers["Content-Length"])
+        return self._size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        return self._position
+
+    def readinto(self, buffer):
+        if len(buffer) == 0 or (self._size is not None and self._position >= self._size):
+            return 0
+        data, size = fetch_range(self.url, self._position, len(buffer))
+        if size is not None:
+            self._size = size
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
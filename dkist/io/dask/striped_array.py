@@ -1,11 +1,11 @@
 """
 This module contains two key classes:
 
-* ``StripedExternalArray``: The object which tracks the ``BaseFITSLoader``
-  objects and the file references and their shape, and constructs a Dask Array.
-  The loader object (which actually reads the data out of the FITS files) holds
-  a reference back to this object which it uses to resolve the file paths at
-  load time.
+* ``StripedExternalArray``: The object which tracks the file references and
+  their shape, and constructs a Dask Array. The ``BaseFITSLoader`` objects
+  (which actually read the data out of the FITS files) are not stored, they are
+  created through a ``LoaderArray`` when they are needed, with the basepath of
+  this object at that time.
 * ``FileManager``: The object providing the public API, which can be sliced.
 
 The slicing functionality on the ``FileManager`` object works by constructing a
@@ -25,9 +25,10 @@ from numpy.typing import DTypeLike, NDArray
 
 from astropy.wcs.wcsapi.wrappers.sliced_wcs import sanitize_slices
 
+from dkist.io.dask.frame_index import FrameIndex
 from dkist.io.dask.loaders import BaseFITSLoader
 from dkist.io.dask.utils import stack_loader_array
-from dkist.io.utils import filemanager_info_str
+from dkist.io.utils import filemanager_info_str, is_url
 
 __all__ = ["FileManager", "StripedExternalArray"]
 
@@ -46,6 +47,12 @@ class FileManagerProtocol(Protocol):
     @property
     def filenames(self) -> list[str]: ...
 
+    @property
+    def loader(self) -> type[BaseFITSLoader]: ...
+
+    @loader.setter
+    def loader(self, loader: type[BaseFITSLoader]) -> None: ...
+
     @property
     def fileuri_array(self) -> list: ...
 
@@ -61,6 +68,8 @@ class BaseStripedExternalArray(abc.ABC):
     dtype: DTypeLike
     shape: Iterable[int]
     chunksize: Iterable[int] | None
+    chunk_bytes: int | str | None
+    output_dtype: DTypeLike | None
 
     @abc.abstractproperty
     def fileuri_array(self) -> NDArray[np.str_]:
@@ -68,10 +77,8 @@ class BaseStripedExternalArray(abc.ABC):
         An array of relative (to ``basepath``) file uris.
         """
 
-    # np.object_ isn't a generic so we can't type hint the actual type
-    # https://github.com/numpy/numpy/issues/25351
     @abc.abstractproperty
-    def loader_array(self) -> NDArray[np.object_]:
+    def loader_array(self) -> "LoaderArray":
         """
         An array of `.BaseFITSLoader` objects.
 
@@ -80,7 +87,14 @@ class BaseStripedExternalArray(abc.ABC):
         """
 
     def __len__(self) -> int:
-        return self.loader_array.size
+        return self.fileuri_array.size
+
+    @property
+    def ndim(self) -> int:
+        """
+        The number of dimensions of the array of files.
+        """
+        return self.fileuri_array.ndim
 
     def __eq__(self, other) -> bool:
         uri = (self.fileuri_array == other.fileuri_array).all()
@@ -91,32 +105,41 @@ class BaseStripedExternalArray(abc.ABC):
         return all((uri, target, dtype, shape))
 
     @staticmethod
-    def _output_shape_from_ref_array(shape, loader_array) -> tuple[int]:
+    def _output_shape_from_ref_array(shape, ref_array) -> tuple[int]:
         # If the first dimension is one we are going to squash it.
         if shape[0] == 1:
             shape = shape[1:]
 
-        if loader_array.size == 1:
+        if ref_array.size == 1:
             return shape
 
-        return tuple(list(loader_array.shape) + list(shape))
+        return tuple(list(ref_array.shape) + list(shape))
 
     @property
     def output_shape(self) -> tuple[int, ...]:
         """
         The final shape of the reconstructed data array.
         """
-        return self._output_shape_from_ref_array(self.shape, self.loader_array)
+        return self._output_shape_from_ref_array(self.shape, self.fileuri_array)
+
+    @property
+    def version(self) -> int:
+        """
+        A counter which is incremented whenever the arrays generated from this object would change.
+        """
+        return self._version
 
     def _generate_array(self) -> dask.array.Array:
         """
         Construct a `dask.array.Array` object from this set of references.
 
-        Each call to this method generates a new array, but all the loaders
-        still have a reference to this `~.FileManager` object, meaning changes
-        to this object will be reflected in the data loaded by the array.
+        Each call to this method generates a new array, but the loaders are
+        only created when the array is computed, with the ``basepath`` of this
+        object at that time, meaning changes to the ``basepath`` will be
+        reflected in the data loaded by the array.
         """
-        return stack_loader_array(self.loader_array, self.output_shape, self.chunksize)
+        return stack_loader_array(self.loader_array, self.output_shape, self.chunksize,
+                                  chunk_bytes=self.chunk_bytes, dtype=self.output_dtype)
 
 
 class StripedExternalArray(BaseStripedExternalArray):
@@ -130,22 +153,20 @@ class StripedExternalArray(BaseStripedExternalArray):
         loader: type[BaseFITSLoader],
         basepath: os.PathLike = None,
         chunksize: Iterable[int] = None,
+        chunk_bytes: int | str | None = None,
     ):
         shape = tuple(shape)
         self.shape = shape
         self.dtype = dtype
         self.target = target
+        self._version = 0
         self._loader = loader
         self._basepath = self._sanitize_basepath(basepath)
-        self.chunksize = chunksize
+        self._chunksize = chunksize
+        self._chunk_bytes = chunk_bytes
+        self._output_dtype = None
         self._fileuri_array = np.atleast_1d(np.array(fileuris))
 
-        loader_array = np.empty_like(self._fileuri_array, dtype=object)
-        for i, fileuri in enumerate(self._fileuri_array.flat):
-            loader_array.flat[i] = loader(fileuri, shape, dtype, target, self.basepath)
-
-        self._loader_array = loader_array
-
     def __str__(self: FileManagerProtocol) -> str:
         return filemanager_info_str(self)
 
@@ -153,13 +174,12 @@ class StripedExternalArray(BaseStripedExternalArray):
         prefix = object.__repr__(self)
         return dedent(f"{prefix}\n{self.__str__()}")
 
-    @property
-    def ndim(self):
-        return len(self.loader_array.shape)
-
     @staticmethod
     def _sanitize_basepath(value):
-        return Path(value).expanduser() if value is not None else None
+        # URLs are kept as strings, for loaders which read remote files
+        if value is None or is_url(value):
+            return value
+        return Path(value).expanduser()
 
     @property
     def basepath(self) -> os.PathLike:
@@ -171,8 +191,57 @@ class StripedExternalArray(BaseStripedExternalArray):
     @basepath.setter
     def basepath(self, value: os.PathLike | str | None):
         self._basepath = self._sanitize_basepath(value)
-        for loader in self._loader_array.flat:
-            loader.basepath = self._basepath
+        self._version += 1
+
+    @property
+    def loader(self) -> type[BaseFITSLoader]:
+        """
+        The `.BaseFITSLoader` subclass used to read the data from the files.
+
+        Setting this property only affects arrays generated after it is set.
+        """
+        return self._loader
+
+    @loader.setter
+    def loader(self, value: type[BaseFITSLoader]):
+        self._loader = value
+        self._version += 1
+
+    @property
+    def chunksize(self) -> Iterable[int] | None:
+        """
+        The chunk size of the frame dimensions of generated arrays.
+        """
+        return self._chunksize
+
+    @chunksize.setter
+    def chunksize(self, value: Iterable[int] | None):
+        self._chunksize = value
+        self._version += 1
+
+    @property
+    def chunk_bytes(self) -> int | str | None:
+        """
+        The target size of the chunks of generated arrays, in bytes.
+        """
+        return self._chunk_bytes
+
+    @chunk_bytes.setter
+    def chunk_bytes(self, value: int | str | None):
+        self._chunk_bytes = value
+        self._version += 1
+
+    @property
+    def output_dtype(self) -> DTypeLike | None:
+        """
+        The dtype the data are cast to when read, or `None` to use ``dtype``.
+        """
+        return self._output_dtype
+
+    @output_dtype.setter
+    def output_dtype(self, value: DTypeLike | None):
+        self._output_dtype = None if value is None else np.dtype(value)
+        self._version += 1
 
     @property
     def fileuri_array(self) -> NDArray[np.str_]:
@@ -182,14 +251,15 @@ class StripedExternalArray(BaseStripedExternalArray):
         return self._fileuri_array
 
     @property
-    def loader_array(self) -> NDArray[np.object_]:
+    def loader_array(self) -> "LoaderArray":
         """
         An array of `.BaseFITSLoader` objects.
 
         These loader objects implement the minimal array-like interface for
-        conversion to a dask array.
+        conversion to a dask array. They are created as they are accessed,
+        see `LoaderArray`.
         """
-        return self._loader_array
+        return LoaderArray(self._fileuri_array, self, self._loader)
 
 
 class StripedExternalArrayView(BaseStripedExternalArray):
@@ -197,11 +267,19 @@ class StripedExternalArrayView(BaseStripedExternalArray):
     # the fileuri_array and loader_array properties Any property which
     # references the sliced objects should be defined in Base or this view
     # class.
+    # A view of a view is composed into a single view of the original
+    # StripedExternalArray, so the parent of a view is (almost) always a
+    # StripedExternalArray however many times it has been sliced.
     __slots__ = ["parent", "parent_slice"]
 
     def __init__(self, parent: StripedExternalArray, aslice: tuple | slice | int):
+        aslice = tuple(aslice) if isinstance(aslice, (tuple, list)) else (aslice,)
+        if isinstance(parent, StripedExternalArrayView):
+            composed = _compose_basic_index(parent.parent.fileuri_array.shape, parent.parent_slice, aslice)
+            if composed is not None:
+                parent, aslice = parent.parent, composed
         self.parent = parent
-        self.parent_slice = tuple(aslice) if isinstance(aslice, (tuple, list)) else (aslice,)
+        self.parent_slice = aslice
 
     def __getattr__(self, attr):
         return getattr(self.parent, attr)
@@ -224,26 +302,195 @@ class StripedExternalArrayView(BaseStripedExternalArray):
     def basepath(self, value):
         self.parent.basepath = value
 
+    @property
+    def loader(self) -> type[BaseFITSLoader]:
+        """
+        The `.BaseFITSLoader` subclass used to read the data from the files.
+        """
+        return self.parent.loader
+
+    @loader.setter
+    def loader(self, value):
+        self.parent.loader = value
+
+    @property
+    def version(self) -> int:
+        return self.parent.version
+
+    @property
+    def chunksize(self) -> Iterable[int] | None:
+        """
+        The chunk size of the frame dimensions of generated arrays.
+        """
+        return self.parent.chunksize
+
+    @chunksize.setter
+    def chunksize(self, value):
+        self.parent.chunksize = value
+
+    @property
+    def chunk_bytes(self) -> int | str | None:
+        """
+        The target size of the chunks of generated arrays, in bytes.
+        """
+        return self.parent.chunk_bytes
+
+    @chunk_bytes.setter
+    def chunk_bytes(self, value):
+        self.parent.chunk_bytes = value
+
+    @property
+    def output_dtype(self) -> DTypeLike | None:
+        """
+        The dtype the data are cast to when read, or `None` to use ``dtype``.
+        """
+        return self.parent.output_dtype
+
+    @output_dtype.setter
+    def output_dtype(self, value):
+        self.parent.output_dtype = value
+
     @property
     def fileuri_array(self) -> NDArray[np.str_]:
         """
         An array of relative (to ``basepath``) file uris.
         """
-        # array call here to ensure that a length one array is returned rather
-        # than a single element.
-        return np.array(self._fileuri_array[self.parent_slice])
+        # The Ellipsis ensures that a length one array is returned rather
+        # than a single element, the returned array is a view of the array
+        # of the parent and so is read only.
+        fileuris = self.parent.fileuri_array[(*self.parent_slice, ...)]
+        fileuris.flags.writeable = False
+        return fileuris
 
     @property
-    def loader_array(self) -> NDArray[np.object_]:
+    def loader_array(self) -> "LoaderArray":
         """
-        An array of `.BaseParent` objects.
+        An array of `.BaseFITSLoader` objects.
 
         These loader objects implement the minimal array-like interface for
         conversion to a dask array.
         """
-        # array call here to ensure that a length one array is returned rather
+        # The Ellipsis ensures that a length one array is returned rather
         # than a single element.
-        return np.array(self.parent.loader_array[self.parent_slice])
+        return self.parent.loader_array[(*self.parent_slice, ...)]
+
+
+def _compose_basic_index(shape, first, second):
+    """
+    Combine two indices of ints and slices, so that ``a[first][second]`` is ``a[combined]``.
+
+    Each slice is resolved as a `range` of the indices of the dimension, so
+    the combined index is calculated without reference to the data.
+    Returns `None` if either index contains anything other than ints and
+    slices, or has more items than there are dimensions.
+    """
+    if len(first) > len(shape):
+        return None
+    first = (*first, *(slice(None),) * (len(shape) - len(first)))
+    second = iter(second)
+    combined = []
+    for size, item in zip(shape, first):
+        if _is_integer(item):
+            # This dimension has already been removed
+            combined.append(item)
+            continue
+        if not isinstance(item, slice):
+            return None
+        indices = range(size)[item]
+        inner = next(second, slice(None))
+        if not (_is_integer(inner) or isinstance(inner, slice)):
+            return None
+        indices = indices[inner]
+        if isinstance(indices, int):
+            combined.append(indices)
+        elif not indices:
+            combined.append(slice(0, 0))
+        else:
+            # A stop before the start of the array can't be written as a
+            # negative number, which would count back from the end
+            stop = indices.stop if indices.stop >= 0 else None
+            combined.append(slice(indices.start, stop, indices.step))
+    if next(second, None) is not None:
+        return None
+    return tuple(combined)
+
+
+def _is_integer(item):
+    return isinstance(item, (int, np.integer)) and not isinstance(item, bool)
+
+
+class LoaderArray:
+    """
+    An array of `.BaseFITSLoader` objects, which are created as they are accessed.
+
+    Only the array of file uris is stored, the parameters shared by all the
+    loaders are taken from the `StripedExternalArray`, so that datasets of
+    many files do not hold one loader object per file. The loaders are
+    created with the ``basepath`` of the `StripedExternalArray` at the time
+    they are accessed.
+
+    Indexing this array with anything that selects more than one element
+    returns another `LoaderArray`, which shares the file uris of this one,
+    and converting it to a numpy array creates all the loaders.
+    """
+    __slots__ = ["fileuri_array", "loader", "striped_array"]
+
+    def __init__(self, fileuri_array: NDArray[np.str_], striped_array: StripedExternalArray,
+                 loader: type[BaseFITSLoader]):
+        self.fileuri_array = fileuri_array
+        self.striped_array = striped_array
+        self.loader = loader
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} of {self.size} {self.loader.__name__} with shape {self.shape}>"
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.fileuri_array.shape
+
+    @property
+    def ndim(self) -> int:
+        return self.fileuri_array.ndim
+
+    @property
+    def size(self) -> int:
+        return self.fileuri_array.size
+
+    def __len__(self) -> int:
+        return len(self.fileuri_array)
+
+    def _make_loader(self, fileuri, basepath):
+        array = self.striped_array
+        return self.loader(fileuri, array.shape, array.dtype, array.target, basepath)
+
+    def __getitem__(self, item):
+        fileuris = self.fileuri_array[item]
+        if isinstance(fileuris, np.ndarray):
+            return type(self)(fileuris, self.striped_array, self.loader)
+        return self._make_loader(fileuris, self.striped_array.basepath)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def reshape(self, *shape) -> "LoaderArray":
+        return type(self)(self.fileuri_array.reshape(*shape), self.striped_array, self.loader)
+
+    @property
+    def flat(self) -> "LoaderArray":
+        """
+        A one dimensional view of this array.
+        """
+        return self.reshape(-1)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None and np.dtype(dtype) != object:
+            raise TypeError(f"A {type(self).__name__} can only be converted to an object array.")
+        basepath = self.striped_array.basepath
+        loaders = np.empty(self.shape, dtype=object)
+        for i, fileuri in enumerate(self.fileuri_array.flat):
+            loaders.flat[i] = self._make_loader(fileuri, basepath)
+        return loaders
 
 
 class FileManager:
@@ -254,20 +501,22 @@ class FileManager:
     ----------
     striped_external_array
     """
-    __slots__ = ["_striped_external_array"]
+    __slots__ = ["_dask_array", "_striped_external_array"]
 
     @classmethod
-    def from_parts(cls, fileuris, target, dtype, shape, *, loader, basepath=None, chunksize=None):
+    def from_parts(cls, fileuris, target, dtype, shape, *, loader, basepath=None, chunksize=None, chunk_bytes=None):
         """
         An initialization helper for constructing the `StripedExternalArray` and the `FileManager` together.
         """
         striped_array = StripedExternalArray(
-            fileuris, target, dtype, shape, loader=loader, basepath=basepath, chunksize=None,
+            fileuris, target, dtype, shape, loader=loader, basepath=basepath, chunksize=chunksize, chunk_bytes=chunk_bytes,
         )
         return cls(striped_array)
 
     def __init__(self, striped_external_array: StripedExternalArray):
         self._striped_external_array = striped_external_array
+        # The generated array and the version of the striped array it was generated from
+        self._dask_array = (None, None)
 
     def __eq__(self, other):
         return self._striped_external_array == other._striped_external_array
@@ -307,17 +556,22 @@ class FileManager:
     def _generate_array(self):
         return self._striped_external_array._generate_array()
 
-    # @cached_property
     @property
     def dask_array(self):
         """
         The Dask array managed by this FileManager.
 
         .. note::
-           This array is cached, so only generated once.
+           This array is cached, and only generated again when the
+           ``basepath``, ``loader``, ``chunksize``, ``chunk_bytes`` or ``dtype`` change.
 
         """
-        return self._generate_array()
+        version = self._striped_external_array.version
+        cached_version, array = self._dask_array
+        if array is None or cached_version != version:
+            array = self._generate_array()
+            self._dask_array = (version, array)
+        return array
 
     @property
     def fileuri_array(self):
@@ -339,6 +593,19 @@ class FileManager:
     def basepath(self, value):
         self._striped_external_array.basepath = value
 
+    @property
+    def loader(self):
+        """
+        The `.BaseFITSLoader` subclass used to read the data from the files.
+
+        Setting this property only affects arrays generated after it is set.
+        """
+        return self._striped_external_array.loader
+
+    @loader.setter
+    def loader(self, value):
+        self._striped_external_array.loader = value
+
     @property
     def filenames(self):
         """
@@ -346,6 +613,82 @@ class FileManager:
         """
         return self.fileuri_array.flatten().tolist()
 
+    @property
+    def chunksize(self):
+        """
+        The chunk size of the trailing (frame) dimensions of the generated Dask array.
+
+        If set, each file is split into multiple chunks, each of which is read
+        directly from the corresponding section of the file. If `None` (the
+        default) each file is one chunk.
+
+        Setting this property only affects arrays generated after it is set.
+        """
+        return self._striped_external_array.chunksize
+
+    @chunksize.setter
+    def chunksize(self, value):
+        self._striped_external_array.chunksize = value
+
+    @property
+    def chunk_bytes(self):
+        """
+        The target size of the chunks of the generated Dask array, in bytes.
+
+        If set, consecutive files are grouped into chunks of up to this size,
+        so that each chunk is read by one task. It can be an integer, a string
+        such as ``"128MiB"`` or ``"auto"`` to use the ``array.chunk-size``
+        dask configuration option. If `None` (the default) each file is one
+        chunk.
+
+        Setting this property only affects arrays generated after it is set.
+        """
+        return self._striped_external_array.chunk_bytes
+
+    @chunk_bytes.setter
+    def chunk_bytes(self, value):
+        self._striped_external_array.chunk_bytes = value
+
+    @property
+    def dtype(self):
+        """
+        The dtype of the generated Dask array.
+
+        By default this is the dtype of the arrays in the files. If it is set,
+        the data are cast to this dtype by the loaders as each file is read.
+        Setting it to `None` restores the dtype of the files.
+
+        Setting this property only affects arrays generated after it is set.
+        """
+        array = self._striped_external_array
+        return np.dtype(array.dtype if array.output_dtype is None else array.output_dtype)
+
+    @dtype.setter
+    def dtype(self, value):
+        self._striped_external_array.output_dtype = value
+
+    def build_frame_index(self, *, max_workers=None):
+        """
+        Index the location of the array in each file, and save the index in ``basepath``.
+
+        The index is used by `.DirectReadFITSLoader` to read the arrays without
+        parsing the FITS headers. Building the index again only reads the
+        headers of files which have changed since they were last indexed.
+
+        Parameters
+        ----------
+        max_workers : `int`, optional
+            The number of threads used to read the headers.
+
+        Returns
+        -------
+        `.FrameIndex`
+        """
+        if self.basepath is None:
+            raise ValueError("A basepath must be set to build a frame index.")
+        return FrameIndex.build(self.basepath, self.fileuri_array, self._striped_external_array.target,
+                                max_workers=max_workers)
+
     @property
     def output_shape(self):
         """
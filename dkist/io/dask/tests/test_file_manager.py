@@ -1,12 +1,21 @@
+import time
+import threading
 from pathlib import Path
 
+import dask
 import dask.array as da
 import numpy as np
 import pytest
+from dask.core import flatten
 from numpy.testing import assert_allclose
 
+import dkist
 from dkist.data.test import rootdir
-from dkist.io.dask.striped_array import FileManager, StripedExternalArray, StripedExternalArrayView
+from dkist.io.dask.loaders import AstropyFITSLoader, ConcurrentFITSLoader, _read_pool
+from dkist.io.dask.striped_array import (FileManager, LoaderArray, StripedExternalArray, StripedExternalArrayView,
+                                         _compose_basic_index)
+from dkist.io.dask import utils
+from dkist.io.dask.utils import _group_chunks, stack_loader_array
 
 eitdir = Path(rootdir) / "EIT"
 
@@ -57,6 +66,34 @@ def test_dask(file_manager, loader_array):
     assert_allclose(file_manager._generate_array(), np.array(file_manager._generate_array()))
 
 
+def test_dask_array_cached(file_manager):
+    array = file_manager.dask_array
+    assert file_manager.dask_array is array
+
+    file_manager.basepath = eitdir
+    basepath_array = file_manager.dask_array
+    assert basepath_array is not array
+    assert file_manager.dask_array is basepath_array
+
+
+@pytest.mark.parametrize(("attr", "value"), [
+    ("loader", AstropyFITSLoader),
+    ("chunksize", (64, 64)),
+    ("chunk_bytes", "1MiB"),
+    ("dtype", np.float32),
+])
+def test_dask_array_cache_invalidated(file_manager, attr, value):
+    array = file_manager.dask_array
+    sliced = file_manager[0:2]
+    sliced_array = sliced.dask_array
+
+    setattr(file_manager, attr, value)
+    assert file_manager.dask_array is not array
+    # Changing the parent also invalidates views of it
+    assert sliced.dask_array is not sliced_array
+    assert file_manager.dask_array is file_manager.dask_array
+
+
 def test_collection_getitem(tmpdir, file_manager):
     assert isinstance(file_manager._striped_external_array, StripedExternalArray)
     assert isinstance(file_manager[0], FileManager)
@@ -66,6 +103,42 @@ def test_collection_getitem(tmpdir, file_manager):
     assert len(file_manager[0]._striped_external_array) == len(file_manager[1]._striped_external_array) == 1
 
 
+def test_loader_array(mocker, file_manager):
+    spy = mocker.spy(AstropyFITSLoader, "__init__")
+    loaders = file_manager._striped_external_array.loader_array
+    assert isinstance(loaders, LoaderArray)
+    assert loaders.shape == (11,)
+
+    sliced = loaders[2:5]
+    assert isinstance(sliced, LoaderArray)
+    assert sliced.shape == (3,)
+    assert spy.call_count == 0
+
+    loader = sliced[1]
+    assert isinstance(loader, AstropyFITSLoader)
+    assert loader.fileuri == file_manager.filenames[3]
+    assert loader.basepath == file_manager.basepath
+    assert spy.call_count == 1
+
+    array = np.asarray(sliced)
+    assert array.dtype == object
+    assert [loader.fileuri for loader in array] == file_manager.filenames[2:5]
+    assert spy.call_count == 4
+
+
+def test_loader_array_created_on_compute(mocker, file_manager):
+    file_manager.basepath = eitdir
+    spy = mocker.spy(AstropyFITSLoader, "__init__")
+    array = file_manager._generate_array()
+    # Only the first loader is created, for its shape and dtype
+    assert {call.args[1] for call in spy.call_args_list} == {file_manager.filenames[0]}
+    spy.reset_mock()
+
+    array[3:5].compute()
+    assert spy.call_count == 2
+    assert spy.call_args.args[5] == eitdir
+
+
 def test_basepath_change(file_manager):
     file_manager.basepath = None
     array = file_manager._generate_array()
@@ -179,3 +252,262 @@ def test_file_manager_slice_slice(large_visp_dataset):
     assert len(spectrum.files) == 1
     assert spectrum.files._fm.output_shape == stokesI.files._fm.output_shape[1:]
     assert spectrum.files._fm._striped_external_array.loader_array.shape == ()
+
+
+def test_nested_views_composed(large_visp_dataset):
+    file_manager = large_visp_dataset.files._fm
+    root = file_manager._striped_external_array
+
+    sliced = file_manager[1:4][1:][0, 2:18][3:5]
+    view = sliced._striped_external_array
+    assert view.parent is root
+    assert view.parent_slice == (2, slice(5, 7, 1))
+    assert view.ndim == 1
+    assert len(view) == 2
+    assert (view.fileuri_array == root.fileuri_array[1:4][1:][0, 2:18][3:5]).all()
+    # The file uris are a read only view of the original array
+    assert np.shares_memory(view.fileuri_array, root.fileuri_array)
+    assert not view.fileuri_array.flags.writeable
+    assert (view.loader_array.fileuri_array == view.fileuri_array).all()
+
+    single = file_manager[1:4][1, 5]._striped_external_array
+    assert single.parent is root
+    assert single.fileuri_array.shape == ()
+    assert single.fileuri_array == root.fileuri_array[2, 5]
+
+
+@pytest.mark.parametrize(("first", "second"), [
+    (np.s_[2:8], np.s_[1:3]),
+    (np.s_[2:8, 3], np.s_[-1]),
+    (np.s_[::2, 1:], np.s_[::-1, 2]),
+    (np.s_[8:2:-1], np.s_[1::2]),
+    (np.s_[3:5], np.s_[4:]),
+    (np.s_[5:3], np.s_[::-1]),
+    (np.s_[1:], ()),
+])
+def test_compose_basic_index(first, second):
+    array = np.arange(100).reshape((10, 10))
+    first = first if isinstance(first, tuple) else (first,)
+    second = second if isinstance(second, tuple) else (second,)
+    composed = _compose_basic_index(array.shape, first, second)
+    assert composed is not None
+    expected = array[first][second]
+    assert array[composed].shape == expected.shape
+    assert (array[composed] == expected).all()
+
+
+def test_compose_not_basic_index():
+    assert _compose_basic_index((10, 10), (slice(None), [1, 2]), (0,)) is None
+    assert _compose_basic_index((10,), (slice(None),), (0, 1)) is None
+
+
+@pytest.mark.parametrize(("aslice", "n_files", "file_slice"), [
+    (np.s_[3, 10:20, 5:7], 1, np.s_[10:20, 5:7]),
+    (np.s_[3:5, 10:20, 5], 2, np.s_[10:20, 5]),
+    (np.s_[..., 100:, :2], 11, np.s_[100:128, 0:2]),
+])
+def test_slice_pushdown(mocker, eit_dataset, aslice, n_files, file_slice):
+    """
+    Check that slicing the array only reads the requested section of each file.
+    """
+    spy = mocker.spy(AstropyFITSLoader, "__getitem__")
+    expected = eit_dataset.data.compute()[aslice]
+    spy.reset_mock()
+
+    sliced = eit_dataset[aslice].data.compute()
+
+    assert_allclose(sliced, expected)
+    assert spy.call_count == n_files
+    for call in spy.call_args_list:
+        assert call.args[1] == file_slice
+
+
+def test_stack_loader_array_reshape(loader_array):
+    # An output shape which isn't just the loader array stacked with the frame
+    # shape uses the reshape fallback
+    array = stack_loader_array(loader_array, (11 * 128, 128))
+    assert array.shape == (11 * 128, 128)
+    assert_allclose(array, stack_loader_array(loader_array, (11, 128, 128)).reshape((11 * 128, 128)))
+
+
+def test_lazy_graph(loader_array):
+    array = stack_loader_array(loader_array, (11, 128, 128), chunksize=(64, 128))
+    layer = array.dask.layers[array.name]
+    assert not layer.is_materialized()
+    # One loader and two getter tasks for each file
+    assert len(layer) == 33
+    assert len(dict(layer)) == 33
+    assert (array.name, 10, 1, 0) in layer
+    assert (array.name, 11, 0, 0) not in layer
+
+    # Culling the graph of a slice only builds the tasks for the selected chunks
+    sliced = array[3:5, 10:20]
+    graph = sliced.dask.cull(set(flatten(sliced.__dask_keys__())))
+    culled = [layer for name, layer in graph.layers.items() if name.startswith(array.name)]
+    assert len(culled) == 1
+    assert set(culled[0]) == {(array.name, 3, 0, 0), (array.name, 4, 0, 0),
+                              (f"{array.name}-loader", 3), (f"{array.name}-loader", 4)}
+    assert_allclose(sliced, array.compute()[3:5, 10:20])
+
+
+@pytest.mark.skipif(utils.Task is None, reason="Culling lists every key with versions of dask without the task spec")
+def test_lazy_graph_cull_does_not_list_keys(loader_array, mocker):
+    array = stack_loader_array(loader_array, (11, 128, 128), chunksize=(64, 128))
+    expected = array.compute()[3:5, 10:20]
+    spy = mocker.spy(utils._LoaderLayer, "get_output_keys")
+    assert_allclose(array[3:5, 10:20].compute(), expected)
+    assert spy.call_count == 0
+
+
+@pytest.mark.parametrize(("chunk_bytes", "chunks"), [
+    (None, (1,) * 11),
+    (3 * 128 * 128 * 8, (3, 3, 3, 2)),
+    ("384KiB", (3, 3, 3, 2)),
+    (1, (1,) * 11),
+    ("1GiB", (11,)),
+])
+def test_chunk_bytes(file_manager, chunk_bytes, chunks):
+    expected = file_manager._generate_array().compute()
+
+    file_manager.chunk_bytes = chunk_bytes
+    array = file_manager._generate_array()
+
+    assert array.chunks[0] == chunks
+    assert array.shape == file_manager.output_shape
+    assert_allclose(array, expected)
+    assert_allclose(array[2:7, 10:20, 5], expected[2:7, 10:20, 5])
+
+
+def test_chunk_bytes_auto(file_manager):
+    with dask.config.set({"array.chunk-size": "512KiB"}):
+        file_manager.chunk_bytes = "auto"
+        assert file_manager._generate_array().chunks[0] == (4, 4, 3)
+
+
+def test_chunk_bytes_pushdown(mocker, file_manager):
+    file_manager.chunk_bytes = "1GiB"
+    array = file_manager._generate_array()
+    spy = mocker.spy(AstropyFITSLoader, "__getitem__")
+
+    array[3:5, 10:20, 5].compute()
+
+    assert spy.call_count == 2
+    for call in spy.call_args_list:
+        assert call.args[1] == np.s_[10:20, 5]
+
+
+@pytest.mark.parametrize(("lead_shape", "files_per_chunk", "chunks"), [
+    ((4, 20), 1, ((1,) * 4, (1,) * 20)),
+    ((4, 20), 8, ((1,) * 4, (8, 8, 4))),
+    ((4, 20), 40, ((2, 2), (20,))),
+    ((4, 20), 100, ((4,), (20,))),
+    ((), 10, ()),
+])
+def test_group_chunks(lead_shape, files_per_chunk, chunks):
+    assert _group_chunks(lead_shape, files_per_chunk) == chunks
+
+
+@pytest.mark.parametrize(("chunksize", "chunks"), [
+    ((32, 64), ((32,) * 4, (64, 64))),
+    ((100, 128), ((100, 28), (128,))),
+    ((1, 64, 64), ((64, 64), (64, 64))),
+    ((64,), ((128,), (64, 64))),
+])
+def test_sub_frame_chunks(mocker, file_manager, chunksize, chunks):
+    expected = file_manager._generate_array().compute()
+
+    file_manager.chunksize = chunksize
+    array = file_manager._generate_array()
+    assert array.chunks[1:] == chunks
+    assert array.chunks[0] == (1,) * 11
+
+    spy = mocker.spy(AstropyFITSLoader, "__getitem__")
+    assert_allclose(array[0], expected[0])
+    # Each block reads the section of the file it covers
+    assert spy.call_count == np.prod([len(c) for c in chunks])
+    assert_allclose(array[2:4, 10:90, 70], expected[2:4, 10:90, 70])
+
+
+def test_sub_frame_chunks_with_chunk_bytes(file_manager):
+    file_manager.chunksize = (32, 128)
+    file_manager.chunk_bytes = 3 * 32 * 128 * 8
+    array = file_manager._generate_array()
+    assert array.chunks == ((3, 3, 3, 2), (32,) * 4, (128,))
+    assert not np.isnan(array).any()
+
+
+@pytest.mark.parametrize("chunk_bytes", [None, "1GiB"])
+def test_dtype(mocker, file_manager, chunk_bytes):
+    file_manager.basepath = eitdir
+    file_manager.chunk_bytes = chunk_bytes
+    expected = file_manager._generate_array().compute()
+    assert file_manager.dtype == np.float64
+
+    file_manager.dtype = np.float32
+    array = file_manager.dask_array
+    assert file_manager.dtype == array.dtype == np.float32
+    # The data are cast by the loader rather than by another layer of the graph
+    assert len(array.dask.layers) == 1
+
+    spy = mocker.spy(AstropyFITSLoader, "__getitem__")
+    computed = array[2:5, 10:20].compute()
+    assert computed.dtype == np.float32
+    assert spy.call_count == 3
+    assert_allclose(computed, expected[2:5, 10:20].astype(np.float32))
+
+    file_manager.dtype = None
+    assert file_manager.dtype == file_manager.dask_array.dtype == np.float64
+
+
+def test_dtype_missing_files(file_manager):
+    file_manager.basepath = "/does/not/exist"
+    file_manager.dtype = np.float32
+    data = file_manager.dask_array[0].compute()
+    assert data.dtype == np.float32
+    assert np.isnan(data).all()
+
+
+def test_concurrent_loader(mocker, file_manager):
+    in_flight, max_in_flight = [0], [0]
+    lock = threading.Lock()
+    read = AstropyFITSLoader._read
+
+    def slow_read(self, slc):
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return read(self, slc)
+
+    mocker.patch.object(AstropyFITSLoader, "_read", slow_read)
+    file_manager.basepath = eitdir
+    file_manager.loader = ConcurrentFITSLoader
+    file_manager.chunk_bytes = "1GiB"
+    expected = np.stack([loader.data for loader in file_manager._striped_external_array.loader_array.flat])
+    max_in_flight[0] = 0
+    with dkist.conf.set_temp("read_concurrency", 4):
+        data = file_manager.dask_array.compute(scheduler="synchronous")
+
+    assert_allclose(data, expected)
+    # All the files are in one chunk, and are read four at a time
+    assert file_manager.dask_array.numblocks[0] == 1
+    assert max_in_flight[0] == 4
+
+
+def test_concurrent_loader_pool_replaced(file_manager):
+    file_manager.basepath = eitdir
+    file_manager.loader = ConcurrentFITSLoader
+    file_manager.chunk_bytes = "1GiB"
+    with dkist.conf.set_temp("read_concurrency", 2):
+        file_manager.dask_array.compute(scheduler="synchronous")
+        old_pool = _read_pool()
+    with dkist.conf.set_temp("read_concurrency", 3):
+        file_manager.dask_array.compute(scheduler="synchronous")
+        assert _read_pool() is not old_pool
+
+    # The threads of the old pool exit once it is replaced
+    for thread in list(old_pool._threads):
+        thread.join(timeout=5)
+        assert not thread.is_alive()
@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from astropy.io import fits
+
+from dkist.io.dask.file_pool import FITSFilePool
+from dkist.io.dask.loaders import AstropyFITSLoader
+
+
+@pytest.fixture
+def fits_files(tmp_path):
+    for i in range(4):
+        fits.PrimaryHDU(np.full((10, 10), i, dtype=float)).writeto(tmp_path / f"{i}.fits")
+    return tmp_path
+
+
+@pytest.fixture
+def file_pool():
+    file_pool = FITSFilePool(max_open=2, idle_timeout=60)
+    with patch("dkist.io.dask.loaders.file_pool", file_pool):
+        yield file_pool
+    file_pool.clear()
+
+
+def test_reuse(fits_files, file_pool, mocker):
+    spy = mocker.spy(fits, "open")
+    loader = AstropyFITSLoader("0.fits", (10, 10), float, 0, fits_files)
+    for i in range(3):
+        assert_allclose(loader[i], 0)
+
+    assert spy.call_count == 1
+    assert (file_pool.opens, file_pool.reuses) == (1, 2)
+    assert len(file_pool) == 1
+
+
+def test_max_open(fits_files, file_pool):
+    loaders = [AstropyFITSLoader(f"{i}.fits", (10, 10), float, 0, fits_files) for i in range(4)]
+    for i, loader in enumerate(loaders):
+        assert_allclose(loader[:], i)
+
+    assert len(file_pool) == 2
+    # The least recently used files were closed
+    assert {key[0] for _, key, _ in file_pool._idle} == {str(fits_files / "2.fits"), str(fits_files / "3.fits")}
+
+
+def test_idle_timeout(fits_files, file_pool):
+    file_pool._idle_timeout = 0.01
+    loader = AstropyFITSLoader("0.fits", (10, 10), float, 0, fits_files)
+    loader[:]
+    hdul = file_pool._idle[0][2]
+    time.sleep(0.05)
+    loader[:]
+    assert file_pool.opens == 2
+    assert hdul.fileinfo(0)["file"].closed
+
+
+def test_modified_file_not_reused(fits_files, file_pool):
+    loader = AstropyFITSLoader("0.fits", (10, 10), float, 0, fits_files)
+    assert_allclose(loader[:], 0)
+
+    fits.PrimaryHDU(np.full((10, 10), 5, dtype=float)).writeto(fits_files / "0.fits", overwrite=True)
+    stat = (fits_files / "0.fits").stat()
+    os.utime(fits_files / "0.fits", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert_allclose(loader[:], 5)
+    assert file_pool.opens == 2
+
+
+def test_disabled_by_default():
+    assert FITSFilePool().max_open == 0
+
+
+def test_disabled(fits_files, file_pool):
+    file_pool._max_open = 0
+    loader = AstropyFITSLoader("0.fits", (10, 10), float, 0, fits_files)
+    loader[:]
+    loader[:]
+    assert len(file_pool) == 0
+    assert file_pool.opens == 0
+
+
+def test_threads(fits_files, file_pool):
+    loaders = [AstropyFITSLoader(f"{i % 4}.fits", (10, 10), float, 0, fits_files) for i in range(40)]
+    results = [None] * len(loaders)
+
+    def read(i):
+        results[i] = loaders[i][2:8, 3]
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(len(loaders))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i, result in enumerate(results):
+        assert_allclose(result, i % 4)
+    assert len(file_pool) <= 2
+
+
+def test_clear(fits_files, file_pool):
+    AstropyFITSLoader("0.fits", (10, 10), float, 0, fits_files)[:]
+    hdul = file_pool._idle[0][2]
+    file_pool.clear()
+    assert len(file_pool) == 0
+    assert hdul.fileinfo(0)["file"].closed
@@ -0,0 +1,141 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from astropy.io import fits
+
+from dkist.data.test import rootdir
+from dkist.io.dask.frame_index import FrameIndex
+from dkist.io.dask.loaders import AstropyFITSLoader, DirectReadFITSLoader
+from dkist.io.dask.striped_array import FileManager
+
+eitdir = Path(rootdir) / "EIT"
+
+
+@pytest.fixture
+def eit_files(tmp_path):
+    fileuris = sorted(p.name for p in eitdir.glob("*.fits"))
+    for fileuri in fileuris:
+        shutil.copy(eitdir / fileuri, tmp_path)
+    return tmp_path, fileuris
+
+
+@pytest.fixture
+def direct_fm(eit_files):
+    basepath, fileuris = eit_files
+    return FileManager.from_parts(fileuris, 0, "float64", (128, 128),
+                                  loader=DirectReadFITSLoader, basepath=basepath)
+
+
+def test_build_and_load(eit_files):
+    basepath, fileuris = eit_files
+    index = FrameIndex.build(basepath, fileuris, 0, max_workers=2)
+
+    assert (basepath / FrameIndex.filename).exists()
+    assert len(index) == len(fileuris)
+
+    loaded = FrameIndex.for_basepath(basepath)
+    assert loaded.target == 0
+    assert (loaded.fileuris == index.fileuris).all()
+    assert (loaded.offsets == index.offsets).all()
+
+    with fits.open(basepath / fileuris[0]) as hdul:
+        expected = (hdul[0].fileinfo()["datLoc"], -64, (128, 128))
+    assert loaded.lookup(basepath, fileuris[0]) == expected
+
+
+def test_for_basepath_missing(tmp_path):
+    assert FrameIndex.for_basepath(tmp_path) is None
+
+
+def test_entry_no_dimensions():
+    index = FrameIndex(0, ["a.fits", "b.fits"], [2880, -1], [-64, 0], [[128, 64], [0, 0]], [1, 2], [3, 4])
+    assert index._entry(0)[2] == (128, 64)
+    assert index._entry(1)[2] == ()
+
+
+def test_for_basepath_cache_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(FrameIndex, "_cache", type(FrameIndex._cache)())
+    monkeypatch.setattr(FrameIndex, "cache_size", 2)
+    for i in range(3):
+        (tmp_path / str(i)).mkdir()
+        FrameIndex(0, ["a.fits"], [2880], [-64], [[10]], [1], [2]).save(tmp_path / str(i))
+        assert FrameIndex.for_basepath(tmp_path / str(i)) is not None
+    assert list(FrameIndex._cache) == [tmp_path / "1" / FrameIndex.filename, tmp_path / "2" / FrameIndex.filename]
+
+    cached = FrameIndex.for_basepath(tmp_path / "1")
+    assert FrameIndex.for_basepath(tmp_path / "1") is cached
+    assert next(reversed(FrameIndex._cache)) == tmp_path / "1" / FrameIndex.filename
+
+
+def test_stale_entry(eit_files):
+    basepath, fileuris = eit_files
+    index = FrameIndex.build(basepath, fileuris, 0)
+    assert index.lookup(basepath, fileuris[0]) is not None
+
+    stat = (basepath / fileuris[0]).stat()
+    os.utime(basepath / fileuris[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert index.lookup(basepath, fileuris[0]) is None
+    assert index.lookup(basepath, "not_indexed.fits") is None
+
+    # Rebuilding re-reads only the changed file
+    assert FrameIndex.build(basepath, fileuris, 0).lookup(basepath, fileuris[0]) is not None
+
+
+@pytest.mark.parametrize("aslice", [
+    np.s_[:],
+    np.s_[10:20, 5:7],
+    np.s_[5, 10:90:3],
+    np.s_[..., 4],
+    np.s_[-1, ::-2],
+    np.s_[20:10],
+    np.s_[[1, 2], 3],
+])
+def test_direct_read(direct_fm, aslice):
+    direct_fm.build_frame_index()
+    direct = direct_fm._striped_external_array.loader_array.flat[3]
+    reference = AstropyFITSLoader(direct.fileuri, direct.shape, direct.dtype, 0, direct.basepath)
+
+    assert direct._index_entry() is not None
+    data = direct[aslice]
+    assert data.dtype.isnative
+    assert_allclose(data, reference.data[aslice])
+
+
+def test_direct_read_fallback(direct_fm, mocker):
+    # With no index the loader reads the file with astropy
+    spy = mocker.spy(AstropyFITSLoader, "__getitem__")
+    array = direct_fm._generate_array()[2].compute()
+    assert spy.call_count == 1
+    assert not np.isnan(array).any()
+
+
+def test_direct_read_dask(direct_fm):
+    expected = direct_fm._generate_array().compute()
+    direct_fm.build_frame_index()
+    assert_allclose(direct_fm._generate_array()[:, 20:40, 30].compute(), expected[:, 20:40, 30])
+
+
+def test_build_frame_index_no_basepath(direct_fm):
+    direct_fm.basepath = None
+    with pytest.raises(ValueError, match="basepath"):
+        direct_fm.build_frame_index()
+
+
+@pytest.mark.parametrize("aslice", [
+    np.s_[0, 10:20, 5:7],
+    np.s_[0:1, 3, 5:],
+    np.s_[1, -1, -1],
+    np.s_[:, 29, ::7],
+])
+def test_direct_read_3d(tmp_path, aslice):
+    data = np.arange(2 * 30 * 40, dtype=np.int16).reshape((2, 30, 40))
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(data)]).writeto(tmp_path / "cube.fits")
+    FrameIndex.build(tmp_path, ["cube.fits"], 1)
+
+    loader = DirectReadFITSLoader("cube.fits", (2, 30, 40), "int16", 1, tmp_path)
+    assert_allclose(loader[aslice], data[aslice])
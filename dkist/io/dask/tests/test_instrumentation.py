@@ -0,0 +1,138 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import astropy.units as u
+
+from dkist.data.test import rootdir
+from dkist.io.dask.cache import FrameCache
+from dkist.io.dask.instrumentation import PHASES, IOEvent, _format_section, record_io
+from dkist.io.dask.loaders import AstropyFITSLoader, DirectReadFITSLoader, MemmapFITSLoader
+
+eitdir = Path(rootdir) / "EIT"
+
+
+@pytest.fixture
+def file_manager(eit_dataset):
+    file_manager = eit_dataset.files._fm
+    file_manager.basepath = eitdir
+    return file_manager
+
+
+def test_recording(file_manager):
+    with record_io() as recorder:
+        file_manager.dask_array[2:5, 10:20].compute()
+
+    table = recorder.to_table()
+    assert len(table) == 3
+    assert set(table["loader"]) == {"AstropyFITSLoader"}
+    assert set(table["path"]) == {str(eitdir / fn) for fn in file_manager.filenames[2:5]}
+    assert set(table["section"]) == {"[10:20, 0:128]"}
+    assert set(table["status"]) == {"read"}
+    assert (table["nbytes"] == 10 * 128 * 8).all()
+    assert table["duration"].unit == u.s
+    for phase in ("open", "header", "read"):
+        assert (table[phase] > 0).all()
+    assert (table["byteswap"] == 0).all()
+    # The phases are part of the duration of the call
+    total = sum(table[phase] for phase in PHASES)
+    assert (total <= table["duration"]).all()
+
+
+def test_not_recording(mocker, file_manager):
+    spy = mocker.spy(IOEvent, "__new__")
+    file_manager.dask_array[0].compute()
+    with record_io() as recorder:
+        pass
+    file_manager.dask_array[0].compute()
+    assert len(recorder) == 0
+    assert spy.call_count == 0
+
+
+def test_callback(file_manager):
+    events = []
+    with record_io(callback=events.append) as recorder:
+        file_manager.dask_array[0:2].compute(scheduler="threads")
+    assert len(recorder) == 0
+    assert len(events) == 2
+    assert all(isinstance(event, IOEvent) for event in events)
+
+
+def test_nested_recorders(file_manager):
+    with record_io() as outer:
+        file_manager.dask_array[0].compute()
+        with record_io() as inner:
+            file_manager.dask_array[1].compute()
+    assert len(outer) == 2
+    assert len(inner) == 1
+
+
+def test_threads(file_manager):
+    with record_io() as recorder:
+        file_manager.dask_array.compute(scheduler="threads")
+    table = recorder.to_table()
+    assert len(table) == 11
+    assert threading.get_ident() not in set(table["thread"])
+
+
+def test_missing(eit_dataset):
+    eit_dataset.files.basepath = "/does/not/exist"
+    with record_io() as recorder:
+        eit_dataset.files.dask_array[0].compute()
+    assert recorder.to_table()["status"].tolist() == ["missing"]
+
+
+def test_cached(mocker, file_manager):
+    mocker.patch("dkist.io.dask.loaders.frame_cache", FrameCache(max_bytes="10MiB"))
+    with record_io() as recorder:
+        file_manager.dask_array[0].compute()
+        file_manager.dask_array[0].compute()
+    assert recorder.to_table()["status"].tolist() == ["read", "cached"]
+
+
+def test_subclass_recorded_once(file_manager):
+    file_manager.loader = MemmapFITSLoader
+    with record_io() as recorder:
+        np.asarray(file_manager.dask_array[0:2].compute())
+    table = recorder.to_table()
+    assert table["loader"].tolist() == ["MemmapFITSLoader"] * 2
+
+
+def test_direct_read_byteswap(eit_dataset):
+    loader = DirectReadFITSLoader(eit_dataset.files.filenames[0], (128, 128), ">f8", 0, eitdir)
+    # The offset, BITPIX and shape of the array in the file
+    loader._index_entry = lambda: (8640, -64, (128, 128))
+    with record_io() as recorder:
+        loader[10:20]
+    event = recorder.events[0]
+    assert event.loader == "DirectReadFITSLoader"
+    assert event.read > 0
+    assert event.byteswap > 0
+    assert event.open == event.header == 0
+
+
+def test_empty_table():
+    with record_io() as recorder:
+        pass
+    table = recorder.to_table()
+    assert len(table) == 0
+    assert table.colnames == list(IOEvent._fields)
+
+
+@pytest.mark.parametrize(("slc", "expected"), [
+    (np.s_[:], "[:]"),
+    (np.s_[0:10, 5], "[0:10, 5]"),
+    (np.s_[2:, ::2], "[2:, ::2]"),
+    (np.s_[..., 3], "[..., 3]"),
+])
+def test_format_section(slc, expected):
+    assert _format_section(slc) == expected
+
+
+def test_loader_direct_call():
+    loader = AstropyFITSLoader(sorted(eitdir.glob("*.fits"))[0].name, (128, 128), float, 0, eitdir)
+    with record_io() as recorder:
+        loader[0:2]
+    assert recorder.events[0].section == "[0:2]"
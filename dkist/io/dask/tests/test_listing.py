@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from astropy.io import fits
+
+from dkist.io.dask.listing import DirectoryListings
+from dkist.io.dask.loaders import AstropyFITSLoader
+
+
+@pytest.fixture
+def listings(mocker):
+    listings = DirectoryListings()
+    mocker.patch("dkist.io.dask.loaders.directory_listings", listings)
+    return listings
+
+
+def _age_directory(path):
+    # Set the modification time far enough in the past that the listing is cached
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 * 10**9))
+
+
+def test_listing_cached(tmp_path, listings):
+    (tmp_path / "a.fits").touch()
+    _age_directory(tmp_path)
+
+    assert listings.exists(tmp_path / "a.fits")
+    assert not listings.exists(tmp_path / "b.fits")
+    assert listings.scans == 1
+
+
+def test_listing_invalidated(tmp_path, listings):
+    _age_directory(tmp_path)
+    assert not listings.exists(tmp_path / "a.fits")
+
+    (tmp_path / "a.fits").touch()
+    assert listings.exists(tmp_path / "a.fits")
+    assert listings.scans == 2
+
+
+def test_recent_listing_not_cached(tmp_path, listings):
+    (tmp_path / "a.fits").touch()
+    assert listings.exists(tmp_path / "a.fits")
+    assert listings.exists(tmp_path / "a.fits")
+    assert listings.scans == 2
+
+
+def test_refresh(tmp_path, listings):
+    _age_directory(tmp_path)
+    listings.names(tmp_path)
+    listings.refresh(tmp_path)
+    listings.names(tmp_path)
+    listings.refresh()
+    listings.names(tmp_path)
+    assert listings.scans == 3
+
+
+def test_missing_directory(tmp_path, listings):
+    assert listings.names(tmp_path / "missing") == frozenset()
+    assert not listings.exists(tmp_path / "missing" / "a.fits")
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64", "int16"])
+def test_missing_file(tmp_path, listings, mocker, dtype):
+    _age_directory(tmp_path)
+    loader = AstropyFITSLoader("missing.fits", (1000, 1000), dtype, 0, tmp_path)
+    spy = mocker.spy(os, "scandir")
+
+    data = loader[10:20]
+    assert data.shape == (10, 1000)
+    assert np.issubdtype(data.dtype, np.floating)
+    assert data.dtype.itemsize >= np.dtype(dtype).itemsize
+    assert np.isnan(data).all()
+    # The array is a broadcast of a single value
+    assert data.strides == (0, 0)
+    assert not data.flags.writeable
+
+    loader[20:30]
+    assert spy.call_count == 1
+
+
+def test_file_downloaded(tmp_path, listings):
+    _age_directory(tmp_path)
+    loader = AstropyFITSLoader("file.fits", (10, 10), float, 0, tmp_path)
+    assert np.isnan(loader[:]).all()
+
+    fits.PrimaryHDU(np.ones((10, 10))).writeto(tmp_path / "file.fits")
+    assert_allclose(loader[:], 1)
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from werkzeug import Response
+
+from astropy.io import fits
+
+import dkist
+from dkist.io.dask.loaders import FSSpecFITSLoader, HTTPFITSLoader
+from dkist.io.dask import loaders, remote
+from dkist.io.dask.remote import HTTPRangeFile, fetch_range
+from dkist.io.dask.striped_array import FileManager
+from dkist.utils.exceptions import DKISTUserWarning
+
+fsspec = pytest.importorskip("fsspec")
+pytest.importorskip("urllib3")
+
+
+@pytest.fixture(autouse=True)
+def array_info(monkeypatch):
+    # Don't reuse the array information of files served in other tests
+    monkeypatch.setattr(loaders, "_array_info", OrderedDict())
+
+
+@pytest.fixture
+def fits_server(httpserver, tmp_path):
+    """
+    Serve FITS files supporting range requests, and record the bytes sent.
+    """
+    data = np.arange(200 * 300, dtype=">f4").reshape((200, 300))
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(data)]).writeto(tmp_path / "image.fits")
+    compressed = np.arange(64 * 64, dtype=np.int32).reshape((64, 64))
+    fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(compressed, tile_shape=(8, 64))]).writeto(tmp_path / "comp.fits")
+
+    sent = []
+
+    def handler(request):
+        path = tmp_path / request.path.split("/")[-1]
+        if not path.exists():
+            return Response(status=404)
+        response = Response(path.read_bytes(), mimetype="application/fits")
+        response = response.make_conditional(request, accept_ranges=True, complete_length=path.stat().st_size)
+        if request.method == "GET":
+            sent.append(response.content_length)
+        return response
+
+    httpserver.expect_request("/data/image.fits").respond_with_handler(handler)
+    httpserver.expect_request("/data/comp.fits").respond_with_handler(handler)
+    httpserver.expect_request("/data/missing.fits").respond_with_handler(handler)
+    return httpserver.url_for("/data"), data, compressed, sent
+
+
+def test_range_file(fits_server):
+    base_url, _, _, _ = fits_server
+    with HTTPRangeFile(f"{base_url}/image.fits") as fobj:
+        header = fobj.read(80)
+        assert header.startswith(b"SIMPLE  =")
+        fobj.seek(-10, 2)
+        assert len(fobj.read(100)) == 10
+        assert fobj.read(10) == b""
+        assert fobj.tell() == fobj.size
+
+
+def test_range_not_supported(httpserver, monkeypatch):
+    monkeypatch.setattr(remote, "_warned_hosts", set())
+    httpserver.expect_request("/data/file.bin").respond_with_data(bytes(range(100)))
+    url = httpserver.url_for("/data/file.bin")
+
+    with pytest.warns(DKISTUserWarning, match="does not support range requests"):
+        assert fetch_range(url, 10, 5) == (bytes(range(10, 15)), 100)
+    # Only the first request to each server warns
+    assert fetch_range(url, 98, 5) == (bytes([98, 99]), 100)
+
+
+@pytest.mark.parametrize("aslice", [
+    np.s_[...],
+    np.s_[50:150, 100:200],
+    np.s_[10, 20:40],
+    np.s_[::-7, 5],
+    np.s_[100:101, 3:4],
+    np.s_[0:0],
+])
+def test_http_loader(fits_server, aslice):
+    base_url, data, _, _ = fits_server
+    loader = HTTPFITSLoader("image.fits", data.shape, data.dtype, 1, base_url)
+    assert loader.absolute_uri == f"{base_url}/image.fits"
+    assert_allclose(loader[aslice], data[aslice])
+
+
+def test_http_loader_transfers_section(fits_server):
+    base_url, data, _, sent = fits_server
+    loader = HTTPFITSLoader("image.fits", data.shape, data.dtype, 1, base_url)
+    loader.max_gap = 0
+    loader[50:60, 100:110]
+    sent.clear()
+
+    # The headers are only read once, and only the section is transferred
+    assert_allclose(loader[150:160, 200:210], data[150:160, 200:210])
+    assert len(sent) == 10
+    assert sum(sent) == 10 * 10 * 4
+
+
+def test_http_loader_headers_read_once(mocker, fits_server):
+    base_url, data, _, _ = fits_server
+    fm = FileManager.from_parts(["image.fits"] * 3, 1, data.dtype, data.shape,
+                                loader=HTTPFITSLoader, basepath=base_url)
+    spy = mocker.spy(HTTPFITSLoader, "_open_fits")
+
+    # The loaders are created again for each compute, but share the headers read
+    for _ in range(2):
+        assert_allclose(fm.dask_array[:, 10:20].compute(), np.stack([data[10:20]] * 3))
+    assert spy.call_count == 1
+
+
+def test_http_loader_compressed(fits_server):
+    base_url, _, compressed, _ = fits_server
+    loader = HTTPFITSLoader("comp.fits", compressed.shape, compressed.dtype, 1, base_url)
+    assert_allclose(loader[10:20, 5], compressed[10:20, 5])
+
+
+def test_http_loader_missing(fits_server):
+    base_url, data, _, _ = fits_server
+    loader = HTTPFITSLoader("missing.fits", data.shape, data.dtype, 1, base_url)
+    assert np.isnan(loader[10:20]).all()
+
+
+@pytest.fixture
+def memory_fs(tmp_path):
+    data = np.arange(200 * 300, dtype=">f4").reshape((200, 300))
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(data)]).writeto(tmp_path / "image.fits")
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/dkist-test/image.fits", (tmp_path / "image.fits").read_bytes())
+    yield "memory://dkist-test", data
+    fs.rm("/dkist-test", recursive=True)
+
+
+@pytest.mark.parametrize("aslice", [
+    np.s_[...],
+    np.s_[50:150, 100:200],
+    np.s_[10, 20:40],
+])
+def test_fsspec_loader(memory_fs, aslice):
+    base_url, data = memory_fs
+    loader = FSSpecFITSLoader("image.fits", data.shape, data.dtype, 1, base_url)
+    assert loader.absolute_uri == f"{base_url}/image.fits"
+    assert_allclose(loader[aslice], data[aslice])
+
+
+def test_fsspec_loader_missing(memory_fs):
+    base_url, data = memory_fs
+    loader = FSSpecFITSLoader("missing.fits", data.shape, data.dtype, 1, base_url)
+    assert np.isnan(loader[10:20]).all()
+
+
+def test_fsspec_loader_block_cache(fits_server, tmp_path):
+    base_url, data, _, sent = fits_server
+    with dkist.conf.set_temp("fsspec_cache_directory", str(tmp_path / "cache")), \
+         dkist.conf.set_temp("fsspec_block_size", 2**14):
+        loader = FSSpecFITSLoader("image.fits", data.shape, data.dtype, 1, base_url)
+        assert_allclose(loader[50:60, 100:110], data[50:60, 100:110])
+        # Only the blocks containing the headers and the section are transferred
+        assert 0 < sum(sent) < data.nbytes / 2
+
+        sent.clear()
+        loader = FSSpecFITSLoader("image.fits", data.shape, data.dtype, 1, base_url)
+        assert_allclose(loader[50:60, 100:110], data[50:60, 100:110])
+        assert sum(sent) == 0
@@ -1,63 +1,366 @@
-import warnings
+import math
+from itertools import product
 
 import dask
 import numpy as np
+from dask.array.core import getter, normalize_chunks
+from dask.base import tokenize
+from dask.highlevelgraph import HighLevelGraph, Layer, MaterializedLayer
+from dask.utils import parse_bytes
 
-from dkist.utils.exceptions import DKISTDeprecationWarning
+try:
+    from dask._task_spec import DataNode, Task, TaskRef
+except ImportError:  # pragma: no cover
+    # Versions of dask before the task spec was added only understand tuple tasks
+    Task = None
 
 __all__ = ["stack_loader_array"]
 
 
-def stack_loader_array(loader_array, output_shape, chunksize=None):
+def stack_loader_array(loader_array, output_shape, chunksize=None, *, chunk_bytes=None, dtype=None):
     """
     Converts an array of loaders to a dask array that loads a chunk from each loader
 
     This results in a dask array with the correct chunks and dimensions.
 
+    Each chunk of the array is read with a "getter" task, which means that
+    when the array is sliced, dask's graph optimisation merges the slice into
+    the read, and only the requested section of each file is loaded.
+
     Parameters
     ----------
-    loader_array : `dkist.io.loaders.BaseFITSLoader`
+    loader_array : `numpy.ndarray` or `dkist.io.dask.striped_array.LoaderArray`
         An array of loader objects
     output_shape : tuple[int]
         The intended shape of the final array
     chunksize : tuple[int]
-        Can be used to set a chunk size. If not provided, each batch is one chunk
+        Can be used to split each file into multiple chunks, by specifying the
+        chunk size of the trailing (frame) dimensions of the array. Each chunk
+        is read directly from the corresponding section of the file. If not
+        provided, each file is one chunk.
+    chunk_bytes : `int` or `str`, optional
+        If provided, consecutive files are grouped into chunks of at most this
+        many bytes (or one file if a file is larger), each read by a single
+        task. This can be a number of bytes, a string such as ``"128MiB"`` or
+        ``"auto"`` to use dask's ``array.chunk-size`` configuration option.
+        If not provided each file is one chunk.
+    dtype : `numpy.dtype`, optional
+        If provided, the data are cast to this dtype as they are read, rather
+        than having the dtype of the files.
 
     Returns
     -------
     array : `dask.array.Array`
     """
-    file_shape = loader_array.flat[0].shape
-
-    tasks = {}
-    for i, loader in enumerate(loader_array.flat):
-        # The key identifies this chunk's position in the (partially-flattened) final data cube
-        key = ("load_files", i)
-        key += (0,) * len(file_shape)
-        # Each task will be to call _call_loader, with the loader as an argument
-        tasks[key] = (_call_loader, loader)
-
-    dsk = dask.highlevelgraph.HighLevelGraph.from_collections("load_files", tasks, dependencies=())
-    # Specifies that each chunk occupies a space of 1 pixel in the first dimension, and all the pixels in the others
-    chunks = (*((1,) * loader_array.size,), *((s,) for s in file_shape))
-    array = dask.array.Array(dsk,
-                             name="load_files",
-                             chunks=chunks,
-                             dtype=loader_array.flat[0].dtype)
-    # Now impose the higher dimensions on the data cube
+    file_shape = tuple(loader_array.flat[0].shape)
+    output_shape = tuple(output_shape)
+
+    # The leading dimensions of the output array are the dimensions of the
+    # loader array, unless there is only one file, when they are omitted.
+    lead_shape = tuple(loader_array.shape) if loader_array.size != 1 else ()
+    frame_shape = output_shape[len(lead_shape):]
+    squashed = file_shape[0] == 1 and frame_shape == file_shape[1:]
+    if output_shape[:len(lead_shape)] == lead_shape and (frame_shape == file_shape or squashed):
+        return _stack_frames(loader_array.reshape(lead_shape), frame_shape, chunk_bytes, chunksize, dtype)
+
+    # For any other arrangement fall back to stacking the files along the
+    # first axis and reshaping.
+    array = _stack_frames(loader_array.reshape(-1), file_shape, chunk_bytes, dtype=dtype)
     array = array.reshape(output_shape)
     if chunksize is not None:
-        warnings.warn("Using the dask file loader with a non-default chunksize is deprecated. "
-                      "If you see this warning loading an ASDF file please open an issue "
-                      "on GitHub: https://github.com/DKISTDC/dkist/issues", DKISTDeprecationWarning)
-        # If requested, re-chunk the array. Not sure this is optimal
-        new_chunks = (1,) * (array.ndim - len(chunksize)) + chunksize
+        new_chunks = (1,) * (array.ndim - len(chunksize)) + tuple(chunksize)
         array = array.rechunk(new_chunks)
     return array
 
 
-def _call_loader(loader):
-    data = loader.data
-    # The data needs an extra dimension for the leading index of the intermediate data cube, which has a leading
-    # index for file number
-    return np.expand_dims(data, 0)
+def _frame_chunks(frame_shape, chunksize, dtype):
+    """
+    The chunks of the frame dimensions, given the chunk size of the trailing dimensions of the array.
+    """
+    if chunksize is None:
+        return tuple((s,) for s in frame_shape)
+    chunksize = tuple(chunksize)[-len(frame_shape):] if frame_shape else ()
+    chunksize = (-1,) * (len(frame_shape) - len(chunksize)) + chunksize
+    return normalize_chunks(chunksize, shape=frame_shape, dtype=dtype)
+
+
+def _files_per_chunk(chunk_bytes, frame_shape, dtype):
+    """
+    The number of frames of ``frame_shape`` which fit in a chunk of ``chunk_bytes``.
+    """
+    if chunk_bytes is None:
+        return 1
+    if chunk_bytes == "auto":
+        chunk_bytes = dask.config.get("array.chunk-size")
+    if isinstance(chunk_bytes, str):
+        chunk_bytes = parse_bytes(chunk_bytes)
+    frame_bytes = int(np.prod(frame_shape)) * np.dtype(dtype).itemsize
+    return max(1, int(chunk_bytes) // max(1, frame_bytes))
+
+
+def _group_chunks(lead_shape, files_per_chunk):
+    """
+    Chunk the leading dimensions so that each chunk has at most ``files_per_chunk`` consecutive files.
+
+    Whole trailing dimensions are grouped together first, then the remainder
+    is used to chunk the next dimension.
+    """
+    chunks = []
+    remaining = files_per_chunk
+    for size in lead_shape[::-1]:
+        step = max(1, min(remaining, size))
+        chunks.append((step,) * (size // step) + ((size % step,) if size % step else ()))
+        remaining = remaining // size if remaining >= size else 1
+    return tuple(chunks[::-1])
+
+
+def _stack_frames(loader_array, frame_shape, chunk_bytes=None, chunksize=None, dtype=None):
+    """
+    Build a dask array from an array of loaders, with the frames stacked along the dimensions of ``loader_array``.
+
+    Each chunk is a section of the frames in a group of consecutive files.
+    """
+    lead_shape = loader_array.shape
+    first_loader = loader_array.flat[0]
+    dtype = np.dtype(first_loader.dtype if dtype is None else dtype)
+    frame_chunks = _frame_chunks(frame_shape, chunksize, dtype)
+    files_per_chunk = _files_per_chunk(chunk_bytes, tuple(max(c) for c in frame_chunks), dtype)
+    lead_chunks = _group_chunks(lead_shape, files_per_chunk)
+    # A LoaderArray has the file uris without creating the loaders
+    fileuris = getattr(loader_array, "fileuri_array", None)
+    if fileuris is None:
+        fileuris = [loader.fileuri for loader in loader_array.flat]
+    name = "load_files-" + tokenize(fileuris,
+                                    type(first_loader), first_loader.target,
+                                    first_loader.shape, first_loader.dtype, dtype,
+                                    lead_chunks, frame_chunks)
+
+    layer = _LoaderLayer(name, loader_array, frame_shape, lead_chunks, frame_chunks, dtype)
+    dsk = HighLevelGraph({name: layer}, {name: set()})
+    return dask.array.Array(dsk, name=name, chunks=(*lead_chunks, *frame_chunks), dtype=dtype)
+
+
+class _LoaderLayer(Layer):
+    """
+    A graph layer which generates the tasks for each chunk of the stacked array when they are needed.
+
+    There is one getter task per chunk, keyed ``(name, *lead_index,
+    *frame_index)``, which reads a section of the `_LoaderChunk` keyed
+    ``(name + "-loader", *lead_index)``. The loaders are stored as their own
+    key, so that a getter task referencing them can be fused with any
+    subsequent slicing of the array.
+
+    None of the tasks are built when the array is created or sliced, and when
+    the graph is culled only the tasks for the selected chunks are built.
+
+    With versions of dask which have the task spec, the tasks are built as
+    `dask._task_spec.Task` objects, so that dask can cull the graph without
+    listing every key of the layer, and computing part of an array backed by
+    many files does not scale with the total number of files. Older versions
+    of dask are given tuple tasks, for which culling lists every key of the
+    layer, which takes a time proportional to the number of chunks.
+    """
+
+    def __init__(self, name, loader_array, frame_shape, lead_chunks, frame_chunks, dtype):
+        super().__init__()
+        self.name = name
+        self.loader_name = f"{name}-loader"
+        self.loader_array = loader_array
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = dtype
+        self.lead_bounds = [np.cumsum((0, *c)).tolist() for c in lead_chunks]
+        self.frame_bounds = [np.cumsum((0, *c)).tolist() for c in frame_chunks]
+        self.lead_numblocks = tuple(len(c) for c in lead_chunks)
+        self.frame_numblocks = tuple(len(c) for c in frame_chunks)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} numblocks={self.lead_numblocks + self.frame_numblocks}>"
+
+    @property
+    def has_legacy_tasks(self):
+        return Task is None
+
+    def is_materialized(self):
+        return False
+
+    def _split_key(self, key):
+        """
+        Return the lead and frame block indices of a key in this layer, or `None` if the key isn't in this layer.
+
+        The frame index of a loader key is `None`.
+        """
+        if not isinstance(key, tuple) or not key:
+            return None
+        index = key[1:]
+        if key[0] == self.name:
+            numblocks = self.lead_numblocks + self.frame_numblocks
+        elif key[0] == self.loader_name:
+            numblocks = self.lead_numblocks
+        else:
+            return None
+        if len(index) != len(numblocks) or not all(isinstance(i, (int, np.integer)) and 0 <= i < n
+                                                   for i, n in zip(index, numblocks)):
+            return None
+        n_lead = len(self.lead_numblocks)
+        return index[:n_lead], (index[n_lead:] if key[0] == self.name else None)
+
+    def _loader_chunk(self, lead_index):
+        block = tuple(slice(b[i], b[i+1]) for b, i in zip(self.lead_bounds, lead_index))
+        return _LoaderChunk(self.loader_array[(*block, ...)], self.frame_shape, self.dtype)
+
+    def _getter_task(self, lead_index, frame_index):
+        section = tuple(slice(b[i], b[i+1]) for b, i in zip(self.frame_bounds, frame_index))
+        lead_slice = (slice(None),) * len(lead_index)
+        loader_key = (self.loader_name, *lead_index)
+        if Task is None:
+            return (getter, loader_key, lead_slice + section)
+        return Task((self.name, *lead_index, *frame_index), getter, TaskRef(loader_key), lead_slice + section)
+
+    def _loader_task(self, lead_index):
+        loader_key = (self.loader_name, *lead_index)
+        if Task is None:
+            return self._loader_chunk(lead_index)
+        return DataNode(loader_key, self._loader_chunk(lead_index))
+
+    def __getitem__(self, key):
+        split = self._split_key(key)
+        if split is None:
+            raise KeyError(key)
+        lead_index, frame_index = split
+        if frame_index is None:
+            return self._loader_task(lead_index)
+        return self._getter_task(lead_index, frame_index)
+
+    def __contains__(self, key):
+        return self._split_key(key) is not None
+
+    def __iter__(self):
+        for lead_index in product(*map(range, self.lead_numblocks)):
+            yield (self.loader_name, *lead_index)
+            for frame_index in product(*map(range, self.frame_numblocks)):
+                yield (self.name, *lead_index, *frame_index)
+
+    def __len__(self):
+        return math.prod(self.lead_numblocks) * (1 + math.prod(self.frame_numblocks))
+
+    def get_output_keys(self):
+        blocks = product(*map(range, self.lead_numblocks + self.frame_numblocks))
+        return {(self.name, *index) for index in blocks}
+
+    def get_dependencies(self, key, all_hlg_keys):
+        lead_index, frame_index = self._split_key(key)
+        return set() if frame_index is None else {(self.loader_name, *lead_index)}
+
+    def cull(self, keys, all_hlg_keys):
+        """
+        Build a materialized layer of only the tasks needed to compute ``keys``.
+
+        This only considers the requested keys, so its cost is proportional
+        to the number of selected chunks rather than the size of the layer.
+        """
+        tasks = {}
+        deps = {}
+        loader_keys = {}
+        for key in keys:
+            split = self._split_key(key)
+            if split is None or split[1] is None:
+                continue
+            lead_index, frame_index = split
+            loader_key = (self.loader_name, *lead_index)
+            tasks[key] = self._getter_task(lead_index, frame_index)
+            deps[key] = {loader_key}
+            loader_keys[loader_key] = lead_index
+
+        # The loader keys are listed after the getter keys which depend on
+        # them, so that they are removed from the keys still to be culled.
+        for loader_key, lead_index in loader_keys.items():
+            tasks[loader_key] = self._loader_task(lead_index)
+            deps[loader_key] = set()
+        return MaterializedLayer(tasks, annotations=self.annotations), deps
+
+
+class _LoaderChunk:
+    """
+    Presents an array of loaders as a single chunk of the stacked array.
+
+    The chunk has the dimensions of the array of loaders, followed by the
+    frame dimensions. Indexing the chunk translates the index into one for
+    each of the selected loaders, so that they only read the requested section
+    of each file.
+
+    If ``dtype`` differs from the dtype of the loaders, each file is cast to
+    ``dtype`` as it is read.
+    """
+
+    def __init__(self, loaders, frame_shape, dtype=None):
+        # Converting a LoaderArray creates the loaders of this chunk
+        self.loaders = loaders = np.asarray(loaders, dtype=object)
+        self.n_lead = loaders.ndim
+        first_loader = loaders.flat[0]
+        # If the frame has one less dimension than the file, we index the
+        # dropped (length one) dimension with 0.
+        self.squash = len(frame_shape) != len(first_loader.shape)
+        self.shape = tuple(loaders.shape) + tuple(frame_shape)
+        self.dtype = np.dtype(first_loader.dtype if dtype is None else dtype)
+        # Only cast if the dtype was changed, so the byte order of the data read is kept otherwise
+        self.cast = self.dtype != np.dtype(first_loader.dtype)
+        self.ndim = len(self.shape)
+
+    def __getitem__(self, item):
+        basic_item = self._expand_basic_index(item)
+        if basic_item is None:
+            # Anything other than integers and slices is applied after loading the whole chunk.
+            return self[...][item]
+
+        lead_item, frame_item = basic_item[:self.n_lead], basic_item[self.n_lead:]
+        # The Ellipsis ensures this is always an array, even if all the leading dimensions are dropped
+        loaders = self.loaders[(*lead_item, ...)]
+
+        if loaders.size == 0:
+            frame = np.empty(self.shape[self.n_lead:], dtype=self.dtype)[frame_item]
+            return np.empty(loaders.shape + frame.shape, dtype=self.dtype)
+
+        if self.squash:
+            frame_item = (0, *frame_item)
+        if loaders.size == 1:
+            # Don't copy the data into a new array if there is only one file
+            data = np.asarray(loaders.flat[0][frame_item])
+            if self.cast:
+                data = _cast(data, self.dtype)
+            return data.reshape(loaders.shape + data.shape)
+
+        # Copy each file into the output array as it is read, so only one
+        # file is held in memory in its original dtype.
+        frames = iter(type(loaders.flat[0]).read_many(loaders.flat, frame_item))
+        first = np.asarray(next(frames))
+        data = np.empty((loaders.size, *first.shape), dtype=self.dtype if self.cast else first.dtype)
+        data[0] = first
+        for i, frame in enumerate(frames, start=1):
+            data[i] = frame
+        return data.reshape(loaders.shape + data.shape[1:])
+
+    def _expand_basic_index(self, item):
+        """
+        Expand an index to one int or slice per dimension, or return `None` if it contains anything else.
+        """
+        item = item if isinstance(item, tuple) else (item,)
+        ellipses = [n for n, i in enumerate(item) if i is Ellipsis]
+        if len(ellipses) == 1:
+            position = ellipses[0]
+            fill = (slice(None),) * (self.ndim - len(item) + 1)
+            item = item[:position] + fill + item[position+1:]
+        item = item + (slice(None),) * (self.ndim - len(item))
+        basic = all(isinstance(i, slice) or (isinstance(i, (int, np.integer)) and not isinstance(i, bool))
+                    for i in item)
+        if len(item) != self.ndim or not basic:
+            return None
+        return item
+
+
+def _cast(data, dtype):
+    """
+    Cast an array to ``dtype``, keeping arrays which are a broadcast of one value (such as placeholders for missing files) as a broadcast.
+    """
+    if data.size > 1 and not any(data.strides):
+        return np.broadcast_to(data.reshape(-1)[:1].astype(dtype), data.shape)
+    return data.astype(dtype)
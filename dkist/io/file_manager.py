@@ -9,15 +9,27 @@ from typing import Any
 from pathlib import Path
 from textwrap import dedent
 
+import numpy as np
+from numpy.typing import DTypeLike
 from parfive import Downloader, Results
 
 from dkist import log
+from dkist.io.dask.listing import directory_listings
+from dkist.io.dask.loaders import BaseFITSLoader, FSSpecFITSLoader, HTTPFITSLoader
 from dkist.io.dask.striped_array import FileManager, FileManagerProtocol
-from dkist.io.utils import filemanager_info_str
+from dkist.io.utils import filemanager_info_str, is_url
+from dkist.io.verify import VerificationReport, verify_files
 from dkist.utils.inventory import humanize_inventory, path_format_inventory
 
 __all__ = ["DKISTFileManager"]
 
+# The loader used to read remote files for each URL scheme, files with any
+# other scheme supported by fsspec are read with FSSpecFITSLoader
+REMOTE_LOADERS = {
+    "http": HTTPFITSLoader,
+    "https": HTTPFITSLoader,
+}
+
 
 class DKISTFileManager:
     """
@@ -28,13 +40,14 @@ class DKISTFileManager:
     retrieving these FITS files, as well as specifying where to load these
     files from.
     """
-    __slots__ = ["_fm", "_inventory_cache", "_ndcube"]
+    __slots__ = ["_fm", "_inventory_cache", "_local", "_ndcube"]
 
     @classmethod
-    def from_parts(cls, fileuris, target, dtype, shape, *, loader, basepath=None, chunksize=None):
+    def from_parts(cls, fileuris, target, dtype, shape, *, loader, basepath=None, chunksize=None, chunk_bytes=None):
         return cls(
             FileManager.from_parts(
-                fileuris, target, dtype, shape, loader=loader, basepath=basepath, chunksize=chunksize
+                fileuris, target, dtype, shape, loader=loader, basepath=basepath, chunksize=chunksize,
+                chunk_bytes=chunk_bytes,
             )
         )
 
@@ -45,6 +58,8 @@ class DKISTFileManager:
         # The name `_ndcube` comes from using NDCubeLinkedDescriptor in Dataset
         self._ndcube = parent_ndcube
         self._inventory_cache = None
+        # The basepath and loader used to read local files while reading remote files
+        self._local = None
 
     def __len__(self):
         return self._fm.__len__()
@@ -63,15 +78,263 @@ class DKISTFileManager:
         return dedent(f"{prefix}\n{self.__str__()}")
 
     @property
-    def basepath(self) -> os.PathLike:
+    def basepath(self) -> os.PathLike | str:
         """
         The path all arrays read data from.
+
+        This is a URL if the files are being read remotely (see `use_remote`).
         """
         return self._fm.basepath
 
     @basepath.setter
     def basepath(self, basepath: str | os.PathLike):
-        self._fm.basepath = Path(basepath)
+        self._fm.basepath = basepath if is_url(basepath) else Path(basepath)
+
+    @property
+    def is_remote(self) -> bool:
+        """
+        `True` if the data are being read from remote files, see `use_remote`.
+        """
+        return self._local is not None
+
+    @property
+    def _local_basepath(self):
+        return self._local[0] if self.is_remote else self.basepath
+
+    def use_remote(self, base_url: str, *, loader: type[BaseFITSLoader] | None = None):
+        """
+        Read the data directly from remote copies of the files, rather than from ``basepath``.
+
+        Only the parts of the files needed to compute the data are
+        transferred, so small sections of large datasets can be computed
+        without downloading the whole dataset. The data of the
+        `~dkist.Dataset` these files belong to is updated to read from the
+        remote files. This requires the packages installed with the
+        ``remote`` extra (``pip install dkist[remote]``).
+
+        Parameters
+        ----------
+        base_url
+            The URL of the directory containing the files, e.g.
+            ``https://example.org/pid_1_123/AAAAA`` or
+            ``s3://bucket/pid_1_123/AAAAA``.
+        loader
+            The loader used to read the remote files. The default is
+            `~dkist.io.dask.HTTPFITSLoader` for HTTP URLs and
+            `~dkist.io.dask.FSSpecFITSLoader` for any other URL.
+
+        Raises
+        ------
+        ValueError
+            If the dataset has been sliced, as the data of a sliced dataset
+            can not be switched to read from different files.
+
+        See Also
+        --------
+        use_local
+        """
+        self._check_not_sliced()
+        if loader is None:
+            import fsspec  # noqa: PLC0415
+
+            scheme = urllib.parse.urlparse(base_url).scheme
+            if scheme not in REMOTE_LOADERS and scheme not in fsspec.available_protocols():
+                raise ValueError(f"There is no loader for reading {scheme!r} URLs.")
+            loader = REMOTE_LOADERS.get(scheme, FSSpecFITSLoader)
+        if not self.is_remote:
+            self._local = (self.basepath, self.loader)
+        self._fm.loader = loader
+        self._fm.basepath = base_url
+        self._update_ndcube_data()
+
+    def use_local(self, basepath: str | os.PathLike | None = None):
+        """
+        Read the data from local files, after reading it remotely with `use_remote`.
+
+        Parameters
+        ----------
+        basepath
+            The directory containing the files. Defaults to the ``basepath``
+            before `use_remote` was called.
+
+        Raises
+        ------
+        ValueError
+            If the dataset has been sliced.
+        """
+        self._check_not_sliced()
+        if self.is_remote:
+            local_basepath, loader = self._local
+            self._local = None
+            self._fm.loader = loader
+            self._fm.basepath = local_basepath
+        if basepath is not None:
+            self.basepath = basepath
+        self._update_ndcube_data()
+
+    def _check_not_sliced(self):
+        """
+        Raise an error if the data of the parent dataset is a slice of the files.
+
+        This is checked before changing the loader or basepath, as they are
+        shared with the dataset which was sliced.
+        """
+        if self._ndcube is not None and self._fm.dask_array.shape != self._ndcube.data.shape:
+            raise ValueError("The data of a sliced dataset can not be updated to read from different files, "
+                             "switch the files of the full dataset before slicing it.")
+
+    def _update_ndcube_data(self):
+        """
+        Update the data of the parent dataset to use the current loader.
+        """
+        if self._ndcube is not None:
+            self._ndcube.data = self._fm.dask_array
+
+    @property
+    def loader(self) -> type[BaseFITSLoader]:
+        """
+        The `~dkist.io.dask.loaders.BaseFITSLoader` subclass used to read the data from the files.
+
+        Setting this property only affects arrays generated after it is set,
+        i.e. it does not change the data of an existing `~dkist.Dataset`.
+        """
+        return self._fm.loader
+
+    @loader.setter
+    def loader(self, loader: type[BaseFITSLoader]):
+        self._fm.loader = loader
+
+    @property
+    def chunksize(self) -> tuple[int, ...] | None:
+        """
+        The chunk size of the trailing (frame) dimensions of the Dask array.
+
+        If set, each file is split into multiple chunks, each of which is read
+        directly from the corresponding section of the file, so that
+        algorithms working on sections of large frames only read those
+        sections into memory. If `None` (the default) each file is one chunk.
+
+        Setting this property only affects arrays generated after it is set,
+        i.e. it does not change the data of an existing `~dkist.Dataset`.
+        """
+        return self._fm.chunksize
+
+    @chunksize.setter
+    def chunksize(self, chunksize: tuple[int, ...] | None):
+        self._fm.chunksize = chunksize
+
+    @property
+    def chunk_bytes(self) -> int | str | None:
+        """
+        The target size of the chunks of the Dask array, in bytes.
+
+        If set, consecutive files are grouped into chunks of up to this size,
+        so that each chunk is read by one task. It can be an integer, a string
+        such as ``"128MiB"`` or ``"auto"`` to use the ``array.chunk-size``
+        dask configuration option. If `None` (the default) each file is one
+        chunk.
+
+        Setting this property only affects arrays generated after it is set,
+        i.e. it does not change the data of an existing `~dkist.Dataset`.
+        """
+        return self._fm.chunk_bytes
+
+    @chunk_bytes.setter
+    def chunk_bytes(self, chunk_bytes: int | str | None):
+        self._fm.chunk_bytes = chunk_bytes
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        The dtype of the Dask array.
+
+        By default this is the dtype of the arrays in the FITS files. Setting
+        it (for example to ``np.float32`` to halve the memory used by float64
+        data) casts each file to the new dtype as it is read, rather than
+        adding a separate step to the Dask graph. Setting it to `None`
+        restores the dtype of the files.
+
+        Setting this property only affects arrays generated after it is set,
+        i.e. it does not change the data of an existing `~dkist.Dataset`.
+        """
+        return self._fm.dtype
+
+    @dtype.setter
+    def dtype(self, dtype: DTypeLike | None):
+        self._fm.dtype = dtype
+
+    @property
+    def available(self) -> np.ndarray:
+        """
+        A boolean array, shaped like ``fileuri_array``, which is `True` where the file is in ``basepath``.
+
+        Each directory containing the files is listed once, and the listing
+        is reused until the directory is modified. Files added in the same
+        second as the directory was last listed may not be seen until
+        `refresh_available` is called.
+
+        See Also
+        --------
+        available_slices
+        """
+        fileuris = self.fileuri_array
+        available = np.zeros(fileuris.shape, dtype=bool)
+        basepath = self._local_basepath
+        if basepath is None:
+            return available
+        listings = {}
+        for i, fileuri in enumerate(fileuris.flat):
+            # Masked tiles of a TiledDataset have empty file uris
+            if not fileuri:
+                continue
+            path = Path(basepath) / fileuri
+            if path.parent not in listings:
+                listings[path.parent] = directory_listings.names(path.parent)
+            available.flat[i] = path.name in listings[path.parent]
+        return available
+
+    def refresh_available(self):
+        """
+        Discard the cached listings of the directories containing the files, see `available`.
+        """
+        basepath = self._local_basepath
+        if basepath is None:
+            return
+        for directory in {(Path(basepath) / fileuri).parent for fileuri in self.fileuri_array.flat if fileuri}:
+            directory_listings.refresh(directory)
+
+    def available_slices(self, axis: int = 0) -> list[tuple[slice, ...]]:
+        """
+        Slices of the dataset which only contain frames whose files are available.
+
+        The slices select each run of consecutive indices along ``axis``
+        for which all the files are in ``basepath``, so that partially
+        transferred datasets can be analysed without the missing frames
+        being filled with NaN.
+
+        Parameters
+        ----------
+        axis
+            The (array) axis of the dataset to split, which must be one of
+            the axes of ``fileuri_array``.
+
+        Returns
+        -------
+        `list` of `tuple`
+            The slices, which can be used to slice the `~dkist.Dataset`.
+
+        Examples
+        --------
+        >>> datasets = [ds[slc] for slc in ds.files.available_slices()]  # doctest: +SKIP
+        """
+        available = self.available
+        if not 0 <= axis < available.ndim:
+            raise ValueError(f"axis must be one of the {available.ndim} axes of the file array.")
+        complete = available.all(axis=tuple(i for i in range(available.ndim) if i != axis))
+        # Find the start and end of each run of True values
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], complete.astype(np.int8), [0]])))
+        return [(*(slice(None),) * axis, slice(int(start), int(stop)))
+                for start, stop in zip(edges[::2], edges[1::2])]
 
     def __getattr__(self, attr):
         # We want to proxy a fixed list of public API:
@@ -81,6 +344,7 @@ class DKISTFileManager:
             "output_shape",
             "filenames",
             "dask_array",
+            "build_frame_index",
         ]
 
         if attr in proxy_api:
@@ -163,8 +427,8 @@ class DKISTFileManager:
             was not.
         """
         url = f"{self._metadata_streamer_url}/quality?datasetId={self._dataset_id}"
-        if path is None and self.basepath:
-            path = self.basepath
+        if path is None and self._local_basepath:
+            path = self._local_basepath
         return Downloader.simple_download([url], path=path, overwrite=overwrite)
 
     def preview_movie(self, path: str | os.PathLike | None = None, overwrite: bool | None = None) -> Results:
@@ -190,8 +454,8 @@ class DKISTFileManager:
             was not.
         """
         url = f"{self._metadata_streamer_url}/movie?datasetId={self._dataset_id}"
-        if path is None and self.basepath:
-            path = self.basepath
+        if path is None and self._local_basepath:
+            path = self._local_basepath
         return Downloader.simple_download([url], path=path, overwrite=overwrite)
 
     def download(
@@ -251,7 +515,7 @@ class DKISTFileManager:
         path_inv = path_format_inventory(humanize_inventory(inv))
 
         base_path = Path(net_conf.dataset_path.format(**inv))
-        destination_path = path or self.basepath or "/~/"
+        destination_path = path or self._local_basepath or "/~/"
         destination_path = Path(destination_path).as_posix()
         destination_path = Path(destination_path.format(**path_inv))
 
@@ -281,4 +545,38 @@ class DKISTFileManager:
             if str(destination_path).startswith("/~/"):
                 local_destination = Path(str(destination_path)[1:])
             local_destination = destination_path.expanduser()
-            self.basepath = local_destination
+            if self.is_remote:
+                self._local = (local_destination, self._local[1])
+            else:
+                self.basepath = local_destination
+
+    def verify(self, *, checksum: bool = False, max_workers: int | None = None) -> VerificationReport:
+        """
+        Check that the files in ``basepath`` are present and complete.
+
+        Each file is checked to exist and to be at least as long as its
+        headers say it should be. Run this after a transfer (see `download`)
+        to find any files which need to be transferred again, before
+        starting a long computation.
+
+        The results are cached on the modification time of each file, so
+        verifying again only checks the files which have changed.
+
+        Parameters
+        ----------
+        checksum
+            If `True` also verify the ``CHECKSUM`` and ``DATASUM`` keywords
+            of each file, which reads all the files.
+        max_workers
+            The number of threads used to verify the files.
+
+        Returns
+        -------
+        `~dkist.io.verify.VerificationReport`
+            The status of each file, in arrays with the same shape as
+            ``fileuri_array``.
+        """
+        basepath = self._local_basepath
+        if basepath is None:
+            raise ValueError("A basepath must be set to verify the files.")
+        return verify_files(self.fileuri_array, basepath, checksum=checksum, max_workers=max_workers)
@@ -1,12 +1,19 @@
+import os
+import re
+import shutil
 import logging
 from pathlib import Path
 
 import globus_sdk
 import numpy as np
 import pytest
+from numpy.testing import assert_allclose
 from packaging.version import Version
+from werkzeug import Response
 
 from dkist import net
+from dkist.data.test import rootdir
+from dkist.io.dask.loaders import FSSpecFITSLoader, HTTPFITSLoader
 from dkist.net import conf
 
 
@@ -266,3 +273,143 @@ def test_tiled_dataset_file_manager_repr(large_tiled_dataset):
                 assert (large_tiled_dataset.files.fileuri_array[r, c] == "").all()
             else:
                 assert (tile.files.fileuri_array == large_tiled_dataset.files.fileuri_array[r, c]).all()
+
+
+@pytest.fixture
+def eit_server(httpserver):
+    # Reading remote files needs the remote extra
+    pytest.importorskip("fsspec")
+    pytest.importorskip("urllib3")
+    eitdir = Path(rootdir) / "EIT"
+
+    def handler(request):
+        path = eitdir / request.path.split("/")[-1]
+        if not path.exists():
+            return Response(status=404)
+        response = Response(path.read_bytes(), mimetype="application/fits")
+        return response.make_conditional(request, accept_ranges=True, complete_length=path.stat().st_size)
+
+    httpserver.expect_request(re.compile("/EIT/.*")).respond_with_handler(handler)
+    return httpserver.url_for("/EIT")
+
+
+def test_use_remote(eit_dataset, eit_server):
+    eitdir = Path(rootdir) / "EIT"
+    eit_dataset.files.basepath = eitdir
+    local_loader = eit_dataset.files.loader
+    expected = eit_dataset.data[:, 10:20, 30:40].compute()
+
+    eit_dataset.files.use_remote(eit_server)
+    assert eit_dataset.files.is_remote
+    assert eit_dataset.files.loader is HTTPFITSLoader
+    assert eit_dataset.files.basepath == eit_server
+    assert_allclose(eit_dataset.data[:, 10:20, 30:40].compute(), expected)
+
+    eit_dataset.files.use_local()
+    assert not eit_dataset.files.is_remote
+    assert eit_dataset.files.loader is local_loader
+    assert eit_dataset.files.basepath == eitdir
+    assert_allclose(eit_dataset.data[:, 10:20, 30:40].compute(), expected)
+
+
+def test_use_remote_unknown_scheme(eit_dataset):
+    pytest.importorskip("fsspec")
+    with pytest.raises(ValueError, match="no loader for reading 'gopher' URLs"):
+        eit_dataset.files.use_remote("gopher://example.org/data")
+
+
+def test_use_remote_sliced(eit_dataset, eit_server):
+    eitdir = Path(rootdir) / "EIT"
+    eit_dataset.files.basepath = eitdir
+    local_loader = eit_dataset.files.loader
+    sliced = eit_dataset[:, 10:20]
+    with pytest.raises(ValueError, match="sliced dataset"):
+        sliced.files.use_remote(eit_server)
+
+    # Nothing shared with the full dataset is changed
+    for files in (sliced.files, eit_dataset.files):
+        assert not files.is_remote
+        assert files.basepath == eitdir
+        assert files.loader is local_loader
+
+    eit_dataset.files.use_remote(eit_server)
+    sliced = eit_dataset[:, 10:20]
+    with pytest.raises(ValueError, match="sliced dataset"):
+        sliced.files.use_local()
+    assert eit_dataset.files.is_remote
+    assert eit_dataset.files.basepath == eit_server
+
+
+def test_use_remote_fsspec(eit_dataset):
+    fsspec = pytest.importorskip("fsspec")
+    eitdir = Path(rootdir) / "EIT"
+    fs = fsspec.filesystem("memory")
+    for fileuri in eit_dataset.files.filenames:
+        fs.pipe(f"/eit/{fileuri}", (eitdir / fileuri).read_bytes())
+
+    eit_dataset.files.basepath = eitdir
+    expected = eit_dataset.data[:, 10:20, 30:40].compute()
+    try:
+        eit_dataset.files.use_remote("memory://eit")
+        assert eit_dataset.files.loader is FSSpecFITSLoader
+        assert eit_dataset.files.basepath == "memory://eit"
+        assert_allclose(eit_dataset.data[:, 10:20, 30:40].compute(), expected)
+    finally:
+        fs.rm("/eit", recursive=True)
+
+
+@pytest.fixture
+def partial_eit_dataset(tmp_path, eit_dataset):
+    # Files 0-2, 4-7 and 10 are available
+    for i, filename in enumerate(eit_dataset.files.filenames):
+        if i not in (3, 8, 9):
+            shutil.copy(Path(rootdir) / "EIT" / filename, tmp_path / filename)
+    eit_dataset.files.basepath = tmp_path
+    eit_dataset.data = eit_dataset.files.dask_array
+    return eit_dataset
+
+
+def test_available(mocker, partial_eit_dataset):
+    spy = mocker.spy(os, "scandir")
+    available = partial_eit_dataset.files.available
+    assert available.shape == partial_eit_dataset.files.fileuri_array.shape
+    assert np.flatnonzero(~available).tolist() == [3, 8, 9]
+    # All the files are in one directory
+    assert spy.call_count <= 1
+
+
+def test_available_refresh(tmp_path, partial_eit_dataset):
+    files = partial_eit_dataset.files
+    assert not files.available[3]
+    shutil.copy(Path(rootdir) / "EIT" / files.filenames[3], tmp_path / files.filenames[3])
+    files.refresh_available()
+    assert files.available[3]
+
+
+def test_available_no_basepath(dataset):
+    assert not dataset.files.available.any()
+
+
+def test_available_slices(partial_eit_dataset):
+    slices = partial_eit_dataset.files.available_slices()
+    assert slices == [(slice(0, 3),), (slice(4, 8),), (slice(10, 11),)]
+    for slc in slices:
+        sliced = partial_eit_dataset[slc]
+        assert not np.isnan(sliced.data).any()
+    assert sum(partial_eit_dataset[slc].data.shape[0] for slc in slices) == 8
+
+
+def test_available_slices_axis(tmp_path, large_visp_dataset):
+    files = large_visp_dataset.files
+    files.basepath = tmp_path
+    for fileuri in files.fileuri_array[:, 5:9].flat:
+        (tmp_path / fileuri).touch()
+    for fileuri in files.fileuri_array[:2, 12].flat:
+        (tmp_path / fileuri).touch()
+
+    assert files.available.sum() == 18
+    assert files.available_slices(axis=1) == [(slice(None), slice(5, 9))]
+    assert files.available_slices(axis=0) == []
+    assert large_visp_dataset[files.available_slices(axis=1)[0]].data.shape[:2] == (4, 4)
+    with pytest.raises(ValueError, match="axis must be"):
+        files.available_slices(axis=2)
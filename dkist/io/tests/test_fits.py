@@ -1,13 +1,19 @@
+import os
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
 
 import numpy as np
 import pytest
 from numpy.testing import assert_allclose
 
 import asdf
+from astropy.io import fits
 
+import dkist
 from dkist.data.test import rootdir
-from dkist.io.dask.loaders import AstropyFITSLoader
+from dkist.io.dask.cache import FrameCache
+from dkist.io.dask.loaders import AstropyFITSLoader, CompressedFITSLoader, MemmapFITSLoader, _tile_pieces
 from dkist.io.dask.striped_array import FileManager
 
 eitdir = Path(rootdir) / "EIT"
@@ -88,3 +94,175 @@ def test_slicing(absolute_fl):
     sarr = absolute_fl[aslice]
 
     assert_allclose(sarr, absolute_fl.data[aslice])
+
+
+@pytest.fixture
+def memmap_fl(absolute_ac):
+    absolute_ac.loader = MemmapFITSLoader
+    return absolute_ac._striped_external_array.loader_array.flat[0]
+
+
+def test_memmap(memmap_fl, absolute_fl):
+    assert isinstance(memmap_fl, MemmapFITSLoader)
+
+    aslice = np.s_[10:20, 10:20]
+    sarr = memmap_fl[aslice]
+
+    assert isinstance(sarr, np.memmap)
+    assert not sarr.flags.writeable
+    assert_allclose(sarr, absolute_fl[aslice])
+
+
+def test_memmap_nan(memmap_fl, tmpdir):
+    memmap_fl.basepath = tmpdir
+    memmap_fl.fileuri = "missing.fits"
+    assert_allclose(memmap_fl[10:20, :], np.nan)
+
+
+def test_memmap_compressed(tmp_path):
+    data = np.arange(128 * 128, dtype=np.float32).reshape((128, 128))
+    fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(data, quantize_level=0)]).writeto(tmp_path / "comp.fits")
+
+    loader = MemmapFITSLoader("comp.fits", (128, 128), "float32", 1, tmp_path)
+    sarr = loader[10:20, 10:20]
+
+    assert not isinstance(sarr, np.memmap)
+    assert_allclose(sarr, data[10:20, 10:20])
+
+
+@pytest.fixture
+def frame_cache():
+    frame_cache = FrameCache(max_bytes="1MiB")
+    with patch("dkist.io.dask.loaders.frame_cache", frame_cache):
+        yield frame_cache
+
+
+def test_frame_cache_disabled(absolute_fl, mocker):
+    spy = mocker.spy(AstropyFITSLoader, "_open_fits")
+    absolute_fl[10:20]
+    absolute_fl[10:20]
+    assert spy.call_count == 2
+
+
+def test_frame_cache(absolute_fl, frame_cache, mocker):
+    spy = mocker.spy(AstropyFITSLoader, "_open_fits")
+    first = absolute_fl[10:20]
+    second = absolute_fl[10:20]
+
+    assert spy.call_count == 1
+    assert second is first
+    assert not second.flags.writeable
+    info = frame_cache.info()
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+    assert info.current_bytes == first.nbytes
+
+    # A different section is a different entry
+    absolute_fl[10:21]
+    assert spy.call_count == 2
+    assert len(frame_cache) == 2
+
+
+def test_frame_cache_eviction(absolute_fl, frame_cache):
+    frame_bytes = int(np.prod(absolute_fl.shape)) * np.dtype(absolute_fl.dtype).itemsize
+    frame_cache.max_bytes = frame_bytes
+    absolute_fl[0:64]
+    absolute_fl[64:128]
+    # Use the first entry so that the second is the least recently used
+    absolute_fl[0:64]
+    absolute_fl[10:74]
+
+    info = frame_cache.info()
+    assert info.evictions == 1
+    assert info.current_bytes == frame_bytes
+    absolute_fl[0:64]
+    assert frame_cache.info().hits == 2
+
+
+def test_frame_cache_invalidation(tmp_path, frame_cache):
+    data = np.arange(100, dtype=float).reshape((10, 10))
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        fits.PrimaryHDU(data).writeto(tmp_path / directory / "file.fits")
+
+    loader = AstropyFITSLoader("file.fits", (10, 10), float, 0, tmp_path / "a")
+    assert_allclose(loader[:], data)
+
+    # Changing basepath reads the other file
+    fits.PrimaryHDU(data * 2).writeto(tmp_path / "b" / "file.fits", overwrite=True)
+    loader.basepath = tmp_path / "b"
+    assert_allclose(loader[:], data * 2)
+
+    # Modifying the file reads it again
+    fits.PrimaryHDU(data * 3).writeto(tmp_path / "b" / "file.fits", overwrite=True)
+    stat = (tmp_path / "b" / "file.fits").stat()
+    os.utime(tmp_path / "b" / "file.fits", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert_allclose(loader[:], data * 3)
+    assert frame_cache.info().misses == 3
+
+
+@pytest.fixture
+def compressed_file(tmp_path):
+    data = np.arange(64 * 96, dtype=np.int32).reshape((64, 96))
+    hdu = fits.CompImageHDU(data, compression_type="RICE_1", tile_shape=(8, 32))
+    fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(tmp_path / "comp.fits")
+    return tmp_path, data
+
+
+@pytest.mark.parametrize("aslice", [
+    np.s_[...],
+    np.s_[10:50, 5:70],
+    np.s_[3, 10:90:3],
+    np.s_[50:2:-3, -1],
+    np.s_[::-1, ::-1],
+])
+def test_tile_pieces(aslice):
+    data = np.arange(64 * 96).reshape((64, 96))
+    pieces = _tile_pieces(aslice, data.shape, (8, 32), 3)
+    assert pieces is not None
+    axis, sections, residual = pieces
+    assert len(sections) <= 3
+    for section in sections[1:]:
+        assert section[axis].start % (8, 32)[axis] == 0
+    joined = np.concatenate([data[section] for section in sections], axis=axis)
+    assert_allclose(joined[residual], data[aslice])
+
+
+@pytest.mark.parametrize("aslice", [
+    # Within a single tile
+    np.s_[20:21, 40:41],
+    np.s_[8:16, 32:64],
+    # Empty
+    np.s_[10:10, :],
+    # Not a basic index
+    np.s_[[1, 2], :],
+])
+def test_tile_pieces_not_split(aslice):
+    assert _tile_pieces(aslice, (64, 96), (8, 32), 3) is None
+
+
+def test_compressed(compressed_file, mocker):
+    basepath, data = compressed_file
+    spy = mocker.spy(fits.hdu.compressed.section, "decompress_image_data_section")
+    loader = CompressedFITSLoader("comp.fits", data.shape, data.dtype, 1, basepath)
+
+    assert_allclose(loader[10:20, 40:50], data[10:20, 40:50])
+    # Only the tiles covering the section are decompressed
+    first_tile, last_tile = spy.call_args.args[-2:]
+    assert list(first_tile) == [1, 1]
+    assert list(last_tile) == [2, 1]
+
+
+def test_compressed_processes(compressed_file, mocker):
+    basepath, data = compressed_file
+    spy = mocker.spy(ProcessPoolExecutor, "submit")
+    loader = CompressedFITSLoader("comp.fits", data.shape, data.dtype, 1, basepath)
+
+    with dkist.conf.set_temp("decompression_processes", 2):
+        assert_allclose(loader[5:60:2, 3], data[5:60:2, 3])
+        assert spy.call_count == 2
+        assert_allclose(loader[:], data)
+
+
+def test_compressed_uncompressed_hdu(absolute_fl):
+    loader = CompressedFITSLoader(absolute_fl.fileuri, absolute_fl.shape, absolute_fl.dtype, 0, absolute_fl.basepath)
+    assert_allclose(loader[10:20], absolute_fl[10:20])
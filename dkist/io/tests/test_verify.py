@@ -0,0 +1,120 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+from dkist.data.test import rootdir
+from dkist.io.verify import verification_cache, verify_files
+
+eitdir = Path(rootdir) / "EIT"
+
+
+@pytest.fixture
+def eit_copy(tmp_path, eit_dataset):
+    for filename in eit_dataset.files.filenames:
+        shutil.copy(eitdir / filename, tmp_path / filename)
+    eit_dataset.files.basepath = tmp_path
+    return eit_dataset
+
+
+def _corrupt(path, offset):
+    data = bytearray(path.read_bytes())
+    data[offset] ^= 0xFF
+    path.write_bytes(data)
+
+
+def test_verify_ok(eit_copy):
+    report = eit_copy.files.verify()
+    assert report
+    assert report.status.shape == eit_copy.files.fileuri_array.shape
+    assert report.ok.all()
+    assert report.problems == {}
+    assert repr(report) == "<VerificationReport 11 files: 11 ok, 0 missing, 0 corrupt>"
+
+
+def test_verify_missing_and_truncated(tmp_path, eit_copy):
+    filenames = eit_copy.files.filenames
+    (tmp_path / filenames[2]).unlink()
+    truncated = tmp_path / filenames[5]
+    truncated.write_bytes(truncated.read_bytes()[:20000])
+
+    report = eit_copy.files.verify()
+    assert not report
+    assert np.flatnonzero(report.missing).tolist() == [2]
+    assert np.flatnonzero(report.corrupt).tolist() == [5]
+    assert report.ok.sum() == 9
+    assert set(report.problems) == {filenames[2], filenames[5]}
+    assert "truncated" in report.problems[filenames[5]]
+
+
+def test_verify_checksum(tmp_path):
+    path = tmp_path / "file.fits"
+    data = np.arange(1000.).reshape(10, 100)
+    fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(data), fits.ImageHDU(data)]).writeto(path, checksum=True)
+    fileuris = np.array(["file.fits"])
+
+    assert verify_files(fileuris, tmp_path, checksum=True)
+    # Change one byte of the data of the last HDU
+    _corrupt(path, path.stat().st_size - 2880)
+
+    # The length of the file is still correct
+    assert verify_files(fileuris, tmp_path)
+    report = verify_files(fileuris, tmp_path, checksum=True)
+    assert report.corrupt.all()
+    assert "DATASUM" in report.problems["file.fits"]
+
+
+@pytest.mark.parametrize("cards", [
+    # No BITPIX
+    ["SIMPLE  =                    T", "NAXIS   =                    1", "NAXIS1  =                   10"],
+    # NAXIS1 is a string
+    ["SIMPLE  =                    T", "BITPIX  =                  -64", "NAXIS   =                    1",
+     "NAXIS1  =                 'ab'"],
+    ["XTENSION= 'IMAGE   '", "BITPIX  =                  -64", "NAXIS   =                    0"],
+])
+def test_verify_invalid_header(tmp_path, cards):
+    header = "".join(card.ljust(80) for card in [*cards, "END"]).ljust(2880)
+    (tmp_path / "file.fits").write_bytes(header.encode() + bytes(2880))
+
+    report = verify_files(np.array(["file.fits"]), tmp_path)
+    assert report.corrupt.all()
+    assert "can not be read" in report.problems["file.fits"]
+
+
+def test_verify_cached(mocker, tmp_path, eit_copy):
+    spy = mocker.spy(fits, "open")
+    eit_copy.files.verify()
+    assert spy.call_count == 11
+
+    eit_copy.files.verify()
+    assert spy.call_count == 11
+
+    # Only files which have changed are verified again
+    modified = tmp_path / eit_copy.files.filenames[0]
+    modified.write_bytes(modified.read_bytes()[:-2880])
+    report = eit_copy.files.verify()
+    assert spy.call_count == 12
+    assert report.corrupt[0]
+
+    # Clearing the cache verifies all the files again
+    verification_cache.clear()
+    assert len(verification_cache) == 0
+    eit_copy.files.verify()
+    assert spy.call_count == 23
+
+
+def test_verify_tiled(tmp_path, large_tiled_dataset):
+    report = large_tiled_dataset.files.verify()
+    assert report.status.shape == large_tiled_dataset.files.fileuri_array.shape
+    n_files = len(large_tiled_dataset.files.filenames)
+    assert report.missing.sum() == n_files
+    assert (report.status == "").sum() == report.status.size - n_files
+
+
+def test_verify_no_basepath(dataset):
+    assert dataset.files.basepath is None
+    with pytest.raises(ValueError, match="basepath must be set"):
+        dataset.files.verify()
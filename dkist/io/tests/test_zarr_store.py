@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import astropy.units as u
+
+from dkist import Dataset, TiledDataset, load_dataset
+from dkist.data.test import rootdir
+from dkist.io.zarr_store import is_zarr_store, open_zarr_group
+
+zarr = pytest.importorskip("zarr")
+
+eitdir = Path(rootdir) / "EIT"
+
+
+@pytest.fixture
+def eit(eit_dataset):
+    eit_dataset.files.basepath = eitdir
+    eit_dataset.data = eit_dataset.files.dask_array
+    return eit_dataset
+
+
+def test_dataset_roundtrip(tmp_path, eit):
+    store = tmp_path / "eit.zarr"
+    eit.to_zarr(store)
+    assert is_zarr_store(store)
+
+    ds = load_dataset(store)
+    assert isinstance(ds, Dataset)
+    assert ds.data.shape == eit.data.shape
+    assert_allclose(ds.data, eit.data)
+    assert ds.wcs.world_axis_physical_types == eit.wcs.world_axis_physical_types
+    assert_allclose(ds.wcs.pixel_to_world_values(1, 2, 3), eit.wcs.pixel_to_world_values(1, 2, 3))
+    assert len(ds.headers) == len(eit.headers)
+    assert ds.inventory == eit.inventory
+    assert "history" in ds.meta
+    # The file manager of the FITS files is kept
+    assert ds.files.filenames == eit.files.filenames
+    assert ds.files.basepath == eitdir
+
+
+def test_sliced_dataset(tmp_path, eit):
+    sliced = eit[2:5, 10:20]
+    sliced.to_zarr(tmp_path / "eit.zarr")
+
+    ds = load_dataset(str(tmp_path / "eit.zarr"))
+    assert_allclose(ds.data, sliced.data)
+    assert_allclose(ds.wcs.low_level_wcs.pixel_to_world_values(1, 2, 0),
+                    sliced.wcs.low_level_wcs.pixel_to_world_values(1, 2, 0))
+    assert len(ds.headers) == 3
+    assert len(ds.files) == 3
+
+
+def test_chunks_and_compressor(tmp_path, eit):
+    store = tmp_path / "eit.zarr"
+    eit.to_zarr(store, chunks=(4, 64, 128), compressor=zarr.codecs.BloscCodec(cname="lz4"))
+
+    group = open_zarr_group(store)
+    assert group["data"].chunks == (4, 64, 128)
+    assert isinstance(group["data"].compressors[0], zarr.codecs.BloscCodec)
+
+    ds = load_dataset(store)
+    assert ds.data.chunks == ((4, 4, 3), (64, 64), (128,))
+    assert_allclose(ds.data[5:7, 70], eit.data[5:7, 70])
+
+
+def test_consolidated(tmp_path, eit):
+    store = tmp_path / "eit.zarr"
+    eit.to_zarr(store)
+    assert zarr.open_group(store, mode="r").metadata.consolidated_metadata is not None
+
+
+def test_overwrite(tmp_path, eit):
+    store = tmp_path / "eit.zarr"
+    eit.to_zarr(store)
+    with pytest.raises(FileExistsError):
+        eit.to_zarr(store)
+    eit[0:2].to_zarr(store, overwrite=True)
+    assert load_dataset(store).data.shape[0] == 2
+
+
+def test_dtype(tmp_path, eit):
+    store = tmp_path / "eit.zarr"
+    eit.to_zarr(store)
+    ds = load_dataset(store, dtype=np.float32)
+    assert ds.data.dtype == np.float32
+    assert ds.files.dtype == np.float32
+
+
+def test_in_memory_dataset(tmp_path, dataset):
+    dataset = Dataset(dataset.data, wcs=dataset.wcs, meta=dataset.meta, unit=dataset.unit)
+    dataset.to_zarr(tmp_path / "ds.zarr")
+
+    ds = load_dataset(tmp_path / "ds.zarr")
+    assert ds.files is None
+    assert ds.unit == u.count
+    assert_allclose(ds.data, dataset.data)
+
+
+def test_fsspec_url(eit):
+    pytest.importorskip("fsspec")
+    eit.to_zarr("memory://test_fsspec_url/eit.zarr")
+    ds = load_dataset("memory://test_fsspec_url/eit.zarr")
+    assert_allclose(ds.data, eit.data)
+
+
+def test_tiled_dataset(tmp_path, simple_tiled_dataset):
+    store = tmp_path / "tiled.zarr"
+    simple_tiled_dataset.to_zarr(store)
+
+    tiled = load_dataset(store)
+    assert isinstance(tiled, TiledDataset)
+    assert tiled.shape == simple_tiled_dataset.shape
+    assert (tiled.mask == simple_tiled_dataset.mask).all()
+    assert tiled.inventory == simple_tiled_dataset.inventory
+    for ds, expected in zip(tiled.flat, simple_tiled_dataset.flat):
+        assert_allclose(ds.data, expected.data)
+        assert ds.inventory is tiled.inventory
+
+
+def test_not_dkist_store(tmp_path):
+    zarr.open_group(tmp_path / "other.zarr", mode="w")
+    with pytest.raises(ValueError, match="not a Zarr store written by dkist"):
+        load_dataset(tmp_path / "other.zarr")
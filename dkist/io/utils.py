@@ -1,6 +1,13 @@
 from textwrap import dedent
 
-__all__ = ["filemanager_info_str"]
+__all__ = ["filemanager_info_str", "is_url"]
+
+
+def is_url(path):
+    """
+    Return `True` if ``path`` is a URL, such as ``https://host/path`` or ``s3://bucket/prefix``.
+    """
+    return isinstance(path, str) and "://" in path
 
 
 def filemanager_info_str(filemanager):
@@ -0,0 +1,194 @@
+"""
+Checking the FITS files backing a dataset are present and complete.
+
+Each file is checked for existence, for being at least as long as its headers
+say it should be, and optionally against the ``CHECKSUM`` and ``DATASUM``
+keywords in its headers. The results are cached on the modification time and
+size of each file, so verifying a dataset again only checks the files which
+have changed since they were last verified, `verification_cache.clear()
+<VerificationCache.clear>` discards the cached results.
+"""
+import warnings
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from astropy.io import fits
+
+__all__ = ["VerificationCache", "VerificationReport", "verification_cache", "verify_files"]
+
+OK = "ok"
+MISSING = "missing"
+CORRUPT = "corrupt"
+
+
+class VerificationCache:
+    """
+    A thread safe cache of the results of verifying files.
+
+    Each result is reused until the modification time or size of the file changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Keyed by (absolute path, checksum), holding (mtime, size, status, message)
+        self._results = {}
+
+    def get(self, path, stat, checksum):
+        """
+        The cached status and message for ``path``, or `None` if it has changed since it was verified.
+        """
+        key = str(Path(path).absolute())
+        with self._lock:
+            # A file which passed the checksum verification also passes without it
+            cached = self._results.get((key, checksum)) or (None if checksum else self._results.get((key, True)))
+        if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return cached[2:]
+
+    def put(self, path, stat, checksum, result):
+        """
+        Cache the status and message of verifying ``path``.
+        """
+        with self._lock:
+            self._results[(str(Path(path).absolute()), checksum)] = (stat.st_mtime_ns, stat.st_size, *result)
+
+    def clear(self):
+        """
+        Discard all the cached results, so that every file is verified again.
+        """
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self):
+        return len(self._results)
+
+
+class VerificationReport:
+    """
+    The result of verifying a collection of FITS files.
+
+    The ``status``, ``ok``, ``missing``, ``corrupt`` and ``messages`` arrays
+    all have the same shape as the ``fileuri_array`` which was verified.
+    Elements of ``fileuri_array`` which are empty, such as those for masked
+    tiles of a `~dkist.TiledDataset`, have an empty status.
+    """
+
+    def __init__(self, fileuri_array, status, messages):
+        self.fileuri_array = fileuri_array
+        self.status = status
+        self.messages = messages
+
+    @property
+    def ok(self):
+        """
+        A boolean array, `True` where the file is present and uncorrupted.
+        """
+        return self.status == OK
+
+    @property
+    def missing(self):
+        """
+        A boolean array, `True` where the file does not exist.
+        """
+        return self.status == MISSING
+
+    @property
+    def corrupt(self):
+        """
+        A boolean array, `True` where the file is truncated, can not be read or fails its checksums.
+        """
+        return self.status == CORRUPT
+
+    @property
+    def problems(self):
+        """
+        A dictionary of the file uri and a description of the problem for each missing or corrupt file.
+        """
+        bad = self.missing | self.corrupt
+        return dict(zip(self.fileuri_array[bad].tolist(), self.messages[bad].tolist()))
+
+    def __bool__(self):
+        return not (self.missing.any() or self.corrupt.any())
+
+    def __repr__(self):
+        return (f"<{type(self).__name__} {int((self.status != '').sum())} files: {int(self.ok.sum())} ok, "
+                f"{int(self.missing.sum())} missing, {int(self.corrupt.sum())} corrupt>")
+
+
+def verify_files(fileuri_array, basepath, *, checksum=False, max_workers=None):
+    """
+    Verify the FITS files in ``fileuri_array``, relative to ``basepath``, in parallel.
+
+    Parameters
+    ----------
+    fileuri_array : `numpy.ndarray`
+        The file uris of the files to verify.
+    basepath : `str` or `pathlib.Path`
+        The directory the file uris are relative to.
+    checksum : `bool`, optional
+        If `True` also compare the ``CHECKSUM`` and ``DATASUM`` keywords of
+        each HDU with the contents of the file, which reads the whole file.
+    max_workers : `int`, optional
+        The number of threads used to verify the files.
+
+    Returns
+    -------
+    `VerificationReport`
+    """
+    fileuri_array = np.asarray(fileuri_array)
+    paths = [Path(basepath) / uri if uri else None for uri in fileuri_array.flat]
+
+    with warnings.catch_warnings(), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # The length of the files is checked explicitly below
+        warnings.filterwarnings("ignore", message="File may have been truncated")
+        results = list(executor.map(lambda path: _cached_verify(path, checksum), paths))
+
+    status = np.array([result[0] for result in results], dtype=object).reshape(fileuri_array.shape)
+    messages = np.array([result[1] for result in results], dtype=object).reshape(fileuri_array.shape)
+    return VerificationReport(fileuri_array, status.astype(str), messages)
+
+
+def _cached_verify(path, checksum):
+    if path is None:
+        return "", None
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return MISSING, "The file does not exist."
+
+    cached = verification_cache.get(path, stat, checksum)
+    if cached is not None:
+        return cached
+
+    result = _verify_file(path, stat.st_size, checksum)
+    verification_cache.put(path, stat, checksum, result)
+    return result
+
+
+def _verify_file(path, size, checksum):
+    """
+    Verify one file, returning the status and a description of any problem.
+    """
+    try:
+        # Don't decompress tile compressed HDUs, so the checksums of the
+        # binary tables are verified against the bytes in the file
+        with fits.open(path, disable_image_compression=True) as hdul:
+            for i, hdu in enumerate(hdul):
+                expected = hdu.fileinfo()["datLoc"] + hdu.size
+                if expected > size:
+                    return CORRUPT, f"The file is truncated, it is {size} bytes but HDU {i} ends at {expected} bytes."
+                if checksum and hdu.verify_datasum() == 0:
+                    return CORRUPT, f"The data of HDU {i} do not match the DATASUM keyword."
+                if checksum and hdu.verify_checksum() == 0:
+                    return CORRUPT, f"HDU {i} does not match the CHECKSUM keyword."
+    # Invalid headers raise a variety of errors from astropy when they are parsed
+    except (OSError, ValueError, KeyError, TypeError, fits.VerifyError) as e:
+        return CORRUPT, f"The file can not be read: {e}"
+    return OK, None
+
+
+#: The cache of the results of verifying files used by `verify_files`.
+verification_cache = VerificationCache()
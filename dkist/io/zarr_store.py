@@ -0,0 +1,203 @@
+"""
+Saving datasets to, and loading them from, Zarr stores.
+
+Reading a dataset from many small FITS files is limited by the cost of opening
+and parsing each file. Converting a dataset to a Zarr store once means it can
+then be read in large compressed chunks, directly at the bandwidth of the disk
+or object store.
+
+A store written by `write_zarr` is a Zarr group containing:
+
+* One array for each `~dkist.Dataset`, named ``"data"`` for a single dataset or
+  ``"tile_{i}_{j}"`` for each tile of a `~dkist.TiledDataset`.
+* A ``"asdf"`` array holding the bytes of an ASDF file, which contains the
+  WCS, the headers table, the inventory and the file manager of the original
+  FITS files for each dataset.
+* A ``"dkist"`` attribute on the group, recording the version of the dkist
+  package used to write the store.
+
+The metadata of the whole store is consolidated in the group, so opening a
+store reads a single metadata document.
+"""
+import io
+import copy
+import warnings
+from pathlib import Path
+
+import dask
+import dask.array as da
+import numpy as np
+
+import asdf
+
+__all__ = ["dataset_from_zarr_tree", "is_zarr_store", "open_zarr_group", "read_zarr_tree", "write_zarr"]
+
+#: The name of the array holding the ASDF metadata in the store.
+METADATA_ARRAY = "asdf"
+
+
+def is_zarr_store(path):
+    """
+    Return `True` if the local directory ``path`` is the root of a Zarr group.
+    """
+    path = Path(path)
+    return path.is_dir() and ((path / "zarr.json").exists() or (path / ".zgroup").exists())
+
+
+def write_zarr(dataset, store, *, chunks="auto", compressor=None, overwrite=False, storage_options=None):
+    """
+    Write a `~dkist.Dataset` or `~dkist.TiledDataset` to a Zarr store.
+
+    The data are computed from the Dask array of each dataset, and written in
+    parallel, one task per chunk of the store.
+
+    Parameters
+    ----------
+    dataset : `dkist.Dataset` or `dkist.TiledDataset`
+        The dataset to write.
+    store : `str` or `pathlib.Path` or `zarr.abc.store.Store`
+        The location of the store, a local path, a URL supported by fsspec
+        or a Zarr store object.
+    chunks : `tuple` or `str`, optional
+        The chunks of the arrays in the store, anything accepted by
+        `dask.array.Array.rechunk`. Defaults to ``"auto"``, which uses chunks
+        of up to dask's ``array.chunk-size`` configuration option.
+    compressor : `zarr.abc.codec.BytesBytesCodec`, optional
+        The codec used to compress the chunks, for example
+        ``zarr.codecs.BloscCodec(cname="zstd", clevel=5)``. If not specified
+        the default of the zarr package is used.
+    overwrite : `bool`, optional
+        If `True` replace an existing store, otherwise an error is raised if
+        the store already exists.
+    storage_options : `dict`, optional
+        Options passed to fsspec if ``store`` is a URL.
+    """
+    import zarr  # noqa: PLC0415
+
+    from dkist import __version__  # noqa: PLC0415
+    from dkist.dataset import TiledDataset  # noqa: PLC0415
+
+    group = zarr.open_group(store, mode="w" if overwrite else "w-", storage_options=storage_options,
+                            attributes={"dkist": {"version": __version__}})
+    array_kwargs = {} if compressor is None else {"compressors": compressor}
+
+    if isinstance(dataset, TiledDataset):
+        tree = {"tiled_dataset": _tiled_dataset_node(dataset)}
+        nodes = [node for node in np.array(tree["tiled_dataset"]["datasets"], dtype=object).flat if node is not None]
+        datasets = dataset._data.compressed()
+    else:
+        tree = {"dataset": _dataset_node(dataset, "data")}
+        nodes, datasets = [tree["dataset"]], [dataset]
+
+    writes = []
+    for node, ds in zip(nodes, datasets):
+        data = da.asarray(ds.data).rechunk(chunks)
+        array = group.create_array(node["array"], shape=data.shape, dtype=data.dtype,
+                                   chunks=tuple(c[0] for c in data.chunks), **array_kwargs)
+        writes.append(da.store(data, array, lock=False, compute=False))
+    dask.compute(*writes)
+
+    buffer = io.BytesIO()
+    asdf.AsdfFile(tree).write_to(buffer)
+    metadata = np.frombuffer(buffer.getvalue(), dtype=np.uint8)
+    group.create_array(METADATA_ARRAY, data=metadata, chunks=metadata.shape)
+
+    with warnings.catch_warnings():
+        # Consolidated metadata is not yet part of the Zarr v3 specification,
+        # but is supported by zarr-python, which is what we use to read the stores.
+        warnings.filterwarnings("ignore", message="Consolidated metadata", category=UserWarning)
+        zarr.consolidate_metadata(group.store)
+
+
+def _dataset_node(dataset, array_name):
+    node = {"array": array_name, "wcs": dataset.wcs}
+    # Copy the meta so we don't pop from the one in memory
+    node["meta"] = copy.copy(dataset.meta)
+    # If the history key has been injected into the meta, do not save it
+    node["meta"].pop("history", None)
+    if dataset.unit:
+        node["unit"] = dataset.unit
+    if dataset.mask is not None:
+        node["mask"] = dataset.mask
+    if dataset.files is not None:
+        node["files"] = dataset.files._fm
+        if dataset.files.basepath is not None:
+            node["basepath"] = str(dataset.files.basepath)
+    return node
+
+
+def _tiled_dataset_node(tiled_dataset):
+    meta = copy.copy(tiled_dataset.meta)
+    meta.pop("history", None)
+    datasets = np.empty(tiled_dataset.shape, dtype=object)
+    # Store the headers of each tile as an offset and size in the combined
+    # header table, as is done in the ASDF files.
+    offset = 0
+    for index in np.ndindex(tiled_dataset.shape):
+        if tiled_dataset.mask is not np.ma.nomask and tiled_dataset.mask[index]:
+            continue
+        ds = tiled_dataset._data.data[index]
+        node = _dataset_node(ds, "tile_" + "_".join(map(str, index)))
+        node["meta"]["headers"] = {"offset": offset, "size": len(ds.headers)}
+        offset += len(ds.headers)
+        datasets[index] = node
+    return {"datasets": datasets.tolist(), "mask": np.ma.getmaskarray(tiled_dataset._data), "meta": meta}
+
+
+def open_zarr_group(store, *, storage_options=None):
+    """
+    Open a store written by `write_zarr` for reading.
+    """
+    import zarr  # noqa: PLC0415
+
+    group = zarr.open_group(store, mode="r", storage_options=storage_options)
+    if METADATA_ARRAY not in group or "dkist" not in group.attrs:
+        raise ValueError(f"{store} is not a Zarr store written by dkist.")
+    return group
+
+
+def read_zarr_tree(group):
+    """
+    Open the ASDF metadata of a store written by `write_zarr`.
+
+    Returns
+    -------
+    `asdf.AsdfFile`
+    """
+    buffer = io.BytesIO(group[METADATA_ARRAY][...].tobytes())
+    return asdf.open(buffer, lazy_load=False, memmap=False)
+
+
+def dataset_from_zarr_tree(tree, group):
+    """
+    Construct the `~dkist.Dataset` or `~dkist.TiledDataset` stored in a Zarr group.
+
+    The data of each dataset are a Dask array reading the chunks of the store.
+    """
+    from dkist.dataset import TiledDataset  # noqa: PLC0415
+
+    if "dataset" in tree:
+        return _dataset_from_node(tree["dataset"], group)
+
+    node = tree["tiled_dataset"]
+    meta = node["meta"]
+    datasets = np.array(node["datasets"], dtype=object)
+    for index in np.ndindex(datasets.shape):
+        if datasets[index] is not None:
+            ds = _dataset_from_node(datasets[index], group)
+            offset, size = ds.headers["offset"], ds.headers["size"]
+            ds.meta["headers"] = meta["headers"][offset:offset+size]
+            datasets[index] = ds
+    return TiledDataset(datasets, mask=node["mask"], meta=meta)
+
+
+def _dataset_from_node(node, group):
+    from dkist.dataset import Dataset  # noqa: PLC0415
+
+    data = da.from_zarr(group[node["array"]])
+    dataset = Dataset(data, wcs=node["wcs"], meta=node["meta"], unit=node.get("unit"), mask=node.get("mask"))
+    if (file_manager := node.get("files")) is not None:
+        dataset._file_manager = file_manager
+        if (basepath := node.get("basepath")) is not None:
+            dataset.files.basepath = basepath
+    return dataset
@@ -7,18 +7,53 @@ import astropy.units as u
 from astropy.modeling.models import Tabular1D
 
 from dkist import load_dataset
+from dkist.io.dask.loaders import AstropyFITSLoader
+from dkist.io.dask.striped_array import FileManager
 from dkist.wcs.models import (Ravel, generate_celestial_transform,
                               update_celestial_transform_parameters)
 
 
 @pytest.mark.benchmark
-def test_load_asdf(benchmark, large_visp_dataset_file):
-    benchmark(load_dataset, large_visp_dataset_file)
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+def test_load_asdf(benchmark, large_visp_dataset_file, lazy):
+    benchmark(load_dataset, large_visp_dataset_file, lazy=lazy)
 
 
 @pytest.mark.benchmark
-def test_load_tiled_asdf(benchmark, large_tiled_dataset_asdf):
-    benchmark(load_dataset, large_tiled_dataset_asdf)
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+# The block index of this file is not valid, which is only read when loading lazily
+@pytest.mark.filterwarnings("ignore::asdf.exceptions.AsdfBlockIndexWarning")
+def test_load_tiled_asdf(benchmark, large_tiled_dataset_asdf, lazy):
+    benchmark(load_dataset, large_tiled_dataset_asdf, lazy=lazy)
+
+
+@pytest.fixture(scope="module")
+def many_fileuris():
+    return np.array([f"file_{i:06d}.fits" for i in range(100_000)]).reshape((100, 1000))
+
+
+@pytest.mark.benchmark
+def test_construct_file_manager(benchmark, many_fileuris):
+    benchmark(FileManager.from_parts, many_fileuris, 0, float, (1, 50, 128),
+              loader=AstropyFITSLoader, basepath="/data")
+
+
+@pytest.mark.benchmark
+def test_set_basepath(benchmark, many_fileuris):
+    file_manager = FileManager.from_parts(many_fileuris, 0, float, (1, 50, 128),
+                                          loader=AstropyFITSLoader, basepath="/data")
+
+    @benchmark
+    def set_basepath():
+        file_manager.basepath = "/other"
+
+
+@pytest.mark.benchmark
+def test_compute_block_many_files(benchmark, many_fileuris):
+    # The files don't exist, so this measures building and culling the graph
+    file_manager = FileManager.from_parts(many_fileuris, 0, float, (1, 50, 128),
+                                          loader=AstropyFITSLoader, basepath="/data")
+    benchmark(file_manager.dask_array[5, 10].compute)
 
 
 @pytest.mark.benchmark
@@ -149,6 +184,15 @@ def test_slice_dataset(benchmark, large_visp_dataset):
         sliced = dataset[idx]
 
 
+@pytest.mark.benchmark
+def test_slice_files_repeatedly(benchmark, large_visp_dataset):
+    @benchmark
+    def slice_files(files=large_visp_dataset.files._fm):
+        for _ in range(19):
+            files = files[:, 1:]
+        return files.fileuri_array
+
+
 @pytest.mark.benchmark
 def test_dataset_repr(benchmark, large_visp_dataset):
     benchmark(repr, large_visp_dataset)
@@ -157,3 +201,15 @@ def test_dataset_repr(benchmark, large_visp_dataset):
 @pytest.mark.benchmark
 def test_tileddataset_repr(benchmark, simple_tiled_dataset):
     benchmark(repr, simple_tiled_dataset)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("chunk_bytes", [None, "auto"])
+def test_generate_dask_array(benchmark, large_visp_dataset, chunk_bytes):
+    files = large_visp_dataset.files
+    old_chunk_bytes = files.chunk_bytes
+    files.chunk_bytes = chunk_bytes
+    try:
+        benchmark(files._fm._generate_array)
+    finally:
+        files.chunk_bytes = old_chunk_bytes